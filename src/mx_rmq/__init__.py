@@ -6,6 +6,7 @@ MX-RMQ: 基于Redis的高性能异步消息队列
 from .config import MQConfig
 from .constants import GlobalKeys, TopicKeys, KeyNamespace
 from .core import QueueContext
+from .hooks import CallHook, CallInfo, SlowCallHook
 from .log_config import (
     setup_logger,
     setup_simple_logger,
@@ -13,9 +14,17 @@ from .log_config import (
     configure_mx_rmq_logging,
 )
 from .message import Message, MessageMeta, MessagePriority, MessageStatus
-from .monitoring import MetricsCollector, QueueMetrics, ProcessingMetrics
+from .monitoring import (
+    LatencyMetrics,
+    MetricsCollector,
+    ProcessingMetrics,
+    QueueMetrics,
+    RuntimeMetrics,
+)
 from .queue import RedisMessageQueue
+from .recurring import RecurringSchedule
 from .signal_handler import SignalHandler, create_queue_signal_handler
+from .workflow import FollowUp
 
 __version__ = "3.0.0"
 
@@ -27,6 +36,8 @@ __all__ = [
     "MessagePriority",
     "MessageStatus",
     "MessageMeta",
+    "RecurringSchedule",
+    "FollowUp",
     # 信号处理工具
     "SignalHandler",
     "create_queue_signal_handler",
@@ -39,10 +50,16 @@ __all__ = [
     "GlobalKeys",
     "TopicKeys",
     "KeyNamespace",
+    # 调用剖析钩子
+    "CallHook",
+    "CallInfo",
+    "SlowCallHook",
     # 监控相关
     "MetricsCollector",
     "QueueMetrics",
     "ProcessingMetrics",
+    "LatencyMetrics",
+    "RuntimeMetrics",
     # 内部组件（高级用法，仅用于扩展开发）
     "QueueContext",
 ]
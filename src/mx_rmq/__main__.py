@@ -0,0 +1,9 @@
+"""
+python -m mx_rmq 入口，等同于 mx-rmq 命令
+"""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,488 @@
+"""
+基准测试模块
+在本地启动的 redis-server 上测量生产吞吐、端到端延迟、延时触发精度、确认吞吐、
+每条消息的 Redis 内存占用，以及随工作协程数、主题数和负载大小的扩展情况。
+结果以 JSON 输出，便于跨版本比较回归
+"""
+
+import asyncio
+import platform
+import shutil
+import socket
+import subprocess
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+import redis.asyncio as aioredis
+from loguru import logger
+
+from .config import MQConfig
+from .queue import RedisMessageQueue
+
+# 基准测试使用的队列前缀，每个场景再追加随机后缀互相隔离
+BENCH_PREFIX = "mxbench"
+# 本地任务队列大小的下限（MQConfig 要求至少为5且大于工作协程数）
+MIN_TASK_QUEUE_SIZE = 10
+# 所有场景
+SCENARIOS = ("produce", "latency", "delay", "ack", "memory", "scaling")
+# 等待 redis-server 就绪的超时时间（秒）
+SERVER_START_TIMEOUT = 10.0
+# 等待消费完成的超时时间（秒），超时的场景记录已完成数量
+CONSUME_TIMEOUT = 300.0
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    """
+    延迟样本汇总（最近秩分位数）
+
+    Args:
+        samples: 延迟样本（秒）
+
+    Returns:
+        count 以及 min / avg / p50 / p90 / p99 / max（毫秒）
+    """
+    # 卫语句：没有样本
+    if not samples:
+        return {"count": 0}
+
+    ordered = sorted(samples)
+    count = len(ordered)
+
+    def quantile(q: float) -> float:
+        index = min(count - 1, max(0, int(q * count + 0.5) - 1))
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "count": count,
+        "min_ms": round(ordered[0] * 1000, 3),
+        "avg_ms": round(sum(ordered) / count * 1000, 3),
+        "p50_ms": quantile(0.50),
+        "p90_ms": quantile(0.90),
+        "p99_ms": quantile(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def _free_port() -> int:
+    """向系统申请一个空闲端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalRedisServer:
+    """临时 redis-server 进程：监听本地随机端口、不持久化，退出时终止"""
+
+    def __init__(
+        self, executable: str = "redis-server", port: int | None = None
+    ) -> None:
+        """
+        Args:
+            executable: redis-server 可执行文件名或路径
+            port: 监听端口，None 时使用随机空闲端口
+        """
+        self.executable = executable
+        self.host = "127.0.0.1"
+        self.port = port or _free_port()
+        self._process: subprocess.Popen | None = None
+
+    async def start(self) -> None:
+        """启动进程并等待其响应 PING"""
+        path = shutil.which(self.executable)
+        # 卫语句：找不到可执行文件
+        if path is None:
+            raise FileNotFoundError(
+                f"找不到 redis-server 可执行文件: {self.executable}，"
+                "请安装 Redis 或通过 --redis-server 指定路径"
+            )
+
+        self._process = subprocess.Popen(
+            [
+                path,
+                "--bind", self.host,
+                "--port", str(self.port),
+                "--save", "",
+                "--appendonly", "no",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        client = aioredis.Redis(host=self.host, port=self.port)
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        try:
+            while True:
+                try:
+                    await client.ping()
+                    break
+                except aioredis.ConnectionError:
+                    if self._process.poll() is not None:
+                        raise RuntimeError(
+                            f"redis-server 启动失败, exit_code={self._process.returncode}"
+                        ) from None
+                    if time.monotonic() > deadline:
+                        raise TimeoutError("等待 redis-server 就绪超时") from None
+                    await asyncio.sleep(0.05)
+        finally:
+            await client.aclose()
+        logger.info(f"本地 redis-server 已启动, port={self.port}")
+
+    def stop(self) -> None:
+        """终止进程"""
+        # 卫语句：未启动或已退出
+        if self._process is None or self._process.poll() is not None:
+            return
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+
+    async def __aenter__(self) -> "LocalRedisServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+@dataclass
+class BenchOptions:
+    """基准测试参数"""
+
+    # 每个场景生产的消息数
+    messages: int = 10000
+    # 负载填充字节数
+    payload_size: int = 128
+    # 批量生产时同时发出的 produce 调用数
+    batch_size: int = 100
+    # 消费场景的工作协程数
+    max_workers: int = 10
+    # 端到端延迟场景的生产速率（条/秒），避免测成排队时间
+    latency_rate: int = 1000
+    # 延时触发精度场景的消息数与延时（秒）
+    delay_messages: int = 200
+    delay: float = 2.0
+    # 扩展性场景的取值
+    workers_scale: list[int] = field(default_factory=lambda: [1, 5, 10, 20])
+    topics_scale: list[int] = field(default_factory=lambda: [1, 4, 16])
+    payload_scale: list[int] = field(default_factory=lambda: [64, 1024, 16384])
+    scenarios: list[str] = field(default_factory=lambda: list(SCENARIOS))
+
+
+class BenchRunner:
+    """
+    基准测试执行器
+
+    每个场景使用独立的队列前缀，结束后删除该前缀下的所有键，场景之间互不影响
+    """
+
+    def __init__(self, host: str, port: int, options: BenchOptions) -> None:
+        """
+        Args:
+            host: Redis 地址
+            port: Redis 端口
+            options: 基准测试参数
+        """
+        self.host = host
+        self.port = port
+        self.options = options
+        self.redis = aioredis.Redis(host=host, port=port, decode_responses=True)
+
+    async def run(self) -> dict[str, Any]:
+        """
+        依次执行选中的场景
+
+        Returns:
+            包含环境信息、参数和各场景结果的字典
+        """
+        from . import __version__
+
+        server_info = await self.redis.info("server")
+        report: dict[str, Any] = {
+            "mx_rmq_version": __version__,
+            "python_version": platform.python_version(),
+            "redis_version": server_info.get("redis_version"),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "options": asdict(self.options),
+            "results": {},
+        }
+        try:
+            for scenario in self.options.scenarios:
+                logger.info(f"开始基准测试场景, scenario={scenario}")
+                started = time.perf_counter()
+                result = await getattr(self, f"bench_{scenario}")()
+                result["duration_s"] = round(time.perf_counter() - started, 3)
+                report["results"][scenario] = result
+                logger.info(f"基准测试场景完成, scenario={scenario}, result={result}")
+        finally:
+            await self.redis.aclose()
+        return report
+
+    # ==================== 场景 ====================
+
+    async def bench_produce(self) -> dict[str, Any]:
+        """生产吞吐：逐条等待与批量并发两种方式"""
+        opts = self.options
+        payload = self._payload(opts.payload_size)
+        result: dict[str, Any] = {}
+
+        async with self._queue() as queue:
+            started = time.perf_counter()
+            for _ in range(opts.messages):
+                await queue.produce("bench", payload)
+            result["single"] = self._rate(opts.messages, started)
+
+        async with self._queue() as queue:
+            result["batched"] = await self._produce_batched(
+                queue, ["bench"], opts.messages, payload
+            )
+            result["batched"]["batch_size"] = opts.batch_size
+        return result
+
+    async def bench_latency(self) -> dict[str, Any]:
+        """端到端延迟：按固定速率生产，记录生产到处理器开始执行的时间"""
+        opts = self.options
+        samples: list[float] = []
+        done = asyncio.Event()
+
+        async def handler(payload: dict) -> None:
+            samples.append(time.time() - payload["sent"])
+            if len(samples) >= opts.messages:
+                done.set()
+
+        async with self._queue(max_workers=opts.max_workers) as queue:
+            queue.register_handler("bench", handler)
+            await queue.start_background()
+            interval = 1 / opts.latency_rate
+            started = time.monotonic()
+            for i in range(opts.messages):
+                # 按计划时间发出，落后时不补偿休眠
+                wait = started + i * interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                await queue.produce(
+                    "bench", {"sent": time.time(), "pad": "x" * opts.payload_size}
+                )
+            await self._wait(done)
+
+        return {"rate": opts.latency_rate, "latency": summarize(samples)}
+
+    async def bench_delay(self) -> dict[str, Any]:
+        """延时触发精度：处理器开始执行时间与预期投递时间之差"""
+        opts = self.options
+        lateness: list[float] = []
+        done = asyncio.Event()
+
+        async def handler(payload: dict) -> None:
+            lateness.append(time.time() - payload["due"])
+            if len(lateness) >= opts.delay_messages:
+                done.set()
+
+        async with self._queue(max_workers=opts.max_workers) as queue:
+            queue.register_handler("bench", handler)
+            await queue.start_background()
+            for _ in range(opts.delay_messages):
+                await queue.produce(
+                    "bench", {"due": time.time() + opts.delay}, delay=opts.delay
+                )
+            await self._wait(done, opts.delay)
+
+        early = sum(1 for value in lateness if value < 0)
+        return {
+            "delay_s": opts.delay,
+            "early": early,
+            "lateness": summarize([max(value, 0.0) for value in lateness]),
+        }
+
+    async def bench_ack(self) -> dict[str, Any]:
+        """确认吞吐：预先积压消息，测量分发、处理和完成确认的速率"""
+        opts = self.options
+        return await self._consume_backlog(
+            opts.max_workers, 1, opts.payload_size, opts.messages
+        )
+
+    async def bench_memory(self) -> dict[str, Any]:
+        """每条消息的 Redis 内存占用：积压消息后统计各键的 MEMORY USAGE"""
+        opts = self.options
+        async with self._queue() as queue:
+            before = (await self.redis.info("memory"))["used_memory"]
+            await self._produce_batched(
+                queue, ["bench"], opts.messages, self._payload(opts.payload_size)
+            )
+            after = (await self.redis.info("memory"))["used_memory"]
+
+            keys: dict[str, int] = {}
+            prefix = f"{queue.config.queue_prefix}:"
+            async for key in self.redis.scan_iter(match=f"{prefix}*", count=1000):
+                usage = await self.redis.memory_usage(key, samples=0)
+                keys[key.removeprefix(prefix)] = usage or 0
+
+        total = sum(keys.values())
+        return {
+            "payload_size": opts.payload_size,
+            "messages": opts.messages,
+            "keys_bytes": dict(sorted(keys.items())),
+            "bytes_per_message": round(total / opts.messages, 1),
+            "used_memory_per_message": round((after - before) / opts.messages, 1),
+        }
+
+    async def bench_scaling(self) -> dict[str, Any]:
+        """扩展性：分别改变工作协程数、主题数和负载大小时的生产与确认吞吐"""
+        opts = self.options
+        result: dict[str, list[dict[str, Any]]] = {
+            "max_workers": [],
+            "topics": [],
+            "payload_size": [],
+        }
+        for workers in opts.workers_scale:
+            point = await self._consume_backlog(
+                workers, 1, opts.payload_size, opts.messages
+            )
+            result["max_workers"].append({"max_workers": workers, **point})
+        for topics in opts.topics_scale:
+            point = await self._consume_backlog(
+                opts.max_workers, topics, opts.payload_size, opts.messages
+            )
+            result["topics"].append({"topics": topics, **point})
+        for size in opts.payload_scale:
+            point = await self._consume_backlog(
+                opts.max_workers, 1, size, opts.messages
+            )
+            result["payload_size"].append({"payload_size": size, **point})
+        return result
+
+    # ==================== 工具方法 ====================
+
+    def _queue(self, max_workers: int = 1) -> "_BenchQueue":
+        """创建使用独立前缀的队列，退出时停止队列并删除该前缀下的键"""
+        config = MQConfig(
+            redis_host=self.host,
+            redis_port=self.port,
+            queue_prefix=f"{BENCH_PREFIX}_{uuid.uuid4().hex[:8]}",
+            max_workers=max_workers,
+            task_queue_size=max(max_workers * 2, MIN_TASK_QUEUE_SIZE),
+        )
+        return _BenchQueue(RedisMessageQueue(config), self.redis)
+
+    async def _produce_batched(
+        self,
+        queue: RedisMessageQueue,
+        topics: list[str],
+        count: int,
+        payload: dict[str, Any],
+    ) -> dict[str, Any]:
+        """每批同时发出 batch_size 个 produce 调用，主题轮流使用"""
+        batch_size = self.options.batch_size
+        started = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            await asyncio.gather(
+                *(
+                    queue.produce(topics[i % len(topics)], payload)
+                    for i in range(offset, min(offset + batch_size, count))
+                )
+            )
+        return self._rate(count, started)
+
+    async def _consume_backlog(
+        self, max_workers: int, topic_count: int, payload_size: int, count: int
+    ) -> dict[str, Any]:
+        """积压 count 条消息后启动消费，测量全部处理完成的速率"""
+        topics = [f"bench_{i}" for i in range(topic_count)]
+        handled = 0
+        done = asyncio.Event()
+
+        async def handler(payload: dict) -> None:
+            nonlocal handled
+            handled += 1
+            if handled >= count:
+                done.set()
+
+        async with self._queue(max_workers=max_workers) as queue:
+            produce = await self._produce_batched(
+                queue, topics, count, self._payload(payload_size)
+            )
+            for topic in topics:
+                queue.register_handler(topic, handler)
+            started = time.perf_counter()
+            await queue.start_background()
+            await self._wait(done)
+            ack = self._rate(handled, started)
+
+        return {"produce": produce, "ack": ack, "completed": handled}
+
+    async def _wait(self, done: asyncio.Event, extra: float = 0.0) -> None:
+        """等待消费完成，超时只记录警告，结果中保留已完成数量"""
+        try:
+            await asyncio.wait_for(done.wait(), timeout=CONSUME_TIMEOUT + extra)
+        except asyncio.TimeoutError:
+            logger.warning(f"等待消费完成超时, timeout={CONSUME_TIMEOUT + extra}")
+
+    @staticmethod
+    def _payload(size: int) -> dict[str, Any]:
+        """指定填充字节数的负载"""
+        return {"pad": "x" * size}
+
+    @staticmethod
+    def _rate(count: int, started: float) -> dict[str, Any]:
+        """从开始时间（time.perf_counter）到现在的吞吐"""
+        elapsed = time.perf_counter() - started
+        return {
+            "messages": count,
+            "elapsed_s": round(elapsed, 3),
+            "messages_per_second": round(count / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+class _BenchQueue:
+    """场景内使用的队列：退出时停止消费、关闭连接并删除该前缀下的所有键"""
+
+    def __init__(self, queue: RedisMessageQueue, redis: aioredis.Redis) -> None:
+        self.queue = queue
+        self.redis = redis
+
+    async def __aenter__(self) -> RedisMessageQueue:
+        await self.queue.initialize()
+        return self.queue
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        if self.queue.is_running():
+            await self.queue.stop()
+        else:
+            await self.queue.cleanup()
+
+        prefix = self.queue.config.queue_prefix
+        keys = [
+            key async for key in self.redis.scan_iter(match=f"{prefix}:*", count=1000)
+        ]
+        for offset in range(0, len(keys), 1000):
+            await self.redis.unlink(*keys[offset : offset + 1000])
+
+
+async def run_benchmark(
+    options: BenchOptions,
+    redis_host: str | None = None,
+    redis_port: int = 6379,
+    redis_server: str = "redis-server",
+) -> dict[str, Any]:
+    """
+    执行基准测试
+
+    Args:
+        options: 基准测试参数
+        redis_host: 使用已有的 Redis，None 时启动本地临时 redis-server
+        redis_port: 已有 Redis 的端口
+        redis_server: 本地 redis-server 可执行文件
+
+    Returns:
+        基准测试报告
+    """
+    if redis_host is not None:
+        return await BenchRunner(redis_host, redis_port, options).run()
+
+    async with LocalRedisServer(redis_server) as server:
+        return await BenchRunner(server.host, server.port, options).run()
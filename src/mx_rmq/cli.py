@@ -0,0 +1,186 @@
+"""
+命令行入口
+
+    mx-rmq bench [选项]    在本地临时 redis-server 上运行基准测试，输出 JSON 报告
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+from loguru import logger
+
+from .bench import SCENARIOS, BenchOptions, run_benchmark
+
+
+def _int_list(value: str) -> list[int]:
+    """解析逗号分隔的整数列表"""
+    try:
+        items = [int(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"需要逗号分隔的整数: {value!r}") from None
+    if not items or any(item < 1 for item in items):
+        raise argparse.ArgumentTypeError(f"取值必须为正整数: {value!r}")
+    return items
+
+
+def _scenario_list(value: str) -> list[str]:
+    """解析逗号分隔的场景列表"""
+    items = [item.strip() for item in value.split(",") if item.strip()]
+    unknown = [item for item in items if item not in SCENARIOS]
+    if not items or unknown:
+        raise argparse.ArgumentTypeError(
+            f"未知的场景: {', '.join(unknown) or value!r}，可选: {', '.join(SCENARIOS)}"
+        )
+    return items
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog="mx-rmq", description="MX-RMQ 命令行工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    defaults = BenchOptions()
+    bench = subparsers.add_parser(
+        "bench",
+        help="运行基准测试",
+        description="在本地临时 redis-server（或 --redis-host 指定的 Redis）上运行基准测试，"
+        "输出 JSON 报告",
+    )
+    bench.add_argument(
+        "--scenarios",
+        type=_scenario_list,
+        default=defaults.scenarios,
+        help=f"逗号分隔的场景，默认全部: {','.join(SCENARIOS)}",
+    )
+    bench.add_argument(
+        "--messages", type=int, default=defaults.messages, help="每个场景的消息数"
+    )
+    bench.add_argument(
+        "--payload-size",
+        type=int,
+        default=defaults.payload_size,
+        help="负载填充字节数",
+    )
+    bench.add_argument(
+        "--batch-size",
+        type=int,
+        default=defaults.batch_size,
+        help="批量生产时同时发出的 produce 调用数",
+    )
+    bench.add_argument(
+        "--max-workers",
+        type=int,
+        default=defaults.max_workers,
+        help="消费场景的工作协程数",
+    )
+    bench.add_argument(
+        "--latency-rate",
+        type=int,
+        default=defaults.latency_rate,
+        help="端到端延迟场景的生产速率（条/秒）",
+    )
+    bench.add_argument(
+        "--delay-messages",
+        type=int,
+        default=defaults.delay_messages,
+        help="延时触发精度场景的消息数",
+    )
+    bench.add_argument(
+        "--delay", type=float, default=defaults.delay, help="延时触发精度场景的延时（秒）"
+    )
+    bench.add_argument(
+        "--workers-scale",
+        type=_int_list,
+        default=defaults.workers_scale,
+        help="扩展性场景的工作协程数取值，逗号分隔",
+    )
+    bench.add_argument(
+        "--topics-scale",
+        type=_int_list,
+        default=defaults.topics_scale,
+        help="扩展性场景的主题数取值，逗号分隔",
+    )
+    bench.add_argument(
+        "--payload-scale",
+        type=_int_list,
+        default=defaults.payload_scale,
+        help="扩展性场景的负载字节数取值，逗号分隔",
+    )
+    bench.add_argument(
+        "--redis-server",
+        default="redis-server",
+        help="本地 redis-server 可执行文件，默认从 PATH 查找",
+    )
+    bench.add_argument(
+        "--redis-host", default=None, help="使用已有的 Redis 而不启动本地进程"
+    )
+    bench.add_argument("--redis-port", type=int, default=6379, help="已有 Redis 的端口")
+    bench.add_argument(
+        "--output", "-o", default=None, help="JSON 报告写入的文件，默认输出到标准输出"
+    )
+    bench.add_argument(
+        "--log-level", default="WARNING", help="库内部日志级别，进度日志始终输出"
+    )
+    return parser
+
+
+def _bench(args: argparse.Namespace) -> int:
+    """执行 bench 子命令"""
+    options = BenchOptions(
+        messages=args.messages,
+        payload_size=args.payload_size,
+        batch_size=args.batch_size,
+        max_workers=args.max_workers,
+        latency_rate=args.latency_rate,
+        delay_messages=args.delay_messages,
+        delay=args.delay,
+        workers_scale=args.workers_scale,
+        topics_scale=args.topics_scale,
+        payload_scale=args.payload_scale,
+        scenarios=args.scenarios,
+    )
+
+    # 进度日志输出到标准错误，库内部逐条消息日志按 --log-level 过滤
+    log_level = args.log_level.upper()
+    logger.remove()
+    logger.add(
+        sys.stderr,
+        level=min(logger.level("INFO").no, logger.level(log_level).no),
+        filter={
+            "": log_level,
+            "mx_rmq.bench": "INFO",
+            "mx_rmq.cli": "INFO",
+        },
+        format="{time:HH:mm:ss.SSS} | {level: <8} | {message}",
+    )
+
+    try:
+        report = asyncio.run(
+            run_benchmark(options, args.redis_host, args.redis_port, args.redis_server)
+        )
+    except (FileNotFoundError, RuntimeError, TimeoutError) as e:
+        logger.error(str(e))
+        return 1
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        logger.info(f"基准测试报告已写入 {args.output}")
+    else:
+        print(output)
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    """命令行入口"""
+    args = build_parser().parse_args(argv)
+    if args.command == "bench":
+        return _bench(args)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,8 @@ from typing import Any
 
 from pydantic import BaseModel, Field, field_validator
 
+from .log_config import SAMPLED_LOG_EVENTS
+
 
 class MQConfig(BaseModel):
     """消息队列配置类"""
@@ -30,7 +32,37 @@ class MQConfig(BaseModel):
     # 消费者配置
     max_workers: int = Field(default=5, ge=1, le=50, description="最大工作协程数")
     task_queue_size: int = Field(
-        default=8, ge=5, le=300, description="本地任务队列大小"
+        default=8, ge=5, le=300, description="本地任务队列大小（每个topic独立计算）"
+    )
+    topic_weights: dict[str, int] = Field(
+        default_factory=dict,
+        description="主题调度权重，如 {'payments': 4, 'reports': 1}，未配置的主题权重为1",
+    )
+    topic_max_inflight: dict[str, int] = Field(
+        default_factory=dict,
+        description="主题最大同时处理数，如 {'reports': 2}，未配置的主题不限制",
+    )
+    topic_workers: dict[str, int] = Field(
+        default_factory=dict,
+        description="主题专属工作协程数，如 {'partner_api': 4}，配置后该主题只由专属协程处理",
+    )
+    topic_prefetch: dict[str, int] = Field(
+        default_factory=dict,
+        description="主题预取数量（本地子队列容量），如 {'bulk': 200}，未配置的主题使用 task_queue_size",
+    )
+
+    # 自适应并发配置
+    adaptive_concurrency: bool = Field(
+        default=False,
+        description="是否启用自适应并发：按处理延迟和错误率以AIMD方式调整各主题并发上限和预取数量，配置了 topic_prefetch 的主题预取数量不超过配置值",
+    )
+    adaptive_min_concurrency: int = Field(
+        default=1, ge=1, description="自适应并发上限的最小值"
+    )
+    adaptive_latency_tolerance: float = Field(
+        default=2.0,
+        ge=1.0,
+        description="处理延迟超过基线延迟的倍数时判定下游拥塞并减小并发",
     )
 
     # 消息生命周期配置
@@ -47,15 +79,51 @@ class MQConfig(BaseModel):
 
     # 重试配置
     max_retries: int = Field(default=3, ge=0, le=10, description="最大重试次数")
-    retry_delays: list[int] = Field(
+    retry_delays: list[int | float] = Field(
         default_factory=lambda: [60, 300, 1800],  # 1分钟、5分钟、30分钟
-        description="重试延迟间隔（秒）",
+        description="重试延迟间隔（秒），支持小数（如0.1表示100毫秒）",
     )
 
     # 延时任务配置
     delay_fallback_interval: int = Field(
         default=30, ge=10, le=300, description="延时任务兜底检查间隔（秒）"
     )
+    delay_wakeup_mode: str = Field(
+        default="pubsub",
+        description="延时调度唤醒方式：pubsub（订阅通知+兜底轮询）或 blocking（阻塞等待唤醒令牌+兜底轮询）",
+    )
+    delay_promote_max_batch: int = Field(
+        default=5000,
+        ge=10,
+        le=50000,
+        description="延时消息单次提升的最大批量，到期洪峰时批量从batch_size自适应增长到该上限",
+    )
+    delay_bucket_horizon: int = Field(
+        default=0,
+        ge=0,
+        description="近期延时窗口（秒），超出窗口的延时消息先写入粗粒度时间桶，0表示不分桶。"
+        "时间桶键名由Lua脚本动态生成，仅支持单节点Redis（含主从/哨兵），不支持Redis Cluster",
+    )
+    delay_bucket_size: int = Field(
+        default=3600, ge=60, le=86400, description="延时时间桶跨度（秒）"
+    )
+
+    # 优先级配置
+    priority_dequeue_mode: str = Field(
+        default="strict",
+        description="优先级出队方式：strict（严格按优先级）或 weighted（按权重抽取，低优先级不会饿死）",
+    )
+    dispatch_mode: str = Field(
+        default="per_topic",
+        description="分发方式：per_topic（每个topic一个阻塞连接）或 multiplexed（所有topic共用一个阻塞连接）",
+    )
+
+    # 请求/回复配置
+    rpc_reply_ttl: int = Field(
+        default=300,
+        ge=1,
+        description="RPC回复队列过期时间（秒），调用方实例退出后未读取的回复自动清理",
+    )
 
     # 监控配置
     monitor_interval: int = Field(default=30, ge=5, description="监控检查间隔（秒）")
@@ -66,9 +134,37 @@ class MQConfig(BaseModel):
         default=60, ge=30, description="处理中队列监控间隔（秒）"
     )
     batch_size: int = Field(default=100, ge=10, le=1000, description="批处理大小")
+    metrics_port: int | None = Field(
+        default=None,
+        ge=1,
+        le=65535,
+        description="Prometheus指标HTTP端点端口（GET /metrics），None表示不启动",
+    )
+    metrics_host: str = Field(default="0.0.0.0", description="Prometheus指标端点监听地址")
+    runtime_monitor_interval: float = Field(
+        default=0.5,
+        ge=0,
+        le=60,
+        description="事件循环延迟与本地队列占用的采样间隔（秒），0表示不启动采样协程",
+    )
+    tracing_enabled: bool = Field(
+        default=False,
+        description="启用OpenTelemetry链路追踪（需安装 mx-rmq[otel]），追踪上下文随消息元数据传播",
+    )
+    metrics_bucket_minutes: int = Field(
+        default=0,
+        ge=0,
+        le=1440,
+        description="服务端计数器按分钟分桶保留的分钟数，用于计算近期速率，0表示只维护累计计数",
+    )
 
     # 日志配置
     log_level: str = Field(default="INFO", description="日志级别")
+    log_sample_rates: dict[str, int] = Field(
+        default_factory=dict,
+        description="逐条消息日志的采样率，如 {'produce': 100} 表示每100条记录1条，"
+        "可采样的事件：produce / publish / complete / retry，未配置的事件全部记录",
+    )
 
     # 错误队列配置
     parse_error_ttl_days: int = Field(
@@ -106,9 +202,49 @@ class MQConfig(BaseModel):
             )
         return v
 
+    @field_validator(
+        "topic_weights", "topic_max_inflight", "topic_workers", "topic_prefetch"
+    )
+    @classmethod
+    def validate_topic_limits(cls, v: dict[str, int]) -> dict[str, int]:
+        """验证主题级别的权重、并发和预取配置必须为正整数"""
+        for topic, value in v.items():
+            if value < 1:
+                raise ValueError(f"主题 {topic} 的配置值必须大于等于1，当前为 {value}")
+        return v
+
+    @field_validator("log_sample_rates")
+    @classmethod
+    def validate_log_sample_rates(cls, v: dict[str, int]) -> dict[str, int]:
+        """验证日志采样事件名称和采样率"""
+        for event, rate in v.items():
+            if event not in SAMPLED_LOG_EVENTS:
+                raise ValueError(
+                    f"不支持采样的日志事件: {event}，可选: {', '.join(SAMPLED_LOG_EVENTS)}"
+                )
+            if rate < 1:
+                raise ValueError(f"日志事件 {event} 的采样率必须大于等于1，当前为 {rate}")
+        return v
+
+    @field_validator("delay_bucket_size")
+    @classmethod
+    def validate_delay_bucket_size(cls, v: int, info: Any) -> int:
+        """验证时间桶跨度不超过近期延时窗口"""
+        # 卫语句：没有窗口信息或未启用分桶则直接返回
+        horizon = info.data.get("delay_bucket_horizon") if hasattr(info, "data") else None
+        if not horizon:
+            return v
+
+        # 卫语句：桶跨度大于窗口时，桶的提升时间可能早于写入时间
+        if v > horizon:
+            raise ValueError(
+                f"delay_bucket_size ({v}) 不能大于 delay_bucket_horizon ({horizon})"
+            )
+        return v
+
     @field_validator("retry_delays")
     @classmethod
-    def validate_retry_delays(cls, v: list[int]) -> list[int]:
+    def validate_retry_delays(cls, v: list[int | float]) -> list[int | float]:
         """验证重试延迟配置"""
         # 卫语句：列表为空时抛出异常
         if not v:
@@ -120,6 +256,33 @@ class MQConfig(BaseModel):
 
         return v
 
+    @field_validator("delay_wakeup_mode")
+    @classmethod
+    def validate_delay_wakeup_mode(cls, v: str) -> str:
+        """验证延时调度唤醒方式"""
+        valid_modes = ["pubsub", "blocking"]
+        if v.lower() not in valid_modes:
+            raise ValueError(f"延时调度唤醒方式必须是: {', '.join(valid_modes)}")
+        return v.lower()
+
+    @field_validator("priority_dequeue_mode")
+    @classmethod
+    def validate_priority_dequeue_mode(cls, v: str) -> str:
+        """验证优先级出队方式"""
+        valid_modes = ["strict", "weighted"]
+        if v.lower() not in valid_modes:
+            raise ValueError(f"优先级出队方式必须是: {', '.join(valid_modes)}")
+        return v.lower()
+
+    @field_validator("dispatch_mode")
+    @classmethod
+    def validate_dispatch_mode(cls, v: str) -> str:
+        """验证分发方式"""
+        valid_modes = ["per_topic", "multiplexed"]
+        if v.lower() not in valid_modes:
+            raise ValueError(f"分发方式必须是: {', '.join(valid_modes)}")
+        return v.lower()
+
     @field_validator("log_level")
     @classmethod
     def validate_log_level(cls, v: str) -> str:
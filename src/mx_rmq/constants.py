@@ -18,6 +18,16 @@ class GlobalKeys(str, Enum):
     # 延时任务相关
     DELAY_TASKS = "delays"  # ZSet: 全局延时任务队列
     DELAY_PUBSUB_CHANNEL = "delay:wake"  # PubSub: 延时任务唤醒通道
+    DELAY_WAKEUP_LIST = "delay:wake:list"  # List: 阻塞模式下的延时任务唤醒令牌
+    DELAY_BUCKETS = "delays:buckets"  # ZSet: 远期延时时间桶索引（score为桶起始时间）
+    DELAY_BUCKET_PREFIX = "delays:bucket"  # ZSet前缀: 远期延时时间桶，完整键为 前缀:桶起始时间
+
+    # 周期任务相关
+    SCHEDULES = "schedules"  # Hash: 周期任务定义及当前物化消息ID
+    SCHEDULE_NEXT = "schedules:next"  # ZSet: 周期任务已物化的触发时间
+
+    # 请求/回复相关
+    REPLY_PREFIX = "reply"  # List前缀: RPC回复队列，完整键为 前缀:实例ID
 
     # 死信队列相关
     DLQ_QUEUE = "dlq"  # List: 死信队列
@@ -34,8 +44,12 @@ class GlobalKeys(str, Enum):
 class TopicKeys(str, Enum):
     """主题相关键名枚举 - 每个topic都会有这些队列"""
 
-    PENDING = "pending"  # List: 待处理消息队列
+    PENDING = "pending"  # List: 待处理消息队列（默认优先级通道，其余优先级为 pending:{等级}）
     PROCESSING = "processing"  # List: 处理中消息队列
+    SIGNAL = "signal"  # List: 分发唤醒信号，有新消息进入任一优先级通道时写入
+    RATE_LIMIT = "ratelimit"  # Hash: 分布式令牌桶状态（tokens、ts）
+    ORDERING = "ordering"  # Hash: 顺序键 -> 在途消息ID；等待中的消息在 ordering:{顺序键} List 中
+    GROUPS = "groups"  # Set: 广播主题的订阅分组，每个分组的内部主题为 {topic}@{分组}
 
 
 class KeyNamespace:
@@ -56,6 +70,10 @@ class KeyNamespace:
         descriptions = {
             TopicKeys.PENDING: f"主题 {topic} 的待处理消息队列",
             TopicKeys.PROCESSING: f"主题 {topic} 的处理中消息队列",
+            TopicKeys.SIGNAL: f"主题 {topic} 的分发唤醒信号",
+            TopicKeys.RATE_LIMIT: f"主题 {topic} 的限流令牌桶",
+            TopicKeys.ORDERING: f"主题 {topic} 的顺序键在途消息",
+            TopicKeys.GROUPS: f"主题 {topic} 的广播订阅分组",
         }
         return descriptions.get(key_type, f"主题 {topic} 的 {key_type.value} 队列")
 
@@ -75,6 +93,11 @@ class KeyNamespace:
             GlobalKeys.EXPIRE_MONITOR: "全局过期监控ZSet",
             GlobalKeys.DELAY_TASKS: "全局延时任务ZSet",
             GlobalKeys.DELAY_PUBSUB_CHANNEL: "延时任务唤醒通知PubSub通道",
+            GlobalKeys.DELAY_WAKEUP_LIST: "延时任务唤醒令牌List",
+            GlobalKeys.DELAY_BUCKETS: "远期延时时间桶索引ZSet",
+            GlobalKeys.DELAY_BUCKET_PREFIX: "远期延时时间桶ZSet键前缀",
+            GlobalKeys.SCHEDULES: "周期任务定义Hash",
+            GlobalKeys.SCHEDULE_NEXT: "周期任务物化时间ZSet",
             GlobalKeys.DLQ_QUEUE: "死信队列List",
             GlobalKeys.DLQ_PAYLOAD_MAP: "死信队列消息存储Hash",
             GlobalKeys.PARSE_ERROR_QUEUE: "解析错误消息队列List",
@@ -2,17 +2,24 @@
 核心模块
 """
 
+from .concurrency import AdaptiveConcurrency, AIMDLimiter
 from .context import QueueContext
 from .consumer import ConsumerService
 from .dispatch import DispatchService, TaskItem
+from .fair_queue import FairTaskQueue
 from .lifecycle import MessageLifecycleService
+from .rpc import ReplyListener
 from .schedule import ScheduleService
 
 __all__ = [
+    "AdaptiveConcurrency",
+    "AIMDLimiter",
     "QueueContext",
     "ConsumerService",
     "DispatchService",
+    "FairTaskQueue",
     "MessageLifecycleService",
+    "ReplyListener",
     "ScheduleService",
     "TaskItem",
 ]
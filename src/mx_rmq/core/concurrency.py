@@ -0,0 +1,133 @@
+"""
+自适应并发控制模块
+"""
+
+from loguru import logger
+
+from .fair_queue import FairTaskQueue
+
+# 乘性减小系数：检测到拥塞时并发上限乘以该系数
+AIMD_DECREASE_FACTOR = 0.9
+# 短期延迟 EWMA 平滑系数
+LATENCY_EWMA_ALPHA = 0.2
+# 基线延迟回升速度：基线以该比例缓慢跟随较高的延迟，避免下游永久变慢后一直判定为拥塞
+BASELINE_DRIFT_ALPHA = 0.01
+
+
+class AIMDLimiter:
+    """AIMD（加性增、乘性减）并发限制器
+
+    每个成功且无拥塞的样本使上限增加 1/limit（约每轮增加1），
+    出错或短期延迟超过基线的 tolerance 倍时上限乘以 AIMD_DECREASE_FACTOR，
+    两次减小之间至少间隔一轮（limit 个样本），避免一次突发把上限压到最低。
+    """
+
+    def __init__(
+        self, min_limit: int, max_limit: int, latency_tolerance: float
+    ) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.latency_tolerance = latency_tolerance
+
+        self._limit = float(self.max_limit)
+        self._baseline: float | None = None
+        self._ewma: float | None = None
+        self._since_decrease = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def record(self, latency: float, success: bool) -> None:
+        """记录一次处理结果并调整上限
+
+        Args:
+            latency: 处理耗时（秒）
+            success: 是否处理成功
+        """
+        self._update_latency(latency)
+        self._since_decrease += 1
+
+        if not success or self._is_congested():
+            # 卫语句：距离上次减小不足一轮，不重复减小
+            if self._since_decrease < self.limit:
+                return
+            self._limit = max(self.min_limit, self._limit * AIMD_DECREASE_FACTOR)
+            self._since_decrease = 0
+            return
+
+        self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+    def _update_latency(self, latency: float) -> None:
+        if self._ewma is None or self._baseline is None:
+            self._ewma = self._baseline = latency
+            return
+
+        self._ewma += (latency - self._ewma) * LATENCY_EWMA_ALPHA
+        if latency < self._baseline:
+            self._baseline = latency
+        else:
+            self._baseline += (latency - self._baseline) * BASELINE_DRIFT_ALPHA
+
+    def _is_congested(self) -> bool:
+        if self._ewma is None or self._baseline is None:
+            return False
+        return self._ewma > self._baseline * self.latency_tolerance
+
+
+class AdaptiveConcurrency:
+    """按主题自适应调整本地任务队列的并发上限和预取数量"""
+
+    def __init__(
+        self,
+        task_queue: FairTaskQueue,
+        max_limits: dict[str, int],
+        default_max_limit: int,
+        min_limit: int,
+        latency_tolerance: float,
+    ) -> None:
+        """
+        Args:
+            task_queue: 本地公平任务队列
+            max_limits: 主题并发上限的最大值
+            default_max_limit: 未配置主题的并发上限最大值
+            min_limit: 并发上限的最小值
+            latency_tolerance: 延迟超过基线的倍数时判定为拥塞
+        """
+        self.task_queue = task_queue
+        self._max_limits = max_limits
+        self._default_max_limit = default_max_limit
+        self._min_limit = min_limit
+        self._latency_tolerance = latency_tolerance
+        self._limiters: dict[str, AIMDLimiter] = {}
+
+    def limit(self, topic: str) -> int:
+        """主题当前的并发上限"""
+        return self._get_limiter(topic).limit
+
+    def record(self, topic: str, latency: float, success: bool) -> None:
+        """记录主题的一次处理结果，上限变化时同步到本地任务队列"""
+        limiter = self._get_limiter(topic)
+        previous = limiter.limit
+        limiter.record(latency, success)
+
+        # 卫语句：上限未变化
+        if limiter.limit == previous:
+            return
+
+        self.task_queue.set_topic_limit(topic, limiter.limit)
+        logger.debug(
+            f"自适应并发上限调整, topic={topic}, limit={previous}->{limiter.limit}"
+        )
+
+    def _get_limiter(self, topic: str) -> AIMDLimiter:
+        limiter = self._limiters.get(topic)
+        if limiter is None:
+            limiter = AIMDLimiter(
+                self._min_limit,
+                self._max_limits.get(topic, self._default_max_limit),
+                self._latency_tolerance,
+            )
+            self._limiters[topic] = limiter
+            self.task_queue.set_topic_limit(topic, limiter.limit)
+        return limiter
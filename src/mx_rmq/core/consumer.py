@@ -3,65 +3,68 @@
 """
 
 import asyncio
+import time
+from typing import Any
 
 from loguru import logger
+from ..tracing import message_attributes
+from ..workflow import is_follow_up_result, resolve_follow_ups
+from .concurrency import AdaptiveConcurrency
 from .context import QueueContext
 from .dispatch import TaskItem
+from .fair_queue import FairTaskQueue
 from .lifecycle import MessageLifecycleService
+from .rpc import build_reply
 
 
 class ConsumerService:
     """消费者服务类"""
 
     def __init__(
-        self, context: QueueContext, task_queue: asyncio.Queue[TaskItem]
+        self,
+        context: QueueContext,
+        task_queue: FairTaskQueue | asyncio.Queue[TaskItem],
+        concurrency: AdaptiveConcurrency | None = None,
     ) -> None:
         self.context: QueueContext = context
-        self.task_queue: asyncio.Queue[TaskItem] = task_queue
+        self.task_queue: FairTaskQueue | asyncio.Queue[TaskItem] = task_queue
+        # 自适应并发控制器，未启用时为None
+        self.concurrency = concurrency
 
-    async def consume_messages(self) -> None:
-        """消费者协程"""
-        logger.info(f"启动消息消费者协程,协程 id:{id(asyncio.current_task())}")
+    async def consume_messages(self, topic: str | None = None) -> None:
+        """消费者协程
+
+        Args:
+            topic: 指定时作为该主题的专属工作协程，只处理该主题的任务
+        """
+        current_task = asyncio.current_task()
+        logger.info(
+            f"启动消息消费者协程,协程 id:{id(current_task)}, topic={topic or '*'}"
+        )
+        # 按协程名（consumer_{i} / consumer_{topic}_{i}）统计忙闲时间
+        worker_name = current_task.get_name() if current_task else f"consumer_{topic}"
+        worker_stats = self.context.metrics.runtime.worker(worker_name)
 
         while self.context.is_running():
             try:
-                logger.debug(
-                    f"等待获取【本地内存队列】任务, queue_size={self.task_queue.qsize()}"
+                logger.opt(lazy=True).debug(
+                    "等待获取【本地内存队列】任务, queue_size={queue_size}",
+                    queue_size=self.task_queue.qsize,
                 )
 
                 # 从本地队列获取任务 超时3秒 目的为了优雅关机
                 task_item: TaskItem = await asyncio.wait_for(
-                    self.task_queue.get(), timeout=3.0
+                    self._get_task(topic), timeout=3.0
                 )
 
-                topic = task_item.topic
-                message = task_item.message
-                message_id = message.id
-
-                logger.debug(f"消费者收到任务, topic={topic}, message_id={message_id}")
-
-                handler = self.context.handlers.get(topic)
-
-                # 卫语句：处理器不存在则跳过此消息
-                if not handler:
-                    logger.error(f"未找到处理器, topic={topic}")
-                    continue
-
-                # 标记消息为处理中
-                message.mark_processing()
-                handler_service = MessageLifecycleService(self.context)
-
+                worker_stats.begin()
                 try:
-                    # 执行业务逻辑
-                    await handler(message.payload)
-                    # 标记完成
-                    await handler_service.complete_message(message_id, topic)
-                    logger.debug(
-                        f"消息处理成功, message_id={message_id}, topic={topic}"
-                    )
-                except Exception as e:
-                    # 处理失败
-                    await handler_service.handle_message_failure(message, e)
+                    await self._handle_task(task_item)
+                finally:
+                    worker_stats.end()
+                    # 释放主题的在途名额，公平队列据此放行被限流的主题
+                    if isinstance(self.task_queue, FairTaskQueue):
+                        self.task_queue.task_done(task_item.topic)
 
             except TimeoutError:
                 logger.debug("消费者等待任务超时")
@@ -69,3 +72,102 @@ class ConsumerService:
             except Exception as e:
                 logger.error(f"消费者协程错误, error={e}")
                 await asyncio.sleep(1)
+
+    async def _get_task(self, topic: str | None) -> TaskItem:
+        """从本地队列获取任务，专属工作协程只获取所属主题的任务"""
+        if topic is not None and isinstance(self.task_queue, FairTaskQueue):
+            return await self.task_queue.get(topic)
+        return await self.task_queue.get()
+
+    async def _handle_task(self, task_item: TaskItem) -> None:
+        """执行单个任务的业务处理并更新消息状态"""
+        topic = task_item.topic
+        message = task_item.message
+        message_id = message.id
+
+        logger.debug(
+            "消费者收到任务, topic={topic}, message_id={message_id}",
+            topic=topic,
+            message_id=message_id,
+        )
+
+        handler = self.context.handlers.get(topic)
+
+        # 卫语句：处理器不存在则跳过此消息
+        if not handler:
+            logger.error(f"未找到处理器, topic={topic}")
+            return
+
+        # 处理 span 以生产端注入的追踪上下文为父上下文，完成、重试、死信都是它的子 span
+        with self.context.tracer.span(
+            f"{topic} process",
+            kind="consumer",
+            attributes=message_attributes(topic, message_id),
+            parent=message.meta.trace_context,
+        ) as span:
+            # 标记消息为处理中
+            message.mark_processing()
+            handler_service = MessageLifecycleService(self.context)
+
+            metrics = self.context.metrics
+            # 本地等待：分发到本地任务队列后等待空闲消费者的时间
+            metrics.record_stage_latency(
+                topic, "local_wait", time.time() - task_item.dispatched_at
+            )
+            start_time = time.monotonic()
+            try:
+                # 执行业务逻辑
+                result = await self._run_handler(handler, topic, message.payload)
+                handler_end = time.monotonic()
+                handler_time = handler_end - start_time
+                follow_ups = resolve_follow_ups(
+                    result, message.payload, self.context.get_chain(topic)
+                )
+                # 标记完成，RPC消息同时写入回复，工作流链的后续消息同时入队
+                reply = None
+                if message.reply_to:
+                    reply_result = None if is_follow_up_result(result) else result
+                    reply = build_reply(message_id, reply_result)
+                await handler_service.complete_message(
+                    message_id,
+                    topic,
+                    reply_to=message.reply_to,
+                    reply=reply,
+                    follow_ups=follow_ups,
+                )
+                metrics.record_message_completed(topic, handler_time)
+                metrics.record_stage_latency(
+                    topic, "ack", time.monotonic() - handler_end
+                )
+                if self.context.log_sampler.should_log("complete"):
+                    logger.debug(
+                        "消息处理成功, message_id={message_id}, topic={topic}, "
+                        "follow_ups={follow_ups}",
+                        message_id=message_id,
+                        topic=topic,
+                        follow_ups=len(follow_ups),
+                    )
+            except Exception as e:
+                # 处理失败
+                metrics.record_message_failed(
+                    topic, str(e), time.monotonic() - start_time
+                )
+                self.context.tracer.record_error(span, e)
+                await handler_service.handle_message_failure(message, e)
+
+    async def _run_handler(self, handler, topic: str, payload) -> Any:
+        """执行业务处理器并返回其结果，启用自适应并发时反馈处理耗时和结果"""
+        handler_name = getattr(handler, "__name__", repr(handler))
+        call = self.context.observe("handler", handler_name, handler(payload), topic)
+        # 卫语句：未启用自适应并发
+        if self.concurrency is None:
+            return await call
+
+        start_time = time.monotonic()
+        try:
+            result = await call
+        except Exception:
+            self.concurrency.record(topic, time.monotonic() - start_time, False)
+            raise
+        self.concurrency.record(topic, time.monotonic() - start_time, True)
+        return result
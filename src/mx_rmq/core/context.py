@@ -3,7 +3,7 @@
 """
 
 import asyncio
-from collections.abc import Callable
+from collections.abc import Awaitable, Callable
 from typing import Any
 
 import redis.asyncio as aioredis
@@ -11,6 +11,18 @@ from redis.commands.core import AsyncScript
 
 from ..config import MQConfig
 from ..constants import GlobalKeys, TopicKeys
+from ..hooks import CallHook, CallInfo, HookedScript, run_hooked
+from ..log_config import LogSampler
+from ..monitoring import MetricsCollector
+from ..message import (
+    DEFAULT_PRIORITY_LEVEL,
+    MAX_PRIORITY_LEVEL,
+    MIN_PRIORITY_LEVEL,
+    get_group_topic,
+    split_delivery_id,
+)
+from ..ratelimit import RateLimit
+from ..tracing import Tracer
 
 
 class QueueContext:
@@ -32,10 +44,23 @@ class QueueContext:
         """
         self.config = config
         self.redis = redis
-        self.lua_scripts = lua_scripts
+        # 启用链路追踪时每次脚本调用记录一个计时子 span
+        self._tracer = Tracer(config.tracing_enabled)
+        self.lua_scripts = {
+            name: self._tracer.wrap_script(name, script)
+            for name, script in lua_scripts.items()
+        }
+        # 调用剖析钩子，为空时脚本、Redis 命令和处理器调用都不经过回调
+        self._hooks: list[CallHook] = []
 
         # 消息处理器
         self.handlers: dict[str, Callable] = {}
+        # 主题限流参数，未配置的主题不限流
+        self.rate_limits: dict[str, RateLimit] = {}
+        # 广播订阅：分组内部主题 -> (广播主题, 分组名称)
+        self.subscriptions: dict[str, tuple[str, str]] = {}
+        # 工作流链：主题 -> 处理成功后投递的后续主题
+        self.chains: dict[str, tuple[str, ...]] = {}
 
         # 运行状态
         ## 优雅停机的复杂性 优雅停机不是瞬间完成的
@@ -51,32 +76,186 @@ class QueueContext:
         # 比如 对于notic 这个消息，其value为{"消息 1"：5，"消息 2":3} 
         self.stuck_messages_tracker: dict[str, dict[str, int]] = {}
 
+        self._metrics = MetricsCollector(
+            redis,
+            config.queue_prefix,
+            config.processing_timeout,
+            config.metrics_bucket_minutes,
+        )
+
+        # 逐条消息日志采样
+        self._log_sampler = LogSampler(config.log_sample_rates)
+
         # 活跃任务管理
         self.active_tasks: set[asyncio.Task] = set()
         
         self.shutdown_event = asyncio.Event()
 
 
+    @property
+    def metrics(self) -> MetricsCollector:
+        """本实例的运行指标，由分发、消费和生命周期服务在热路径上记录"""
+        return self._metrics
+
+    @property
+    def tracer(self) -> Tracer:
+        """链路追踪器，未启用时所有操作为空操作"""
+        return self._tracer
+
+    @property
+    def log_sampler(self) -> LogSampler:
+        """逐条消息日志采样器，按 config.log_sample_rates 决定是否记录"""
+        return self._log_sampler
+
+    @property
+    def hooks(self) -> tuple[CallHook, ...]:
+        """已注册的调用剖析钩子"""
+        return tuple(self._hooks)
+
+    def add_hook(self, hook: CallHook) -> None:
+        """
+        注册调用剖析钩子
+
+        注册第一个钩子时才把 Lua 脚本替换为带回调的包装，
+        未注册钩子时脚本调用没有任何额外开销
+
+        Args:
+            hook: 钩子对象
+        """
+        # 卫语句：重复注册
+        if hook in self._hooks:
+            return
+        self._hooks.append(hook)
+        if len(self._hooks) == 1:
+            self.lua_scripts = {
+                name: HookedScript(self._hooks, name, script)
+                for name, script in self.lua_scripts.items()
+            }
+
+    def remove_hook(self, hook: CallHook) -> None:
+        """
+        移除调用剖析钩子，移除最后一个钩子时恢复原脚本
+
+        Args:
+            hook: 钩子对象
+        """
+        # 卫语句：未注册
+        if hook not in self._hooks:
+            return
+        self._hooks.remove(hook)
+        if not self._hooks:
+            self.lua_scripts = {
+                name: script.script if isinstance(script, HookedScript) else script
+                for name, script in self.lua_scripts.items()
+            }
+
+    async def observe(
+        self,
+        kind: str,
+        name: str,
+        awaitable: Awaitable[Any],
+        topic: str | None = None,
+    ) -> Any:
+        """
+        等待一次调用，注册了剖析钩子时在其前后回调
+
+        Args:
+            kind: 调用类型（redis / handler）
+            name: Redis 命令名或处理器函数名
+            awaitable: 被观测的调用
+            topic: 消息主题
+
+        Returns:
+            调用结果
+        """
+        # 卫语句：未注册钩子
+        if not self._hooks:
+            return await awaitable
+        return await run_hooked(self._hooks, CallInfo(kind, name, topic), awaitable)
+
     def is_running(self) -> bool:
         """检查是否正在运行"""
         return self.running and not self.shutting_down
 
-    def register_handler(self, topic: str, handler: Callable) -> None:
+    def register_handler(
+        self,
+        topic: str,
+        handler: Callable,
+        rate_limit: str | None = None,
+        group: str | None = None,
+        then: str | list[str] | None = None,
+    ) -> None:
         """
         注册消息处理器
 
         Args:
             topic: 主题名称
             handler: 处理函数
+            rate_limit: 全局速率限制，如 "500/s"，所有消费实例共享
+            group: 广播订阅分组，指定时处理器注册到分组内部主题 {topic}@{group}
+            then: 工作流链的后续主题，处理成功后与完成确认原子地投递
         """
         from loguru import logger
 
         if not callable(handler):
             raise TypeError("处理器必须是可调用对象")
 
+        if group:
+            fanout_topic, topic = topic, get_group_topic(topic, group)
+            self.subscriptions[topic] = (fanout_topic, group)
+
         self.handlers[topic] = handler
+        if rate_limit:
+            self.rate_limits[topic] = RateLimit.parse(rate_limit)
+        else:
+            self.rate_limits.pop(topic, None)
+        if then:
+            self.chains[topic] = (then,) if isinstance(then, str) else tuple(then)
+        else:
+            self.chains.pop(topic, None)
         logger.info(f"消息处理器注册成功, topic={topic}, handler={handler.__name__}")
 
+    def get_chain(self, topic: str) -> tuple[str, ...]:
+        """
+        获取主题注册时声明的工作流链
+
+        Args:
+            topic: 主题名称
+
+        Returns:
+            后续主题，未声明时为空元组
+        """
+        return self.chains.get(topic, ())
+
+    async def load_message_json(self, message_id: str) -> str | None:
+        """
+        读取消息体
+
+        广播消息的分组投递没有独立消息体（重试前），读取共享的原始消息体，
+        与分组投递自身的字段在同一次 HMGET 中取回。原始消息没有引用计数时
+        说明不是广播消息，不读取共享消息体
+
+        Args:
+            message_id: 消息ID或分组投递ID
+
+        Returns:
+            消息体 JSON，消息已被清理时返回 None
+        """
+        payload_map = self.get_global_key(GlobalKeys.PAYLOAD_MAP)
+        base_id, group = split_delivery_id(message_id)
+        if group is None:
+            return await self.observe(
+                "redis", "hget", self.redis.hget(payload_map, message_id)  # type: ignore
+            )
+
+        fields = [message_id, base_id, f"{base_id}:refs"]
+        own_json, shared_json, refs = await self.observe(
+            "redis", "hmget", self.redis.hmget(payload_map, fields)  # type: ignore
+        )
+        if own_json or refs is None:
+            return own_json
+        return shared_json
+
     def get_global_key(self, key: GlobalKeys | str) -> str:
         """
         获取全局键名，自动添加队列前缀
@@ -92,6 +271,88 @@ class QueueContext:
             return f"{self.config.queue_prefix}:{key_value}"
         return key_value
 
+    def get_priority_lane_key(self, topic: str, level: int) -> str:
+        """
+        获取主题某个优先级通道的键名
+
+        默认优先级沿用原有的 pending 队列，其余优先级使用 pending:{等级}
+
+        Args:
+            topic: 主题名称
+            level: 数值优先级（0-9）
+
+        Returns:
+            优先级通道键名
+        """
+        pending_key = self.get_global_topic_key(topic, TopicKeys.PENDING)
+        if level == DEFAULT_PRIORITY_LEVEL:
+            return pending_key
+        return f"{pending_key}:{level}"
+
+    def get_priority_lane_arg(self, level: int) -> str:
+        """
+        获取写入 {message_id}:lane 字段的脚本参数
+
+        Args:
+            level: 数值优先级（0-9）
+
+        Returns:
+            默认优先级返回空串（不写入字段），其余返回等级字符串
+        """
+        if level == DEFAULT_PRIORITY_LEVEL:
+            return ""
+        return str(level)
+
+    def get_priority_lane_keys(self, topic: str) -> list[str]:
+        """
+        获取主题全部优先级通道键名，按优先级从高到低排列
+
+        Args:
+            topic: 主题名称
+
+        Returns:
+            优先级通道键名列表
+        """
+        return [
+            self.get_priority_lane_key(topic, level)
+            for level in range(MAX_PRIORITY_LEVEL, MIN_PRIORITY_LEVEL - 1, -1)
+        ]
+
+    def get_delay_wakeup_key(self) -> str:
+        """
+        获取延时调度唤醒目标键名
+
+        Returns:
+            pubsub 模式返回通知通道，blocking 模式返回唤醒令牌列表
+        """
+        if self.config.delay_wakeup_mode == "blocking":
+            return self.get_global_key(GlobalKeys.DELAY_WAKEUP_LIST)
+        return self.get_global_key(GlobalKeys.DELAY_PUBSUB_CHANNEL)
+
+    def get_delay_bucket_args(self) -> list[int | str]:
+        """
+        获取延时分桶相关的脚本参数
+
+        Returns:
+            [近期窗口毫秒数, 时间桶跨度毫秒数, 时间桶键前缀]
+        """
+        return [
+            self.config.delay_bucket_horizon * 1000,
+            self.config.delay_bucket_size * 1000,
+            self.get_global_key(GlobalKeys.DELAY_BUCKET_PREFIX),
+        ]
+
+    def get_counter_bucket_ttl(self) -> int:
+        """
+        获取服务端计数器分钟桶的过期秒数
+
+        Returns:
+            分钟桶过期秒数，0表示不分桶
+        """
+        minutes = self.config.metrics_bucket_minutes
+        # 多保留一分钟，读取完整窗口时最早的分钟桶尚未过期
+        return (minutes + 1) * 60 if minutes else 0
+
     def get_global_topic_key(self, topic: str, suffix: TopicKeys) -> str:
         """
         获取主题相关键名，自动添加队列前缀
@@ -3,38 +3,64 @@
 """
 
 import asyncio
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import json
+import random
 import time
+from typing import TYPE_CHECKING
 
 from loguru import logger
 from ..constants import GlobalKeys, TopicKeys
-from ..message import Message
+from ..message import MAX_PRIORITY_LEVEL, MIN_PRIORITY_LEVEL, Message
+from ..tracing import message_attributes
 from .context import QueueContext
 
+if TYPE_CHECKING:
+    from .fair_queue import FairTaskQueue
+
 
 BLMOVE_TIMEOUT = 5
 ERROR_MESSAGE_MAX_LENGTH = 20
 REDIS_FEATURE_SUPPORTED = "1"
 REDIS_FEATURE_NOT_SUPPORTED = "0"
 ERROR_RECOVERY_SLEEP_SECONDS = 1
+# 多主题复用分发时，每次被唤醒后单个主题最多连续分发的消息数，避免单个主题独占分发协程
+MULTIPLEXED_BURST_SIZE = 10
+# 多主题复用分发时，有主题因本地子队列已满被暂停时的最长阻塞等待秒数，到期后重新检查
+PARKED_RECHECK_SECONDS = 0.05
+
+# weighted 出队模式下各优先级通道的权重（按优先级从高到低），每高一级权重翻倍
+PRIORITY_LANE_WEIGHTS = [
+    2**level for level in range(MAX_PRIORITY_LEVEL, MIN_PRIORITY_LEVEL - 1, -1)
+]
 
 
 @dataclass
 class TaskItem:
     topic: str
     message: Message
+    # 消息移入processing队列后被本实例取到的时间戳（秒），用于计算本地等待时间
+    dispatched_at: float = field(default_factory=time.time)
 
 
 class DispatchService:
     """消息分发服务类"""
 
     def __init__(
-        self, context: QueueContext, task_queue: asyncio.Queue, connection_manager=None
+        self,
+        context: QueueContext,
+        task_queue: "FairTaskQueue",
+        connection_manager=None,
     ) -> None:
         self.context = context
         self.task_queue = task_queue
         self.connection_manager = connection_manager
+        # 各主题 dispatch_message.lua 的 KEYS 缓存：[processing, signal, ratelimit, 优先级通道...]
+        self._dispatch_keys: dict[str, list[str]] = {}
+        # 超出速率限制的主题及其令牌补充时间（time.monotonic）
+        self._throttled_until: dict[str, float] = {}
+        # 复用分发时本地子队列已满而暂停的主题，子队列腾出空间后恢复分发
+        self._parked: set[str] = set()
 
     async def dispatch_messages(self, topic: str) -> None:
         """消息分发协程
@@ -58,18 +84,11 @@ class DispatchService:
                 if not message_id:
                     continue
 
-                message = await self._parse_message(message_id, topic)
-                if not message:
-                    continue
-
-                if self.context.shutting_down:
-                    await self._return_message_to_pending(
-                        topic_processing_key, topic_pending_key
-                    )
+                if not await self._dispatch_fetched_message(
+                    message_id, topic, topic_processing_key
+                ):
                     break
 
-                await self._process_message(message_id, topic, message)
-
             except ConnectionError:
                 logger.info(f"Redis连接已关闭，无法继续分发消息, topic={topic}")
                 break
@@ -80,39 +99,260 @@ class DispatchService:
 
         logger.info(f"消息分发协程已停止, topic={topic}")
 
+    async def dispatch_multiplexed(self) -> None:
+        """多主题复用分发协程
+
+        所有主题共用一个阻塞连接：BLPOP 同时等待全部主题的分发唤醒信号，
+        被唤醒后通过 dispatch_message.lua 从对应主题的优先级通道原子地移动消息，
+        连接占用与主题数量无关。
+
+        共享的分发协程不会在本地任务队列上阻塞：从 Redis 移动消息前先检查主题子队列，
+        已满的主题暂停分发（消息留在优先级通道中），腾出空间后再恢复。
+        """
+        topics = list(self.context.handlers.keys())
+        signal_topics = {
+            self.context.get_global_topic_key(topic, TopicKeys.SIGNAL): topic
+            for topic in topics
+        }
+        signal_keys = list(signal_topics)
+        offset = 0
+        last_sweep = time.monotonic()
+
+        # 卫语句：没有注册任何topic
+        if not signal_keys:
+            return
+
+        logger.info(f"启动多主题复用分发协程, topics={len(topics)}")
+
+        while self.context.is_running():
+            try:
+                # 轮换等待顺序：BLPOP 优先返回靠前的键，轮换保证各主题公平
+                waiting_keys = signal_keys[offset:] + signal_keys[:offset]
+                offset = (offset + 1) % len(signal_keys)
+
+                signal = await self.context.observe(
+                    "redis",
+                    "blpop",
+                    self.context.redis.blpop(
+                        waiting_keys, timeout=self._multiplexed_wait_timeout()
+                    ),  # type: ignore
+                )
+
+                # 令牌已补充的限流主题、子队列已腾出空间的暂停主题，与被唤醒的主题一起分发
+                ready_topics = [
+                    *self._pop_unthrottled_topics(),
+                    *self._pop_unparked_topics(),
+                ]
+                burst_size = MULTIPLEXED_BURST_SIZE
+                if signal:
+                    # 仍有积压时 dispatch_message.lua 会补发信号，下一轮继续分发
+                    ready_topics.append(signal_topics[signal[0]])
+                elif time.monotonic() - last_sweep >= BLMOVE_TIMEOUT:
+                    # 超时兜底扫描全部主题，兼容未写入唤醒信号的旧版本生产者
+                    ready_topics = topics
+                    burst_size = 1
+                    last_sweep = time.monotonic()
+
+                for topic in dict.fromkeys(ready_topics):
+                    # 卫语句：仍在限流中的主题等待令牌补充后再分发
+                    if self._throttle_delay(topic) > 0:
+                        continue
+                    # 卫语句：本地子队列已满的主题暂停分发，不阻塞其他主题
+                    if self.task_queue.full(topic):
+                        self._parked.add(topic)
+                        continue
+                    if not await self._dispatch_burst(topic, burst_size):
+                        logger.info("多主题复用分发协程已停止")
+                        return
+
+            except ConnectionError:
+                logger.info("Redis连接已关闭，无法继续分发消息")
+                break
+            except Exception:
+                if not self.context.shutting_down:
+                    logger.exception("多主题复用分发错误")
+                await asyncio.sleep(ERROR_RECOVERY_SLEEP_SECONDS)
+
+        logger.info("多主题复用分发协程已停止")
+
+    async def _dispatch_burst(self, topic: str, burst_size: int) -> bool:
+        """从单个主题连续分发至多 burst_size 条消息
+
+        Returns:
+            False 表示正在停机，分发协程应退出
+        """
+        keys = self._get_dispatch_keys(topic)
+        for _ in range(burst_size):
+            # 卫语句：本地子队列已满，暂停该主题，消息留在优先级通道中
+            if self.task_queue.full(topic):
+                self._parked.add(topic)
+                return True
+            message_id = await self._move_from_lanes(topic, keys)
+            # 卫语句：主题已无待处理消息或超出速率限制
+            if not message_id:
+                return True
+            if not await self._dispatch_fetched_message(message_id, topic, keys[0]):
+                return False
+        return True
+
+    async def _dispatch_fetched_message(
+        self, message_id: str, topic: str, processing_key: str
+    ) -> bool:
+        """解析已移动到processing队列的消息并放入本地任务队列
+
+        Returns:
+            False 表示正在停机，消息已归还到优先级通道，分发协程应退出
+        """
+        message = await self._parse_message(message_id, topic)
+        if not message:
+            return True
+
+        if self.context.shutting_down:
+            await self._return_message_to_pending(
+                processing_key,
+                self.context.get_priority_lane_key(topic, message.get_priority_level()),
+            )
+            return False
+
+        with self.context.tracer.span(
+            f"{topic} receive",
+            kind="consumer",
+            attributes=message_attributes(topic, message.id),
+            parent=message.meta.trace_context,
+        ):
+            await self._process_message(message_id, topic, message)
+        return True
+
+    def _get_dispatch_keys(self, topic: str) -> list[str]:
+        """获取主题 dispatch_message.lua 的 KEYS（带缓存）"""
+        keys = self._dispatch_keys.get(topic)
+        if keys is None:
+            keys = [
+                self.context.get_global_topic_key(topic, TopicKeys.PROCESSING),
+                self.context.get_global_topic_key(topic, TopicKeys.SIGNAL),
+                self.context.get_global_topic_key(topic, TopicKeys.RATE_LIMIT),
+                *self.context.get_priority_lane_keys(topic),
+            ]
+            self._dispatch_keys[topic] = keys
+        return keys
+
     async def _fetch_message(
         self, topic: str, pending_key: str, processing_key: str
     ) -> str | None:
-        """从pending队列获取消息到processing队列"""
-        logger.debug(f"等待【Redis】消息分发，topic:{topic},pending_key:{pending_key}")
-
-        message_id = await self.context.redis.blmove(
-            pending_key,
-            processing_key,
-            timeout=BLMOVE_TIMEOUT,
-            src="RIGHT",
-            dest="LEFT",
-        )  # type: ignore
+        """从优先级通道获取消息到processing队列
 
-        if not message_id:
-            logger.debug(f"BLMOVE超时，无消息, topic={topic}")
-            return None
+        先通过 Lua 脚本按优先级非阻塞地取一条消息；所有通道都为空时，
+        阻塞等待分发唤醒信号后再取。信号只是提示，消息始终留在通道中，
+        即使进程在等待期间崩溃也不会丢失消息。
+        """
+        logger.debug(
+            "等待【Redis】消息分发，topic:{topic},pending_key:{pending_key}",
+            topic=topic,
+            pending_key=pending_key,
+        )
 
-        logger.debug(f"成功获取消息, topic={topic}, message_id={message_id}")
+        keys = self._get_dispatch_keys(topic)
+        signal_key = keys[1]
+
+        message_id = await self._move_from_lanes(topic, keys)
+        if not message_id:
+            # 卫语句：超出速率限制，等待令牌补充，消息留在通道中
+            throttle_delay = self._throttle_delay(topic)
+            if throttle_delay > 0:
+                await asyncio.sleep(throttle_delay)
+                return None
+
+            signal = await self.context.observe(
+                "redis",
+                "blpop",
+                self.context.redis.blpop([signal_key], timeout=BLMOVE_TIMEOUT),  # type: ignore
+            )
+            # 卫语句：超时也再尝试一次，兼容未写入唤醒信号的旧版本生产者
+            message_id = await self._move_from_lanes(topic, keys)
+            if not message_id:
+                if not signal:
+                    logger.debug("等待超时，无消息, topic={topic}", topic=topic)
+                return None
+
+        logger.debug(
+            "成功获取消息, topic={topic}, message_id={message_id}",
+            topic=topic,
+            message_id=message_id,
+        )
         return message_id
 
+    async def _move_from_lanes(self, topic: str, keys: list[str]) -> str | None:
+        """按优先级从通道中移动一条消息到processing队列
+
+        主题配置了速率限制且令牌不足时返回None，并记录令牌补充时间
+        """
+        rate_limit = self.context.rate_limits.get(topic)
+        result = await self.context.lua_scripts["dispatch_message"](
+            keys=keys,
+            args=[
+                self.context.config.priority_dequeue_mode,
+                random.random(),
+                rate_limit.rate if rate_limit else 0,
+                rate_limit.burst if rate_limit else 0,
+                *PRIORITY_LANE_WEIGHTS,
+            ],
+        )  # type: ignore
+
+        # 卫语句：超出速率限制时脚本返回需要等待的毫秒数
+        if isinstance(result, int):
+            self._throttled_until[topic] = time.monotonic() + result / 1000
+            logger.debug(
+                "超出速率限制, topic={topic}, wait_ms={wait_ms}", topic=topic, wait_ms=result
+            )
+            return None
+        return result
+
+    def _throttle_delay(self, topic: str) -> float:
+        """主题距离令牌补充还需等待的秒数，未限流时返回0"""
+        until = self._throttled_until.get(topic)
+        if until is None:
+            return 0
+        delay = until - time.monotonic()
+        if delay <= 0:
+            del self._throttled_until[topic]
+            return 0
+        return delay
+
+    def _pop_unthrottled_topics(self) -> list[str]:
+        """取出令牌已补充的限流主题"""
+        now = time.monotonic()
+        ready = [topic for topic, until in self._throttled_until.items() if until <= now]
+        for topic in ready:
+            del self._throttled_until[topic]
+        return ready
+
+    def _pop_unparked_topics(self) -> list[str]:
+        """取出本地子队列已腾出空间的暂停主题"""
+        ready = [topic for topic in self._parked if not self.task_queue.full(topic)]
+        self._parked.difference_update(ready)
+        return ready
+
+    def _multiplexed_wait_timeout(self) -> float:
+        """复用分发的阻塞等待时间：有限流主题时等到最早的令牌补充时间，
+        有暂停主题时定期醒来检查其子队列"""
+        timeout = PARKED_RECHECK_SECONDS if self._parked else BLMOVE_TIMEOUT
+        # 卫语句：没有限流中的主题
+        if not self._throttled_until:
+            return timeout
+        earliest = min(self._throttled_until.values()) - time.monotonic()
+        # BLPOP 超时为0表示永久阻塞，至少等待10毫秒
+        return min(timeout, max(0.01, earliest))
+
     async def _parse_message(self, message_id: str, topic: str) -> Message | None:
         """解析消息内容"""
-        payload_json = await self.context.redis.hget(
-            self.context.get_global_key(GlobalKeys.PAYLOAD_MAP), message_id
-        )  # type: ignore
+        payload_json = await self.context.load_message_json(message_id)
 
         if not payload_json:
             logger.info(f"消息体不存在, message_id={message_id}, topic={topic}")
             return None
 
         try:
-            return Message.model_validate_json(payload_json)
+            return Message.from_stored(payload_json, message_id)
         except (json.JSONDecodeError, ValueError) as e:
             await self._handle_parse_error(message_id, topic, payload_json, e)
             return None
@@ -122,6 +362,7 @@ class DispatchService:
     ) -> None:
         """处理消息解析错误"""
         logger.exception(f"消息格式错误, message_id={message_id}, topic={topic}")
+        self.context.metrics.record_parse_error(topic)
 
         try:
             error_message = str(error)[:ERROR_MESSAGE_MAX_LENGTH]
@@ -145,6 +386,7 @@ class DispatchService:
                     topic_processing_key,
                     self.context.get_global_key(GlobalKeys.EXPIRE_MONITOR),
                     self.context.get_global_key(GlobalKeys.PAYLOAD_MAP),
+                    self.context.get_global_key(GlobalKeys.METRICS),
                 ],
                 args=[
                     message_id,
@@ -155,6 +397,7 @@ class DispatchService:
                     ttl_days,
                     max_count,
                     supports_hexpire,
+                    self.context.get_counter_bucket_ttl(),
                 ],
             )
 
@@ -168,27 +411,50 @@ class DispatchService:
             topic_processing_key = self.context.get_global_topic_key(
                 topic, TopicKeys.PROCESSING
             )
-            await self.context.redis.lrem(topic_processing_key, 1, message_id)  # type: ignore
+            await self.context.observe(
+                "redis",
+                "lrem",
+                self.context.redis.lrem(topic_processing_key, 1, message_id),  # type: ignore
+            )
 
     async def _return_message_to_pending(
         self, processing_key: str, pending_key: str
     ) -> None:
         """将消息从processing队列返回到pending队列"""
-        await self.context.redis.lmove(
-            processing_key, pending_key, src="LEFT", dest="LEFT"
-        )  # type: ignore
+        await self.context.observe(
+            "redis",
+            "lmove",
+            self.context.redis.lmove(
+                processing_key, pending_key, src="LEFT", dest="LEFT"
+            ),  # type: ignore
+        )
 
     async def _process_message(
         self, message_id: str, topic: str, message: Message
     ) -> None:
         """处理正常消息"""
+        dispatched_at = time.time()
+        # 排队延迟：消息可投递（生产、延时到期或重试到期）到被分发的时间
+        self.context.metrics.record_stage_latency(
+            topic, "queue_lag", dispatched_at - message.get_ready_at() / 1000
+        )
         expire_time = (
-            int(time.time() * 1000) + self.context.config.processing_timeout * 1000
+            int(dispatched_at * 1000) + self.context.config.processing_timeout * 1000
         )
 
-        await self.context.redis.zadd(
-            self.context.get_global_key(GlobalKeys.EXPIRE_MONITOR),
-            {message_id: expire_time},
-        )  # type: ignore
+        await self.context.observe(
+            "redis",
+            "zadd",
+            self.context.redis.zadd(
+                self.context.get_global_key(GlobalKeys.EXPIRE_MONITOR),
+                {message_id: expire_time},
+            ),  # type: ignore
+        )
 
-        await self.task_queue.put(TaskItem(topic, message))
+        # 本地队列已满时分发协程在此等待，等待时间说明消费跟不上分发
+        put_started = time.monotonic()
+        await self.task_queue.put(TaskItem(topic, message, dispatched_at))
+        self.context.metrics.runtime.record_dispatch_blocked(
+            topic, time.monotonic() - put_started
+        )
+        self.context.metrics.record_message_consumed(topic)
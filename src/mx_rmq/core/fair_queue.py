@@ -0,0 +1,207 @@
+"""
+本地公平任务队列模块
+"""
+
+import asyncio
+from collections import deque
+
+from .dispatch import TaskItem
+
+
+class FairTaskQueue:
+    """按主题加权公平调度的本地任务队列
+
+    每个主题一个子队列，消费者按赤字轮询（Deficit Round Robin）从各主题取任务：
+    每轮主题获得与其权重相等的额度，每取一个任务消耗一个额度。
+    单个主题积压只会阻塞该主题自己的分发协程，不会挤占其他主题的位置。
+
+    配置了专属工作协程的主题不参与轮询，只能通过 get(topic) 取出。
+
+    接口与 asyncio.Queue 保持一致（put/get/qsize/empty/maxsize），
+    额外提供 task_done(topic) 用于释放主题的在途名额。
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        weights: dict[str, int] | None = None,
+        max_inflight: dict[str, int] | None = None,
+        capacities: dict[str, int] | None = None,
+        dedicated: set[str] | None = None,
+    ) -> None:
+        """
+        Args:
+            maxsize: 每个主题子队列的默认容量
+            weights: 主题权重，未配置的主题权重为1
+            max_inflight: 主题最大在途数（已取出未完成），未配置的主题不限制
+            capacities: 主题子队列容量（预取数量），未配置的主题使用 maxsize
+            dedicated: 由专属工作协程处理的主题
+        """
+        self.maxsize = maxsize
+        self._weights = dict(weights or {})
+        self._max_inflight = dict(max_inflight or {})
+        self._capacities = dict(capacities or {})
+        # 显式配置的预取数量，调整在途上限时作为子队列容量的上界
+        self._prefetch = dict(capacities or {})
+        self._dedicated = set(dedicated or ())
+
+        self._queues: dict[str, deque[TaskItem]] = {}
+        self._deficits: dict[str, int] = {}
+        self._inflight: dict[str, int] = {}
+        # 有待处理任务的主题，按轮询顺序排列，队首为当前服务的主题
+        self._active: deque[str] = deque()
+        self._size = 0
+
+        self._getters: list[asyncio.Future] = []
+        self._putters: list[asyncio.Future] = []
+
+    def qsize(self) -> int:
+        """所有主题的待处理任务总数"""
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def topic_qsize(self, topic: str) -> int:
+        """单个主题的待处理任务数"""
+        queue = self._queues.get(topic)
+        return len(queue) if queue else 0
+
+    def inflight(self, topic: str) -> int:
+        """单个主题的在途任务数"""
+        return self._inflight.get(topic, 0)
+
+    def capacity(self, topic: str) -> int:
+        """主题子队列容量"""
+        return self._capacities.get(topic, self.maxsize)
+
+    def full(self, topic: str) -> bool:
+        """主题子队列是否已满"""
+        return self.topic_qsize(topic) >= self.capacity(topic)
+
+    async def put(self, item: TaskItem) -> None:
+        """放入任务，主题子队列已满时等待"""
+        while self.full(item.topic):
+            await self._wait(self._putters)
+        self.put_nowait(item)
+
+    def put_nowait(self, item: TaskItem) -> None:
+        # 卫语句：主题子队列已满
+        if self.full(item.topic):
+            raise asyncio.QueueFull
+
+        queue = self._queues.setdefault(item.topic, deque())
+        if not queue and item.topic not in self._dedicated:
+            self._active.append(item.topic)
+        queue.append(item)
+        self._size += 1
+        self._notify(self._getters)
+
+    async def get(self, topic: str | None = None) -> TaskItem:
+        """取出任务，没有可取任务时等待
+
+        Args:
+            topic: 指定时只取该主题的任务（专属工作协程），否则按加权公平顺序取共享主题的任务
+        """
+        while True:
+            item = self._try_get(topic)
+            if item is not None:
+                return item
+            await self._wait(self._getters)
+
+    def get_nowait(self, topic: str | None = None) -> TaskItem:
+        item = self._try_get(topic)
+        # 卫语句：没有可取任务
+        if item is None:
+            raise asyncio.QueueEmpty
+        return item
+
+    def _try_get(self, topic: str | None = None) -> TaskItem | None:
+        """非阻塞取出任务，没有可取任务时返回None"""
+        if topic is None:
+            return self._select()
+        return self._take(topic)
+
+    def set_topic_limit(self, topic: str, limit: int) -> None:
+        """调整主题的在途上限，预取数量（子队列容量）随之调整
+
+        显式配置了预取数量的主题，子队列容量不超过配置值
+        """
+        self._max_inflight[topic] = limit
+        self._capacities[topic] = min(limit, self._prefetch.get(topic, limit))
+        # 上限放宽后被限流的主题和等待放入的分发协程可能可以继续
+        self._notify(self._getters)
+        self._notify(self._putters)
+
+    def task_done(self, topic: str) -> None:
+        """任务处理完成，释放主题的在途名额"""
+        inflight = self._inflight.get(topic, 0)
+        if inflight > 0:
+            self._inflight[topic] = inflight - 1
+        # 在途名额释放后，被限流的主题可能重新可取
+        if topic in self._max_inflight:
+            self._notify(self._getters)
+
+    def _select(self) -> TaskItem | None:
+        """赤字轮询选择下一个任务"""
+        # 每个活跃主题最多检查一遍，全部被限流时返回None
+        for _ in range(len(self._active)):
+            topic = self._active[0]
+
+            # 卫语句：主题在途数已达上限，跳过本轮
+            if self._is_saturated(topic):
+                self._deficits[topic] = 0
+                self._active.rotate(-1)
+                continue
+
+            if self._deficits.get(topic, 0) <= 0:
+                self._deficits[topic] = self._weights.get(topic, 1)
+
+            item = self._pop(topic)
+            self._deficits[topic] -= 1
+
+            if not self._queues[topic]:
+                # 主题已取空，退出轮询，重新有任务时排到队尾
+                self._active.popleft()
+                self._deficits[topic] = 0
+            elif self._deficits[topic] <= 0:
+                self._active.rotate(-1)
+
+            return item
+
+        return None
+
+    def _take(self, topic: str) -> TaskItem | None:
+        """直接从指定主题的子队列取出任务"""
+        # 卫语句：子队列为空或在途数已达上限
+        if not self.topic_qsize(topic) or self._is_saturated(topic):
+            return None
+        return self._pop(topic)
+
+    def _pop(self, topic: str) -> TaskItem:
+        item = self._queues[topic].popleft()
+        self._size -= 1
+        self._inflight[topic] = self._inflight.get(topic, 0) + 1
+        self._notify(self._putters)
+        return item
+
+    def _is_saturated(self, topic: str) -> bool:
+        limit = self._max_inflight.get(topic)
+        return limit is not None and self._inflight.get(topic, 0) >= limit
+
+    async def _wait(self, waiters: list[asyncio.Future]) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        try:
+            await waiter
+        finally:
+            if waiter in waiters:
+                waiters.remove(waiter)
+
+    @staticmethod
+    def _notify(waiters: list[asyncio.Future]) -> None:
+        """唤醒全部等待者，由其重新检查条件（等待者数量为协程数级别）"""
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        waiters.clear()
@@ -8,7 +8,10 @@ import time
 from loguru import logger
 from ..constants import GlobalKeys, TopicKeys
 from ..message import Message
+from ..tracing import message_attributes
+from ..workflow import FollowUp
 from .context import QueueContext
+from .rpc import build_reply
 
 
 class MessageLifecycleService:
@@ -17,23 +20,74 @@ class MessageLifecycleService:
     def __init__(self, context: QueueContext) -> None:
         self.context = context
 
-    async def complete_message(self, message_id: str, topic: str) -> None:
-        """完成消息处理"""
+    async def complete_message(
+        self,
+        message_id: str,
+        topic: str,
+        reply_to: str | None = None,
+        reply: str | None = None,
+        follow_ups: list[FollowUp] | None = None,
+    ) -> None:
+        """完成消息处理
+
+        Args:
+            reply_to: RPC回复队列，指定时与完成确认在同一脚本中写入回复
+            reply: RPC回复内容
+            follow_ups: 工作流链的后续消息，与完成确认在同一脚本中入队
+        """
+        has_reply = bool(reply_to) and reply is not None
+        # 没有回复时用空串占位，计数参数固定在 ARGV[4..5]，后续消息从 ARGV[6] 开始
+        keys = [
+            self.context.get_global_key(GlobalKeys.PAYLOAD_MAP),
+            self.context.get_global_topic_key(topic, TopicKeys.PROCESSING),
+            self.context.get_global_key(GlobalKeys.EXPIRE_MONITOR),
+            reply_to if has_reply else "",
+            self.context.get_global_key(GlobalKeys.METRICS),
+        ]
+        args: list = [
+            message_id,
+            reply if has_reply else "",
+            self.context.config.rpc_reply_ttl if has_reply else "",
+            topic,
+            self.context.get_counter_bucket_ttl(),
+        ]
+        if follow_ups:
+            args.extend(self._build_follow_up_args(follow_ups))
+
         try:
-            await self.context.lua_scripts["complete_message"](
-                keys=[
-                    self.context.get_global_key(GlobalKeys.PAYLOAD_MAP),
-                    self.context.get_global_topic_key(topic, TopicKeys.PROCESSING),
-                    self.context.get_global_key(GlobalKeys.EXPIRE_MONITOR),
-                ],
-                args=[message_id],
+            removed = await self.context.lua_scripts["complete_message"](
+                keys=keys, args=args
             )
+            # 卫语句：迟到确认时脚本不入队后续消息
+            if not removed:
+                return
+            for follow_up in follow_ups or ():
+                self.context.metrics.record_message_produced(follow_up.topic)
         except Exception as e:
             logger.exception(
                 f"完成消息处理失败, message_id={message_id}, topic={topic}"
             )
             raise
 
+    def _build_follow_up_args(self, follow_ups: list[FollowUp]) -> list:
+        """构建后续消息的脚本参数，每条消息6个参数"""
+        args: list = []
+        for follow_up in follow_ups:
+            message = follow_up.build_message(self.context.config)
+            # 后续消息延续当前处理 span 的追踪上下文
+            message.meta.trace_context = self.context.tracer.inject()
+            args.extend(
+                [
+                    message.id,
+                    message.model_dump_json(by_alias=True, exclude_none=True),
+                    self.context.get_global_key(message.topic),
+                    message.meta.expire_at,
+                    self.context.get_priority_lane_arg(message.get_priority_level()),
+                    message.topic,
+                ]
+            )
+        return args
+
     async def handle_message_failure(self, message: Message, error: Exception) -> None:
         """处理消息失败"""
         try:
@@ -52,13 +106,26 @@ class MessageLifecycleService:
     ) -> None:
         """处理可重试的失败消息"""
         await self.retry_message(message, message.topic)
+        # 卫语句：按采样率跳过逐条重试日志
+        if not self.context.log_sampler.should_log("retry"):
+            return
         logger.info(
-            f"消息重试调度, message_id={message.id}, topic={message.topic}, retry_count={message.meta.retry_count}, max_retries={message.meta.max_retries}, error={str(error)}"
+            "消息重试调度, message_id={message_id}, topic={topic}, "
+            "retry_count={retry_count}, max_retries={max_retries}, error={error}",
+            message_id=message.id,
+            topic=message.topic,
+            retry_count=message.meta.retry_count,
+            max_retries=message.meta.max_retries,
+            error=str(error),
         )
 
     async def _handle_final_failure(self, message: Message, error: Exception) -> None:
         """处理最终失败的消息"""
         await self.move_to_dead_letter_queue(message)
+        if message.reply_to:
+            await self.send_reply(
+                message.reply_to, build_reply(message.id, error=str(error))
+            )
         logger.info(
             f"消息移入死信队列, message_id={message.id}, topic={message.topic}, retry_count={message.meta.retry_count}, error={str(error)}"
         )
@@ -76,7 +143,8 @@ class MessageLifecycleService:
 
     async def _handle_expired_retry(self, message: Message, queue_name: str) -> None:
         """处理可重试的过期消息"""
-        await self.retry_message(message, queue_name)
+        # queue_name 带全局前缀，计数、指标和追踪按不带前缀的主题名记录
+        await self.retry_message(message, message.topic)
         logger.info(
             f"过期消息重试, message_id={message.id}, queue_name={queue_name}, retry_count={message.meta.retry_count}"
         )
@@ -94,26 +162,24 @@ class MessageLifecycleService:
         """处理卡死的消息"""
         try:
             # 第一层验证：检查消息是否存在
-            payload_json = await self.context.redis.hget(
-                self.context.get_global_key(GlobalKeys.PAYLOAD_MAP), msg_id
-            )  # type: ignore
+            payload_json = await self.context.load_message_json(msg_id)
             if not payload_json:
                 logger.warning(
                     f"卡死消息不存在，从processing队列移除, message_id={msg_id}"
                 )
-                await self.context.redis.lrem(processing_key, 1, msg_id)  # type: ignore
+                await self._remove_from_processing(processing_key, msg_id)
                 return
 
             # 第二层验证：解析消息数据
             try:
-                message = Message.model_validate_json(payload_json)
+                message = Message.from_stored(payload_json, msg_id)
             except (json.JSONDecodeError, ValueError) as parse_error:
                 logger.exception(f"卡死消息格式错误, message_id={msg_id}")
-                await self.context.redis.lrem(processing_key, 1, msg_id)  # type: ignore
+                await self._remove_from_processing(processing_key, msg_id)
                 return
 
             # 第三层验证：检查消息是否在processing队列中
-            removed_count = await self.context.redis.lrem(processing_key, 1, msg_id)  # type: ignore
+            removed_count = await self._remove_from_processing(processing_key, msg_id)
             if removed_count == 0:
                 logger.warning(f"卡死消息不在processing队列中, message_id={msg_id}")
                 return
@@ -145,9 +211,13 @@ class MessageLifecycleService:
             )
 
         # 从过期监控中移除
-        await self.context.redis.zrem(
-            self.context.get_global_key(GlobalKeys.EXPIRE_MONITOR), msg_id
-        )  # type: ignore
+        await self.context.observe(
+            "redis",
+            "zrem",
+            self.context.redis.zrem(
+                self.context.get_global_key(GlobalKeys.EXPIRE_MONITOR), msg_id
+            ),  # type: ignore
+        )
 
     async def _cleanup_stuck_message(
         self, msg_id: str, processing_key: str, error: Exception
@@ -155,69 +225,113 @@ class MessageLifecycleService:
         """清理卡死消息的异常处理"""
         logger.exception(f"处理卡死消息失败, message_id={msg_id}")
         try:
-            await self.context.redis.lrem(processing_key, 1, msg_id)  # type: ignore
+            await self._remove_from_processing(processing_key, msg_id)
             logger.info(f"已从processing队列移除问题消息, message_id={msg_id}")
         except Exception as cleanup_error:
             logger.exception(f"清理卡死消息失败, message_id={msg_id}")
 
+    async def _remove_from_processing(self, processing_key: str, msg_id: str) -> int:
+        """从processing队列移除消息，返回移除数量"""
+        return await self.context.observe(
+            "redis",
+            "lrem",
+            self.context.redis.lrem(processing_key, 1, msg_id),  # type: ignore
+        )
+
     async def retry_message(self, message: Message, topic: str) -> None:
         """重试消息"""
         try:
-            retry_delay = message.get_retry_delay()
-            current_time = int(time.time())
+            # 毫秒精度的重试延迟，支持亚秒级退避
+            retry_delay_ms = round(message.get_retry_delay() * 1000)
+            current_time = int(time.time() * 1000)
 
-            # 更新过期时间（使用秒级时间戳）
+            # 更新过期时间（毫秒时间戳）
             new_expire_time = (
-                current_time * 1000
-                + retry_delay * 1000
-                + self.context.config.message_ttl
+                current_time + retry_delay_ms + self.context.config.message_ttl * 1000
             )
             message.meta.expire_at = new_expire_time
+            message.meta.scheduled_at = current_time + retry_delay_ms
 
-            # 使用Lua脚本重新调度
-            await self.context.lua_scripts["retry_message"](
-                keys=[
-                    self.context.get_global_key(GlobalKeys.PAYLOAD_MAP),
-                    self.context.get_global_key(GlobalKeys.DELAY_TASKS),
-                    self.context.get_global_key(GlobalKeys.EXPIRE_MONITOR),
-                    self.context.get_global_topic_key(
-                        topic, TopicKeys.PROCESSING
-                    ),  # 新增：processing队列
-                ],
-                args=[
-                    message.id,
-                    message.model_dump_json(
-                        by_alias=True, exclude_none=True
-                    ),  # 新的 message 消息体
-                    retry_delay,
-                    topic,  # 新增：topic参数
-                ],
-            )
+            with self.context.tracer.span(
+                f"{topic} retry",
+                attributes={
+                    **message_attributes(topic, message.id),
+                    "mx_rmq.retry_count": message.meta.retry_count,
+                },
+                parent=message.meta.trace_context,
+            ):
+                # 使用Lua脚本重新调度
+                await self.context.lua_scripts["retry_message"](
+                    keys=[
+                        self.context.get_global_key(GlobalKeys.PAYLOAD_MAP),
+                        self.context.get_global_key(GlobalKeys.DELAY_TASKS),
+                        self.context.get_global_key(GlobalKeys.EXPIRE_MONITOR),
+                        self.context.get_global_topic_key(
+                            topic, TopicKeys.PROCESSING
+                        ),  # 新增：processing队列
+                        self.context.get_global_key(GlobalKeys.DELAY_BUCKETS),
+                        self.context.get_global_key(GlobalKeys.METRICS),
+                        self.context.get_delay_wakeup_key(),  # 唤醒目标
+                    ],
+                    args=[
+                        message.id,
+                        message.model_dump_json(
+                            by_alias=True, exclude_none=True
+                        ),  # 新的 message 消息体
+                        retry_delay_ms,
+                        topic,  # 新增：topic参数
+                        *self.context.get_delay_bucket_args(),
+                        self.context.get_counter_bucket_ttl(),
+                        self.context.config.delay_wakeup_mode,
+                    ],
+                )
+            self.context.metrics.record_message_retried(topic)
         except Exception as e:
             logger.exception(f"重试消息失败, message_id={message.id}")
             raise
 
+    async def send_reply(self, reply_to: str, reply: str) -> None:
+        """向RPC调用方的回复队列写入回复"""
+        try:
+            async with self.context.redis.pipeline(transaction=True) as pipe:
+                pipe.lpush(reply_to, reply)
+                pipe.expire(reply_to, self.context.config.rpc_reply_ttl)
+                await self.context.observe("redis", "pipeline", pipe.execute())
+        except Exception:
+            logger.exception(f"发送RPC回复失败, reply_to={reply_to}")
+
     async def move_to_dead_letter_queue(self, message: Message) -> None:
         """移入死信队列"""
         try:
             message.mark_dead_letter("max_retries_exceeded")
 
-            await self.context.lua_scripts["move_to_dlq"](
-                keys=[
-                    self.context.get_global_key(GlobalKeys.DLQ_PAYLOAD_MAP),
-                    self.context.get_global_key(GlobalKeys.DLQ_QUEUE),
-                    self.context.get_global_key(GlobalKeys.EXPIRE_MONITOR),
-                    self.context.get_global_key(GlobalKeys.PAYLOAD_MAP),
-                    self.context.get_global_topic_key(
-                        message.topic, TopicKeys.PROCESSING
-                    ),  # 新增：processing队列
-                ],
-                args=[
-                    message.id,
-                    message.model_dump_json(by_alias=True, exclude_none=True),
-                    message.topic,  # 新增：topic参数
-                ],
-            )
+            with self.context.tracer.span(
+                f"{message.topic} dead_letter",
+                attributes={
+                    **message_attributes(message.topic, message.id),
+                    "mx_rmq.retry_count": message.meta.retry_count,
+                },
+                parent=message.meta.trace_context,
+            ):
+                await self.context.lua_scripts["move_to_dlq"](
+                    keys=[
+                        self.context.get_global_key(GlobalKeys.DLQ_PAYLOAD_MAP),
+                        self.context.get_global_key(GlobalKeys.DLQ_QUEUE),
+                        self.context.get_global_key(GlobalKeys.EXPIRE_MONITOR),
+                        self.context.get_global_key(GlobalKeys.PAYLOAD_MAP),
+                        self.context.get_global_topic_key(
+                            message.topic, TopicKeys.PROCESSING
+                        ),  # 新增：processing队列
+                        self.context.get_global_key(GlobalKeys.METRICS),
+                    ],
+                    args=[
+                        message.id,
+                        message.model_dump_json(by_alias=True, exclude_none=True),
+                        message.topic,  # 新增：topic参数
+                        self.context.get_counter_bucket_ttl(),
+                    ],
+                )
+            self.context.metrics.record_message_dead_letter(message.topic)
         except Exception:
             logger.exception(f"移入死信队列失败, message_id={message.id}")
             raise
@@ -0,0 +1,120 @@
+"""
+请求/回复（RPC）模块
+"""
+
+import asyncio
+import json
+from typing import Any
+
+from loguru import logger
+
+from .context import QueueContext
+
+# 回复监听的单次阻塞时间（秒），没有等待中的调用时监听协程在超时后退出
+REPLY_LISTEN_TIMEOUT = 1
+
+
+def build_reply(message_id: str, result: Any = None, error: str | None = None) -> str:
+    """构造回复内容
+
+    Args:
+        message_id: 请求消息ID，作为回复的关联ID
+        result: 处理器返回值，无法JSON序列化的值转为字符串
+        error: 处理失败时的错误信息
+    """
+    if error is not None:
+        return json.dumps({"id": message_id, "ok": False, "error": error})
+    return json.dumps(
+        {"id": message_id, "ok": True, "result": result},
+        ensure_ascii=False,
+        default=str,
+    )
+
+
+class ReplyListener:
+    """RPC回复监听器
+
+    每个队列实例一个回复队列，一个共享的监听协程阻塞等待回复并唤醒对应的调用方，
+    等待中的调用数量不影响Redis连接占用。
+    """
+
+    def __init__(self, context: QueueContext, reply_key: str) -> None:
+        self.context = context
+        self.reply_key = reply_key
+        self._pending: dict[str, asyncio.Future] = {}
+        self._task: asyncio.Task | None = None
+
+    def register(self, message_id: str) -> asyncio.Future:
+        """登记一个等待回复的调用，必要时启动监听协程"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+        return future
+
+    def discard(self, message_id: str) -> None:
+        """调用结束（完成、超时或取消）后移除登记，迟到的回复将被丢弃"""
+        self._pending.pop(message_id, None)
+
+    async def close(self) -> None:
+        """停止监听协程并取消所有等待中的调用"""
+        for future in self._pending.values():
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _listen(self) -> None:
+        """监听回复队列，直到没有等待中的调用"""
+        logger.debug(f"启动RPC回复监听协程, reply_key={self.reply_key}")
+
+        while True:
+            try:
+                item = await self.context.redis.blpop(
+                    [self.reply_key], timeout=REPLY_LISTEN_TIMEOUT
+                )  # type: ignore
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("RPC回复监听错误")
+                await asyncio.sleep(REPLY_LISTEN_TIMEOUT)
+                item = None
+
+            if item:
+                self._resolve(item[1])
+                continue
+
+            # 卫语句：没有等待中的调用时退出，下一次调用时重新启动
+            if not self._pending:
+                break
+
+        logger.debug(f"RPC回复监听协程已停止, reply_key={self.reply_key}")
+
+    def _resolve(self, raw_reply: str) -> None:
+        """解析回复并唤醒对应的调用方"""
+        try:
+            reply = json.loads(raw_reply)
+            message_id = reply["id"]
+        except (json.JSONDecodeError, KeyError, TypeError):
+            logger.warning(f"RPC回复格式错误, reply={raw_reply[:200]}")
+            return
+
+        future = self._pending.pop(message_id, None)
+        # 卫语句：调用已超时或取消
+        if future is None or future.done():
+            logger.debug(f"丢弃迟到的RPC回复, message_id={message_id}")
+            return
+
+        if reply.get("ok"):
+            future.set_result(reply.get("result"))
+        else:
+            future.set_exception(
+                RuntimeError(f"远程处理失败: {reply.get('error', 'unknown error')}")
+            )
@@ -12,10 +12,14 @@ from loguru import logger
 from redis.commands.core import AsyncScript
 
 from ..constants import GlobalKeys, TopicKeys
-from ..message import Message
+from ..message import Message, get_priority_level
+from ..recurring import RecurringSchedule
 from .context import QueueContext
 from .lifecycle import MessageLifecycleService
 
+# 阻塞唤醒模式下单次 BLPOP 的最长阻塞时间（秒）
+DELAY_WAKEUP_BLOCK_TIMEOUT = 5
+
 
 class ScheduleService:
     """统一的调度服务类（已优化延时调度部分）"""
@@ -35,6 +39,9 @@ class ScheduleService:
         # 可重置: 通过 clear() 可以重新使用同一个事件对象
         self.notification_event = asyncio.Event()
 
+        # 延时消息提升批量：批次满载时翻倍增长，未满时回落到 batch_size
+        self.delay_batch_size = context.config.batch_size
+
     async def process_delay_messages(self) -> None:
         """延时消息处理协程"""
         if self.is_running:
@@ -47,6 +54,11 @@ class ScheduleService:
         # 将主调度逻辑封装在一个任务中，方便管理
         self.scheduler_task = asyncio.create_task(self.delay_scheduler_loop())
 
+        # 卫语句：阻塞唤醒模式下唤醒令牌不会丢失，无需 pubsub 监听，兜底轮询在等待令牌时进行
+        if self.context.config.delay_wakeup_mode == "blocking":
+            await asyncio.gather(self.scheduler_task, return_exceptions=True)
+            return
+
         # 启动其他辅助任务
         await asyncio.gather(
             self.scheduler_task,
@@ -111,13 +123,22 @@ class ScheduleService:
                 break
 
             try:
+                # 0. 物化已到期周期任务的下一次触发，保证每个周期任务始终提前一个周期在延时队列中
+                await self.try_materialize_schedules()
+
                 # 1. 从Redis获取下一个任务信息和等待时间
                 start_time = time.time()
                 lua_script: AsyncScript = self.context.lua_scripts[
                     "get_next_delay_task"
                 ]
                 delay_tasks_key = self.context.get_global_key(GlobalKeys.DELAY_TASKS)
-                result = await lua_script(keys=[delay_tasks_key], args=[])
+                result = await lua_script(
+                    keys=[
+                        delay_tasks_key,
+                        self.context.get_global_key(GlobalKeys.DELAY_BUCKETS),
+                    ],
+                    args=[self.context.config.delay_bucket_horizon * 1000],
+                )
                 status = result[0]
                 end_time = time.time()
                 # 🔍 详细日志：调试 Lua 脚本返回值 保留 3 位小数
@@ -153,8 +174,6 @@ class ScheduleService:
 
                 # 3. 等待：要么超时，要么被外部事件唤醒
                 try:
-                    # 清除旧信号，准备接收新信号
-                    self.notification_event.clear()
                     # 🔧 关键修复：将毫秒转换为秒数
                     wait_seconds = (
                         wait_milliseconds / 1000.0
@@ -162,39 +181,12 @@ class ScheduleService:
                         else None
                     )
 
-                    # 为长时间等待（>5秒）实现分段等待机制
-                    if wait_seconds is not None and wait_seconds > 5.0:
-                        # 分段等待，每5秒检查一次停止状态
-                        remaining_time = wait_seconds
-                        while remaining_time > 0 and self.is_running:
-                            segment_wait = min(5.0, remaining_time)
-                            try:
-                                await asyncio.wait_for(
-                                    self.notification_event.wait(), timeout=segment_wait
-                                )
-                                # 如果收到通知，跳出分段等待
-                                break
-                            except asyncio.TimeoutError:
-                                # 分段超时，继续等待剩余时间
-                                remaining_time -= segment_wait
-                                if not self.is_running:
-                                    break
-
-                        # 如果是因为停止状态退出，抛出 CancelledError
-                        if not self.is_running:
-                            raise asyncio.CancelledError("调度器已停止")
+                    if self.context.config.delay_wakeup_mode == "blocking":
+                        await self._wait_for_wakeup_token(wait_seconds)
                     else:
-                        # 短时间等待，直接等待
-                        # 在这里增加对 is_running 的检查，确保在停止时能快速退出
-                        if self.is_running:
-                            await asyncio.wait_for(
-                                self.notification_event.wait(), timeout=wait_seconds
-                            )
-                        else:
-                            # 如果已经停止运行，直接抛出 CancelledError
-                            raise asyncio.CancelledError("调度器已停止")
-
-                    # 如果代码执行到这里，说明是 notification_event 被触发了 【兜底 或者 pub/sub 通知】
+                        await self._wait_for_notification(wait_seconds)
+
+                    # 如果代码执行到这里，说明收到了唤醒 【兜底、pub/sub 通知 或 唤醒令牌】
                     logger.debug("收到外部通知，重新评估调度计划...")
                     # 直接进入下一次 while 循环，重新从 Redis 获取最新等待时间
 
@@ -220,6 +212,82 @@ class ScheduleService:
 
         logger.warning("延时调度主循环已退出")
 
+    async def _wait_for_notification(self, wait_seconds: float | None) -> None:
+        """
+        pubsub 模式：等待 notification_event，超时抛出 asyncio.TimeoutError
+        """
+        # 清除旧信号，准备接收新信号
+        self.notification_event.clear()
+
+        # 为长时间等待（>5秒）实现分段等待机制
+        if wait_seconds is not None and wait_seconds > 5.0:
+            # 分段等待，每5秒检查一次停止状态
+            remaining_time = wait_seconds
+            while remaining_time > 0 and self.is_running:
+                segment_wait = min(5.0, remaining_time)
+                try:
+                    await asyncio.wait_for(
+                        self.notification_event.wait(), timeout=segment_wait
+                    )
+                    # 如果收到通知，跳出分段等待
+                    break
+                except asyncio.TimeoutError:
+                    # 分段超时，继续等待剩余时间
+                    remaining_time -= segment_wait
+                    if not self.is_running:
+                        break
+
+            # 如果是因为停止状态退出，抛出 CancelledError
+            if not self.is_running:
+                raise asyncio.CancelledError("调度器已停止")
+        else:
+            # 短时间等待，直接等待
+            # 在这里增加对 is_running 的检查，确保在停止时能快速退出
+            if self.is_running:
+                await asyncio.wait_for(
+                    self.notification_event.wait(), timeout=wait_seconds
+                )
+            else:
+                # 如果已经停止运行，直接抛出 CancelledError
+                raise asyncio.CancelledError("调度器已停止")
+
+    async def _wait_for_wakeup_token(self, wait_seconds: float | None) -> None:
+        """
+        blocking 模式：阻塞等待唤醒令牌，超时抛出 asyncio.TimeoutError
+
+        唤醒令牌保存在 Redis 列表中，调度器不在等待时写入的令牌也不会丢失，
+        因此不需要 pubsub 连接。仍按 delay_fallback_interval 兜底返回一次，
+        重新评估调度计划，避免漏写令牌的写入方让任务长期得不到提升。
+        """
+        wakeup_key = self.context.get_delay_wakeup_key()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait_seconds if wait_seconds is not None else None
+        fallback_deadline = loop.time() + self.context.config.delay_fallback_interval
+
+        # 分段阻塞，每段最多 DELAY_WAKEUP_BLOCK_TIMEOUT 秒，期间检查停止状态
+        while self.is_running:
+            now = loop.time()
+            # 卫语句：到达任务到期时间
+            if deadline is not None and deadline <= now:
+                raise asyncio.TimeoutError()
+            # 卫语句：到达兜底轮询时间
+            if fallback_deadline <= now:
+                logger.debug("执行兜底检查，触发一次调度评估")
+                return
+
+            segment_wait = min(DELAY_WAKEUP_BLOCK_TIMEOUT, fallback_deadline - now)
+            if deadline is not None:
+                segment_wait = min(segment_wait, deadline - now)
+
+            token = await self.context.redis.blpop(
+                [wakeup_key], timeout=segment_wait
+            )  # type: ignore
+            if token:
+                logger.debug(f"收到延时任务唤醒令牌: {token[1]}")
+                return
+
+        raise asyncio.CancelledError("调度器已停止")
+
     async def pubsub_listener(self) -> None:
         """监听pubsub通道"""
         retry_delay = 1
@@ -332,19 +400,170 @@ class ScheduleService:
 
     async def try_process_expired_tasks(self) -> None:
         """尝试处理过期任务"""
+        if self.context.config.delay_bucket_horizon > 0:
+            await self.try_promote_delay_buckets()
+
         try:
             lua_script: AsyncScript = self.context.lua_scripts["process_delay"]
             delay_tasks_key = self.context.get_global_key(GlobalKeys.DELAY_TASKS)
             payload_map_key = self.context.get_global_key(GlobalKeys.PAYLOAD_MAP)
-            batch_size = str(self.context.config.batch_size)  # Lua脚本要求字符串参数
-            result = await lua_script(
-                keys=[delay_tasks_key, payload_map_key], args=[batch_size]
-            )
-            if result:
-                logger.info(f"处理延时任务成功, result={result}")
+            min_batch = self.context.config.batch_size
+            max_batch = max(min_batch, self.context.config.delay_promote_max_batch)
+
+            while True:
+                batch_size = self.delay_batch_size
+                result = await lua_script(
+                    keys=[delay_tasks_key, payload_map_key], args=[batch_size]
+                )
+                moved, dropped, has_more = result[:3]
+                self._record_delay_lateness(result[3:])
+                if moved or dropped:
+                    logger.info(
+                        f"处理延时任务成功, moved={moved}, dropped={dropped}, batch_size={batch_size}"
+                    )
+
+                # 卫语句：批次未满说明到期任务已处理完，批量回落
+                if not has_more:
+                    self.delay_batch_size = min_batch
+                    break
+
+                # 卫语句：调度器已停止，剩余任务留给下次启动
+                if not self.is_running:
+                    break
+
+                # 批次满载说明正处于到期洪峰，增大批量减少脚本调用次数
+                self.delay_batch_size = min(batch_size * 2, max_batch)
+                # 让出事件循环，两次脚本之间 Redis 也可以处理其他命令
+                await asyncio.sleep(0)
         except Exception as e:
             logger.exception("处理延时任务失败")
 
+    def _record_delay_lateness(self, entries: list) -> None:
+        """记录延时消息的调度滞后，entries 为按目标队列聚合的
+        [队列名, 消息数, 滞后总和毫秒, 最小值毫秒, 最大值毫秒, ...]"""
+        prefix = (
+            f"{self.context.config.queue_prefix}:"
+            if self.context.config.queue_prefix
+            else ""
+        )
+        metrics = self.context.metrics
+        for i in range(0, len(entries) - 4, 5):
+            queue_name, count, total_ms, min_ms, max_ms = entries[i : i + 5]
+            topic = (
+                queue_name[len(prefix) :]
+                if queue_name.startswith(prefix)
+                else queue_name
+            )
+            metrics.record_stage_latency_summary(
+                topic,
+                "delay_lateness",
+                int(count),
+                int(total_ms) / 1000,
+                int(min_ms) / 1000,
+                int(max_ms) / 1000,
+            )
+
+    async def try_promote_delay_buckets(self) -> None:
+        """将进入近期窗口的远期时间桶提升到延时队列"""
+        try:
+            lua_script: AsyncScript = self.context.lua_scripts["promote_delay_buckets"]
+            keys = [
+                self.context.get_global_key(GlobalKeys.DELAY_BUCKETS),
+                self.context.get_global_key(GlobalKeys.DELAY_TASKS),
+            ]
+            args = [
+                self.context.config.delay_bucket_horizon * 1000,
+                self.context.config.batch_size,
+            ]
+            while True:
+                promoted, has_more = await lua_script(keys=keys, args=args)
+                if promoted:
+                    logger.info(f"提升远期延时消息到延时队列, count={promoted}")
+                # 分批执行，避免单次脚本长时间阻塞Redis
+                if not has_more or not self.is_running:
+                    break
+        except Exception as e:
+            logger.exception("提升远期延时消息失败")
+
+    async def try_materialize_schedules(self) -> None:
+        """尝试物化到期的周期任务"""
+        try:
+            now_ms = int(time.time() * 1000)
+            schedules_key = self.context.get_global_key(GlobalKeys.SCHEDULES)
+            schedule_next_key = self.context.get_global_key(GlobalKeys.SCHEDULE_NEXT)
+
+            # 已物化的触发时间到期，说明需要物化下一次触发
+            due = await self.context.redis.zrangebyscore(
+                schedule_next_key,
+                "-inf",
+                now_ms,
+                start=0,
+                num=self.context.config.batch_size,
+                withscores=True,
+            )  # type: ignore
+            if not due:
+                return
+
+            definitions = await self.context.redis.hmget(
+                schedules_key, [schedule_id for schedule_id, _ in due]
+            )  # type: ignore
+
+            for (schedule_id, occurrence), definition_json in zip(
+                due, definitions, strict=True
+            ):
+                if not definition_json:
+                    # 定义已删除，物化脚本会顺带清理残留指针
+                    await self.context.redis.zrem(schedule_next_key, schedule_id)  # type: ignore
+                    continue
+                await self._materialize_schedule(
+                    RecurringSchedule.model_validate_json(definition_json),
+                    int(occurrence),
+                    now_ms,
+                )
+        except Exception:
+            logger.exception("物化周期任务失败")
+
+    async def _materialize_schedule(
+        self, definition: RecurringSchedule, occurrence: int, now_ms: int
+    ) -> None:
+        """物化单个周期任务的下一次触发"""
+        # 以 max(上次触发, 当前时间) 为起点，停机期间错过的触发直接跳过，避免恢复时集中补发
+        next_occurrence = definition.next_occurrence(max(occurrence, now_ms))
+        fire_time = definition.fire_time(next_occurrence)
+        message = definition.build_message(
+            next_occurrence, fire_time, self.context.config
+        )
+
+        materialized = await self.context.lua_scripts["materialize_schedule"](
+            keys=[
+                self.context.get_global_key(GlobalKeys.SCHEDULES),
+                self.context.get_global_key(GlobalKeys.SCHEDULE_NEXT),
+                self.context.get_global_key(GlobalKeys.PAYLOAD_MAP),
+                self.context.get_global_key(GlobalKeys.DELAY_TASKS),
+                self.context.get_delay_wakeup_key(),
+                self.context.get_global_key(GlobalKeys.METRICS),
+            ],
+            args=[
+                definition.id,
+                occurrence,
+                next_occurrence,
+                fire_time,
+                message.id,
+                message.model_dump_json(by_alias=True, exclude_none=True),
+                self.context.get_global_key(definition.topic),
+                self.context.config.delay_wakeup_mode,
+                self.context.get_priority_lane_arg(
+                    get_priority_level(definition.priority)
+                ),
+                definition.topic,
+                self.context.get_counter_bucket_ttl(),
+            ],
+        )
+        if materialized:
+            logger.debug(
+                f"周期任务物化成功, schedule_id={definition.id}, next_occurrence={next_occurrence}"
+            )
+
     async def monitor_expired_messages(self) -> None:
         """监控过期消息"""
         while self.context.is_running():
@@ -363,7 +582,7 @@ class ScheduleService:
 
                 for msg_id, payload_json, queue_name in expired_results:
                     try:
-                        message = Message.model_validate_json(payload_json)
+                        message = Message.from_stored(payload_json, msg_id)
 
                         await self.handler_service.handle_expired_message(
                             message, queue_name
@@ -515,6 +734,10 @@ class ScheduleService:
         while self.context.is_running():
             try:
                 metrics = await self._collect_metrics()
+                # 队列状态快照随 /metrics 导出
+                self.context.metrics.update_gauges(metrics)
+                # 处理时间直方图增量合并到Redis，供跨实例查看整体分布
+                await self.context.metrics.push_latency_histograms()
 
                 for metric_name, value in metrics.items():
                     logger.debug(f"metric: {metric_name}={value}")
@@ -536,17 +759,18 @@ class ScheduleService:
         try:
             pipe = self.context.redis.pipeline()  # type: ignore
 
-            topic_pending = {}
-            topic_processing = {}
+            lane_count = 0
             for topic in self.context.handlers.keys():
-                topic_pending[topic] = pipe.llen(
-                    self.context.get_global_topic_key(topic, TopicKeys.PENDING)
-                )
-                topic_processing[topic] = pipe.llen(
+                lane_keys = self.context.get_priority_lane_keys(topic)
+                lane_count = len(lane_keys)
+                for lane_key in lane_keys:
+                    pipe.llen(lane_key)
+                pipe.llen(
                     self.context.get_global_topic_key(topic, TopicKeys.PROCESSING)
                 )
 
             pipe.zcard(self.context.get_global_key(GlobalKeys.DELAY_TASKS))
+            pipe.zcard(self.context.get_global_key(GlobalKeys.DELAY_BUCKETS))
             pipe.zcard(self.context.get_global_key(GlobalKeys.EXPIRE_MONITOR))
             pipe.hlen(self.context.get_global_key(GlobalKeys.PAYLOAD_MAP))
             pipe.llen(self.context.get_global_key(GlobalKeys.DLQ_QUEUE))
@@ -556,13 +780,18 @@ class ScheduleService:
             # Parse results
             result_idx = 0
             for topic in self.context.handlers.keys():
-                metrics[f"{topic}.pending"] = results[result_idx]
-                result_idx += 1
+                # 待处理数为全部优先级通道之和
+                metrics[f"{topic}.pending"] = sum(
+                    results[result_idx : result_idx + lane_count]
+                )
+                result_idx += lane_count
                 metrics[f"{topic}.processing"] = results[result_idx]
                 result_idx += 1
 
             metrics[f"{GlobalKeys.DELAY_TASKS.value}.count"] = results[result_idx]
             result_idx += 1
+            metrics[f"{GlobalKeys.DELAY_BUCKETS.value}.count"] = results[result_idx]
+            result_idx += 1
             metrics[f"{GlobalKeys.EXPIRE_MONITOR.value}.count"] = results[result_idx]
             result_idx += 1
             metrics[f"{GlobalKeys.PAYLOAD_MAP.value}.count"] = results[result_idx]
@@ -0,0 +1,147 @@
+"""
+调用剖析钩子模块
+在每次 Lua 脚本调用、分发/生命周期服务中的 Redis 命令和业务处理器调用前后回调，
+用于接入采样剖析器、自定义 statsd 计时和慢调用日志，无需修改库内部代码
+"""
+
+import time
+from typing import TYPE_CHECKING, Any
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Sequence
+
+# 调用类型
+KIND_SCRIPT = "script"
+KIND_REDIS = "redis"
+KIND_HANDLER = "handler"
+
+
+class CallInfo:
+    """
+    一次被观测调用的信息，before 与 after 收到的是同一个对象，
+    钩子可以在 before 中往 extra 写入状态（如剖析器句柄）供 after 使用
+    """
+
+    __slots__ = ("kind", "name", "topic", "started", "elapsed", "error", "extra")
+
+    def __init__(self, kind: str, name: str, topic: str | None = None) -> None:
+        # script / redis / handler
+        self.kind = kind
+        # 脚本名、Redis 命令名或处理器函数名
+        self.name = name
+        # 处理器调用时为消息主题，其余调用为None
+        self.topic = topic
+        # 开始时间（time.perf_counter）
+        self.started = 0.0
+        # 耗时（秒），before 中为0
+        self.elapsed = 0.0
+        # 调用抛出的异常，成功时为None
+        self.error: BaseException | None = None
+        self.extra: dict[str, Any] = {}
+
+    def __repr__(self) -> str:
+        return (
+            f"CallInfo(kind={self.kind!r}, name={self.name!r}, topic={self.topic!r}, "
+            f"elapsed={self.elapsed:.6f}, error={self.error!r})"
+        )
+
+
+class CallHook:
+    """
+    调用剖析钩子基类，按需覆盖 before / after
+
+    回调在事件循环线程中同步执行，应当足够轻量；
+    回调抛出的异常会被记录并忽略，不影响消息处理
+    """
+
+    def before(self, call: CallInfo) -> None:
+        """调用开始前"""
+
+    def after(self, call: CallInfo) -> None:
+        """调用结束后（无论成功或失败），call.elapsed 和 call.error 已填充"""
+
+
+class SlowCallHook(CallHook):
+    """慢调用日志钩子：耗时超过阈值的调用记录一条警告日志"""
+
+    def __init__(
+        self, threshold: float = 0.005, kinds: "Sequence[str] | None" = None
+    ) -> None:
+        """
+        Args:
+            threshold: 慢调用阈值（秒）
+            kinds: 只检查这些调用类型，None 表示全部
+        """
+        self.threshold = threshold
+        self.kinds = frozenset(kinds) if kinds is not None else None
+
+    def after(self, call: CallInfo) -> None:
+        # 卫语句：未超过阈值或不关心的调用类型
+        if call.elapsed < self.threshold:
+            return
+        if self.kinds is not None and call.kind not in self.kinds:
+            return
+        logger.warning(
+            f"慢调用, kind={call.kind}, name={call.name}, topic={call.topic}, "
+            f"elapsed_ms={call.elapsed * 1000:.2f}"
+        )
+
+
+async def run_hooked(
+    hooks: "Sequence[CallHook]", call: CallInfo, awaitable: "Awaitable[Any]"
+) -> Any:
+    """
+    在钩子回调之间等待调用完成
+
+    Args:
+        hooks: 已注册的钩子
+        call: 调用信息
+        awaitable: 被观测的调用
+
+    Returns:
+        调用结果，调用抛出的异常原样向上传播
+    """
+    for hook in hooks:
+        try:
+            hook.before(call)
+        except Exception:
+            logger.exception(f"剖析钩子 before 回调失败, hook={hook!r}")
+
+    call.started = time.perf_counter()
+    try:
+        return await awaitable
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        call.elapsed = time.perf_counter() - call.started
+        for hook in hooks:
+            try:
+                hook.after(call)
+            except Exception:
+                logger.exception(f"剖析钩子 after 回调失败, hook={hook!r}")
+
+
+class HookedScript:
+    """在钩子回调之间执行的 Lua 脚本包装，仅在注册了钩子时替换原脚本"""
+
+    __slots__ = ("_hooks", "_name", "_script")
+
+    def __init__(self, hooks: "Sequence[CallHook]", name: str, script: Any) -> None:
+        self._hooks = hooks
+        self._name = name
+        self._script = script
+
+    @property
+    def script(self) -> Any:
+        """被包装的脚本"""
+        return self._script
+
+    async def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_hooked(
+            self._hooks,
+            CallInfo(KIND_SCRIPT, self._name),
+            self._script(*args, **kwargs),
+        )
@@ -7,12 +7,43 @@ import sys
 from typing import Any
 from loguru import logger
 
+# 可按 MQConfig.log_sample_rates 采样的逐条消息日志事件
+SAMPLED_LOG_EVENTS = ("produce", "publish", "complete", "retry")
+
+
+class LogSampler:
+    """
+    逐条消息日志采样器：每个事件每 N 次记录 1 次（第1次、第N+1次……）
+
+    只在事件循环线程中调用，计数不加锁
+    """
+
+    __slots__ = ("_rates", "_counts")
+
+    def __init__(self, rates: dict[str, int] | None = None) -> None:
+        # 只保留真正需要采样的事件，未配置的事件不计数
+        self._rates = {event: rate for event, rate in (rates or {}).items() if rate > 1}
+        self._counts = dict.fromkeys(self._rates, 0)
+
+    def should_log(self, event: str) -> bool:
+        """本次事件是否记录日志"""
+        rate = self._rates.get(event)
+        # 卫语句：未配置采样
+        if rate is None:
+            return True
+        count = self._counts[event]
+        self._counts[event] = count + 1
+        return count % rate == 0
+
 
 def setup_logger(
     level: str = "INFO",
     include_location: bool = True,
     colorized: bool = True,
     log_file: str | None = None,
+    enqueue: bool = False,
+    diagnose: bool = True,
+    backtrace: bool = True,
     **kwargs: Any,
 ) -> None:
     """
@@ -23,6 +54,10 @@ def setup_logger(
         include_location: 是否包含文件位置信息（文件名、行号、函数名）
         colorized: 是否启用彩色输出
         log_file: 日志文件路径，如果提供则同时输出到文件
+        enqueue: 经由后台线程写出日志，调用方只把记录放入队列，
+            避免终端或磁盘 I/O 阻塞事件循环，高吞吐场景建议开启
+        diagnose: 异常堆栈中显示变量值，开销较大且可能泄露敏感数据，生产环境建议关闭
+        backtrace: 异常堆栈向上展开到捕获点之外
         **kwargs: 其他配置参数
 
     Examples:
@@ -30,6 +65,7 @@ def setup_logger(
         >>> setup_logger("INFO")  # 配置基本日志输出
         >>> setup_logger("DEBUG", include_location=True)  # 开发环境配置
         >>> setup_logger("INFO", include_location=False, log_file="app.log")  # 生产环境配置
+        >>> setup_logger("INFO", enqueue=True, diagnose=False)  # 高吞吐配置
     """
     # 移除默认的 handler
     logger.remove()
@@ -58,8 +94,9 @@ def setup_logger(
         format=format_string,
         level=level.upper(),
         colorize=colorized,
-        backtrace=True,
-        diagnose=True,
+        backtrace=backtrace,
+        diagnose=diagnose,
+        enqueue=enqueue,
         **kwargs,
     )
 
@@ -77,8 +114,9 @@ def setup_logger(
             rotation="10 MB",
             retention="7 days",
             compression="zip",
-            backtrace=True,
-            diagnose=True,
+            backtrace=backtrace,
+            diagnose=diagnose,
+            enqueue=enqueue,
         )
 
 
@@ -111,13 +149,22 @@ def setup_simple_logger(level: str = "INFO") -> None:
     )
 
 
-def setup_production_logger(level: str = "INFO", log_file: str = "mx_rmq.log") -> None:
+def setup_production_logger(
+    level: str = "INFO",
+    log_file: str = "mx_rmq.log",
+    enqueue: bool = True,
+    diagnose: bool = False,
+) -> None:
     """
     配置生产环境日志（JSON 格式，便于日志收集）
 
+    默认经由后台线程写出日志并关闭异常变量诊断，日志 I/O 不阻塞事件循环
+
     Args:
         level: 日志级别
         log_file: 日志文件路径
+        enqueue: 经由后台线程写出日志
+        diagnose: 异常堆栈中显示变量值
 
     Examples:
         >>> from mx_rmq.log_config import setup_production_logger
@@ -136,6 +183,7 @@ def setup_production_logger(level: str = "INFO", log_file: str = "mx_rmq.log") -
         ),
         level=level.upper(),
         colorize=True,
+        enqueue=enqueue,
     )
 
     # 文件输出：JSON 格式
@@ -148,7 +196,8 @@ def setup_production_logger(level: str = "INFO", log_file: str = "mx_rmq.log") -
         compression="zip",
         serialize=True,  # JSON 格式
         backtrace=True,
-        diagnose=True,
+        diagnose=diagnose,
+        enqueue=enqueue,
     )
 
 
@@ -174,6 +223,7 @@ def configure_mx_rmq_logging(
 
 
 __all__ = [
+    "LogSampler",
     "setup_logger",
     "setup_simple_logger",
     "setup_production_logger",
@@ -29,6 +29,75 @@ class MessagePriority(str, Enum):
     HIGH = "high"
 
 
+# 数值优先级范围 0-9，数值越大越优先；枚举优先级映射到固定的数值等级
+MIN_PRIORITY_LEVEL = 0
+MAX_PRIORITY_LEVEL = 9
+PRIORITY_LEVELS: dict[MessagePriority, int] = {
+    MessagePriority.LOW: 2,
+    MessagePriority.NORMAL: 5,
+    MessagePriority.HIGH: 8,
+}
+DEFAULT_PRIORITY_LEVEL = PRIORITY_LEVELS[MessagePriority.NORMAL]
+
+
+def get_priority_level(priority: MessagePriority | int) -> int:
+    """
+    获取优先级对应的数值等级
+
+    Args:
+        priority: 枚举优先级或 0-9 的数值优先级
+
+    Returns:
+        数值等级（0-9）
+    """
+    if isinstance(priority, MessagePriority):
+        return PRIORITY_LEVELS[priority]
+
+    # 卫语句：数值优先级超出范围时抛出异常
+    if not MIN_PRIORITY_LEVEL <= priority <= MAX_PRIORITY_LEVEL:
+        raise ValueError(
+            f"数值优先级必须在{MIN_PRIORITY_LEVEL}-{MAX_PRIORITY_LEVEL}之间，当前值: {priority}"
+        )
+    return priority
+
+
+# 广播主题分隔符：订阅分组的内部主题为 {主题}@{分组}，分组投递ID为 {消息ID}@{分组}
+FANOUT_SEPARATOR = "@"
+
+
+def get_group_topic(topic: str, group: str) -> str:
+    """
+    获取广播主题订阅分组的内部主题名，分组拥有独立的 pending/processing 队列
+
+    Args:
+        topic: 广播主题名称
+        group: 订阅分组名称
+
+    Returns:
+        分组内部主题名
+    """
+    return f"{topic}{FANOUT_SEPARATOR}{group}"
+
+
+def split_delivery_id(message_id: str) -> tuple[str, str | None]:
+    """
+    拆分广播消息的分组投递ID
+
+    只按分隔符做语法拆分；生产接口拒绝包含分隔符的消息ID，
+    读取共享消息体前还需确认原始消息的引用计数存在
+
+    Args:
+        message_id: 消息ID或分组投递ID
+
+    Returns:
+        (原始消息ID, 分组名称)，普通消息的分组名称为 None
+    """
+    base_id, separator, group = message_id.partition(FANOUT_SEPARATOR)
+    if not separator:
+        return message_id, None
+    return base_id, group
+
+
 class MessageMeta(BaseModel):
     """消息元数据"""
 
@@ -36,7 +105,20 @@ class MessageMeta(BaseModel):
     # model_config = {"exclude_none": True}  # type: ignore
 
     status: MessageStatus = Field(default=MessageStatus.PENDING, description="消息状态")
-    delay: int = Field(default=0, description="延迟时间（秒）")
+    delay: int | float = Field(default=0, description="延迟时间（秒），支持小数")
+    deliver_at: int | None = Field(
+        default=None, description="绝对投递时间戳 ms", alias="deliverAt"
+    )
+    scheduled_at: int | None = Field(
+        default=None,
+        description="计划投递时间戳 ms（延时消息、重试、周期任务），用于计算排队延迟",
+        alias="scheduledAt",
+    )
+    trace_context: dict[str, str] | None = Field(
+        default=None,
+        description="生产时注入的链路追踪上下文（W3C traceparent/tracestate）",
+        alias="traceContext",
+    )
     
     retry_count: int = Field(
         default=0, ge=0, description="重试次数", alias="retryCount"
@@ -44,9 +126,9 @@ class MessageMeta(BaseModel):
     max_retries: int = Field(
         default=3, ge=0, description="最大重试次数", alias="maxRetries"
     )
-    retry_delays: list[int] = Field(
+    retry_delays: list[int | float] = Field(
         default_factory=lambda: [60, 300, 1800],
-        description="重试延迟间隔（秒）",
+        description="重试延迟间隔（秒），支持小数实现亚秒级退避",
         alias="retryDelays",
     )
     last_error: str | None = Field(
@@ -100,8 +182,18 @@ class Message(BaseModel):
     version: str = Field(default="1.0", description="消息格式版本")
     topic: str = Field(description="主题名称")
   
-    priority: MessagePriority = Field(
-        default=MessagePriority.NORMAL, description="消息优先级"
+    priority: MessagePriority | int = Field(
+        default=MessagePriority.NORMAL, description="消息优先级，枚举或0-9的数值"
+    )
+    ordering_key: str | None = Field(
+        default=None,
+        description="顺序键，同键消息串行且按生产顺序处理",
+        alias="orderingKey",
+    )
+    reply_to: str | None = Field(
+        default=None,
+        description="RPC回复地址（调用方实例的回复队列键名）",
+        alias="replyTo",
     )
     created_at: int = Field(
         default_factory=lambda: int(time.time() * 1000),
@@ -145,6 +237,18 @@ class Message(BaseModel):
         self.meta.stuck_detected_at = int(time.time() * 1000)
         self.meta.updated_at = int(time.time() * 1000)
 
+    def get_ready_at(self) -> int:
+        """获取消息最近一次变为可投递的时间戳 ms，用于计算排队延迟"""
+        return max(
+            self.meta.created_at,
+            self.meta.scheduled_at or 0,
+            self.meta.retried_from_dlq_at or 0,
+        )
+
+    def get_priority_level(self) -> int:
+        """获取消息优先级对应的数值等级"""
+        return get_priority_level(self.priority)
+
     def can_retry(self) -> bool:
         """检查是否可以重试"""
         return self.meta.retry_count < self.meta.max_retries
@@ -153,8 +257,8 @@ class Message(BaseModel):
         """检查消息是否过期"""
         return int(time.time() * 1000) > self.meta.expire_at
 
-    def get_retry_delay(self) -> int:
-        """获取重试延迟时间"""
+    def get_retry_delay(self) -> int | float:
+        """获取重试延迟时间（秒）"""
         retry_delays = self.meta.retry_delays
         if not retry_delays:
             return 60  # 默认1分钟
@@ -164,7 +268,33 @@ class Message(BaseModel):
         index = min(self.meta.retry_count - 1, len(retry_delays) - 1)
         return retry_delays[index]
 
+    @classmethod
+    def from_stored(cls, payload_json: str, message_id: str) -> "Message":
+        """
+        解析payload存储中的消息体
+
+        广播消息的各分组投递共享原始消息体，解析后改写为分组投递ID和分组内部主题；
+        分组投递重试时已写入独立消息体，按原样解析
+
+        Args:
+            payload_json: 消息体 JSON
+            message_id: 消息ID或分组投递ID
+        """
+        message = cls.model_validate_json(payload_json)
+        base_id, group = split_delivery_id(message_id)
+        if group is not None and message.id == base_id:
+            message.id = message_id
+            message.topic = get_group_topic(message.topic, group)
+        return message
+
   
+    @field_validator('priority')
+    @classmethod
+    def validate_priority(cls, v: MessagePriority | int) -> MessagePriority | int:
+        """验证数值优先级范围"""
+        get_priority_level(v)
+        return v
+
     @field_validator('topic')
     @classmethod
     def validate_topic(cls, v: str) -> str:
@@ -3,10 +3,24 @@
 提供消息队列的监控指标收集和分析功能
 """
 
-from .metrics import MetricsCollector, ProcessingMetrics, QueueMetrics
+from .exporter import MetricsServer
+from .histogram import LatencyHistogram
+from .metrics import (
+    LatencyMetrics,
+    MetricsCollector,
+    ProcessingMetrics,
+    QueueMetrics,
+)
+from .runtime import RuntimeMetrics, RuntimeMonitor, WorkerMetrics
 
 __all__ = [
     "MetricsCollector",
+    "MetricsServer",
+    "LatencyHistogram",
     "QueueMetrics",
     "ProcessingMetrics",
+    "LatencyMetrics",
+    "RuntimeMonitor",
+    "RuntimeMetrics",
+    "WorkerMetrics",
 ]
@@ -0,0 +1,76 @@
+"""
+Prometheus 指标HTTP导出模块
+基于 asyncio.start_server 的轻量实现，只响应 GET /metrics，无额外依赖
+"""
+
+import asyncio
+
+from loguru import logger
+
+from .metrics import MetricsCollector
+
+# Prometheus 文本格式的 Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# 读取请求头的超时时间（秒），避免慢连接占用协程
+REQUEST_TIMEOUT = 5
+
+
+class MetricsServer:
+    """Prometheus /metrics 端点"""
+
+    def __init__(self, collector: MetricsCollector, host: str, port: int) -> None:
+        """
+        Args:
+            collector: 指标收集器
+            host: 监听地址
+            port: 监听端口
+        """
+        self.collector = collector
+        self.host = host
+        self.port = port
+
+    async def serve(self) -> None:
+        """启动HTTP服务直到协程被取消"""
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"Prometheus指标端点已启动, address=http://{self.host}:{self.port}/metrics")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """处理单个HTTP请求，响应后关闭连接"""
+        try:
+            request = await asyncio.wait_for(
+                reader.readuntil(b"\r\n\r\n"), timeout=REQUEST_TIMEOUT
+            )
+            request_line = request.split(b"\r\n", 1)[0].decode("latin-1")
+            method, _, rest = request_line.partition(" ")
+            path = rest.split(" ", 1)[0].split("?", 1)[0]
+
+            if method != "GET":
+                self._write_response(writer, 405, "Method Not Allowed", b"")
+            elif path != "/metrics":
+                self._write_response(writer, 404, "Not Found", b"")
+            else:
+                body = self.collector.render_prometheus().encode("utf-8")
+                self._write_response(writer, 200, "OK", body)
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception:
+            logger.exception("处理指标请求失败")
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _write_response(
+        writer: asyncio.StreamWriter, status: int, reason: str, body: bytes
+    ) -> None:
+        headers = (
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: {CONTENT_TYPE}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        writer.write(headers.encode("latin-1") + body)
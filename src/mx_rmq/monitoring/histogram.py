@@ -0,0 +1,155 @@
+"""
+对数分桶延迟直方图模块
+固定内存、O(1) 记录，分桶计数可直接相加，用于跨实例合并
+"""
+
+import math
+
+# 相对误差：分位数估计值与真实值的相对偏差不超过该比例
+RELATIVE_ACCURACY = 0.02
+# 相邻分桶上界之比
+BUCKET_GROWTH = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GROWTH = math.log(BUCKET_GROWTH)
+# 可区分的最小值与最大值（秒），超出范围的样本记入首尾分桶
+MIN_TRACKABLE_VALUE = 1e-6
+MAX_TRACKABLE_VALUE = 86400.0
+# 分桶0记录不超过最小值的样本，分桶 i 覆盖 (MIN * GROWTH^(i-1), MIN * GROWTH^i]
+BUCKET_COUNT = (
+    math.ceil(math.log(MAX_TRACKABLE_VALUE / MIN_TRACKABLE_VALUE) / _LOG_GROWTH) + 1
+)
+
+
+def bucket_index(value: float) -> int:
+    """样本所属分桶"""
+    if value <= MIN_TRACKABLE_VALUE:
+        return 0
+    index = math.ceil(math.log(value / MIN_TRACKABLE_VALUE) / _LOG_GROWTH)
+    return min(index, BUCKET_COUNT - 1)
+
+
+def bucket_value(index: int) -> float:
+    """分桶的代表值：上下界的调和中点，相对误差不超过 RELATIVE_ACCURACY"""
+    if index == 0:
+        return MIN_TRACKABLE_VALUE
+    upper = MIN_TRACKABLE_VALUE * BUCKET_GROWTH**index
+    return upper * 2 / (1 + BUCKET_GROWTH)
+
+
+class LatencyHistogram:
+    """
+    对数分桶延迟直方图
+
+    每个分桶的宽度与其取值成比例，分位数的相对误差不超过 RELATIVE_ACCURACY。
+    记录只做一次对数运算和几次整数加法，只在事件循环线程中调用，不加锁。
+    """
+
+    __slots__ = ("counts", "count", "sum", "min", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value: float, count: int = 1) -> None:
+        """记录样本（秒），count 为取值相同的样本数"""
+        self.counts[bucket_index(value)] += count
+        self.count += count
+        self.sum += value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def record_summary(
+        self, count: int, total: float, minimum: float, maximum: float
+    ) -> None:
+        """
+        记录一批只有汇总值的样本
+
+        最小值和最大值各记一个样本，其余样本按剩余均值记录，
+        总和、极值与逐个记录一致，分位数为近似值
+
+        Args:
+            count: 样本数
+            total: 样本总和（秒）
+            minimum: 最小值（秒）
+            maximum: 最大值（秒）
+        """
+        # 卫语句：没有样本
+        if count <= 0:
+            return
+        if count == 1:
+            self.record(total)
+            return
+        self.record(minimum)
+        self.record(maximum)
+        if count > 2:
+            self.record((total - minimum - maximum) / (count - 2), count - 2)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """
+        估计分位数
+
+        Args:
+            q: 分位点（0-1），如 0.99
+
+        Returns:
+            分位数估计值（秒），没有样本时为0
+        """
+        # 卫语句：没有样本
+        if not self.count:
+            return 0.0
+
+        # 最近秩定义：第 ceil(q * count) 个样本所在的分桶
+        rank = max(1, math.ceil(q * self.count))
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                # 代表值限制在实际观测范围内，单样本或窄分布时更准确
+                return min(max(bucket_value(index), self.min), self.max)
+        return self.max
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """合并另一个直方图的样本"""
+        for index, bucket_count in enumerate(other.counts):
+            if bucket_count:
+                self.counts[index] += bucket_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def nonzero_buckets(self) -> dict[int, int]:
+        """非空分桶的计数"""
+        return {index: c for index, c in enumerate(self.counts) if c}
+
+    @classmethod
+    def from_buckets(
+        cls, buckets: dict[int, int], total: float = 0.0
+    ) -> "LatencyHistogram":
+        """
+        由分桶计数重建直方图（跨实例合并后的数据）
+
+        Args:
+            buckets: 分桶序号到计数的映射
+            total: 样本总和（秒）
+        """
+        histogram = cls()
+        for index, bucket_count in buckets.items():
+            # 卫语句：忽略精度配置不同的实例写入的越界分桶
+            if not 0 <= index < BUCKET_COUNT or bucket_count <= 0:
+                continue
+            histogram.counts[index] += bucket_count
+            histogram.count += bucket_count
+            value = bucket_value(index)
+            histogram.min = min(histogram.min, value)
+            histogram.max = max(histogram.max, value)
+        histogram.sum = total
+        return histogram
@@ -2,8 +2,9 @@
 指标收集器模块
 """
 
+import asyncio
 import time
-from collections import defaultdict, deque
+from collections import defaultdict
 from threading import Lock
 from typing import Any
 
@@ -11,8 +12,29 @@ import redis.asyncio as aioredis
 from pydantic import BaseModel, Field
 
 from ..constants import GlobalKeys, TopicKeys
+from ..message import DEFAULT_PRIORITY_LEVEL, MAX_PRIORITY_LEVEL, MIN_PRIORITY_LEVEL
+from .histogram import BUCKET_COUNT, LatencyHistogram
+from .runtime import RuntimeMonitor
 from loguru import logger
 
+# 导出和展示的延迟分位点
+LATENCY_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+# 处理中消息时长统计时每个主题最多采样的最旧消息数
+PROCESSING_SAMPLE_SIZE = 100
+
+# 消息端到端各阶段：
+#   delay_lateness: 延时消息计划投递时间 → 实际提升到待处理队列（延时调度器）
+#   queue_lag: 可投递时间 → 分发到本地任务队列（Redis 待处理队列中的等待）
+#   local_wait: 分发 → 处理器开始执行（本地任务队列中的等待）
+#   handler: 处理器执行耗时
+#   ack: 处理器结束 → 完成确认写入Redis
+LATENCY_STAGES = ("delay_lateness", "queue_lag", "local_wait", "handler", "ack")
+HANDLER_STAGE = "handler"
+
+# Lua脚本在指标Hash中原子维护的各主题累计计数，字段为 {计数名}:{主题}
+SERVER_COUNTERS = ("produced", "completed", "retried", "dead_lettered")
+
 
 class QueueMetrics(BaseModel):
     """队列指标数据类"""
@@ -35,13 +57,57 @@ class ProcessingMetrics(BaseModel):
     avg_processing_time: float = Field(default=0.0, ge=0.0, description="平均处理时间")
     max_processing_time: float = Field(default=0.0, ge=0.0, description="最大处理时间")
     min_processing_time: float = Field(default=0.0, ge=0.0, description="最小处理时间")
+    p50_processing_time: float = Field(default=0.0, ge=0.0, description="处理时间P50")
+    p90_processing_time: float = Field(default=0.0, ge=0.0, description="处理时间P90")
+    p99_processing_time: float = Field(default=0.0, ge=0.0, description="处理时间P99")
+    p999_processing_time: float = Field(
+        default=0.0, ge=0.0, description="处理时间P99.9"
+    )
+
+
+class LatencyMetrics(BaseModel):
+    """单个阶段的延迟分布"""
+
+    count: int = Field(default=0, ge=0, description="样本数")
+    avg: float = Field(default=0.0, ge=0.0, description="平均值（秒）")
+    max: float = Field(default=0.0, ge=0.0, description="最大值（秒）")
+    p50: float = Field(default=0.0, ge=0.0, description="P50（秒）")
+    p90: float = Field(default=0.0, ge=0.0, description="P90（秒）")
+    p99: float = Field(default=0.0, ge=0.0, description="P99（秒）")
+    p999: float = Field(default=0.0, ge=0.0, description="P99.9（秒）")
+
+    @classmethod
+    def from_histogram(cls, histogram: LatencyHistogram) -> "LatencyMetrics":
+        """由直方图计算分布摘要"""
+        # 卫语句：没有样本
+        if not histogram.count:
+            return cls()
+        p50, p90, p99, p999 = (histogram.quantile(q) for q in LATENCY_QUANTILES)
+        return cls(
+            count=histogram.count,
+            avg=histogram.mean,
+            max=histogram.max,
+            p50=p50,
+            p90=p90,
+            p99=p99,
+            p999=p999,
+        )
 
 
 class MetricsCollector:
-    """指标收集器"""
+    """
+    指标收集器
+
+    处理时间记录在固定内存的对数分桶直方图中，记录为 O(1) 且不持锁
+    （只在事件循环线程中调用）；计数器和快照读取仍由锁保护。
+    """
 
     def __init__(
-        self, redis: aioredis.Redis | None = None, queue_prefix: str = ""
+        self,
+        redis: aioredis.Redis | None = None,
+        queue_prefix: str = "",
+        processing_timeout: int = 180,
+        bucket_minutes: int = 0,
     ) -> None:
         """
         初始化指标收集器
@@ -49,9 +115,13 @@ class MetricsCollector:
         Args:
             redis: Redis连接实例（可选，用于持久化指标）
             queue_prefix: 队列前缀，用于生成正确的键名
+            processing_timeout: 消息处理超时时间（秒），用于由过期监控分数推算处理时长
+            bucket_minutes: 服务端计数器分钟桶保留的分钟数，0表示未开启分钟桶
         """
         self.redis = redis
         self.queue_prefix = queue_prefix
+        self.processing_timeout = processing_timeout
+        self.bucket_minutes = bucket_minutes
         self._lock = Lock()
 
         # 队列计数器
@@ -71,11 +141,31 @@ class MetricsCollector:
             lambda: {"total_processed": 0, "success": 0, "error": 0, "retry": 0}
         )
 
-        # 处理时间统计
-        self._processing_times: defaultdict[str, deque] = defaultdict(
-            lambda: deque(maxlen=1000)
+        # 处理时间分布：每个主题一个固定内存的对数分桶直方图
+        self._processing_times: defaultdict[str, LatencyHistogram] = defaultdict(
+            LatencyHistogram
+        )
+        # 处理器以外各阶段的延迟分布，键为 (主题, 阶段)
+        self._stage_times: defaultdict[tuple[str, str], LatencyHistogram] = (
+            defaultdict(LatencyHistogram)
+        )
+        # 已推送到Redis的分桶计数，推送时只写增量，键为 (主题, 阶段)
+        self._pushed_buckets: defaultdict[tuple[str, str], dict[int, int]] = (
+            defaultdict(dict)
+        )
+        self._pushed_sums: defaultdict[tuple[str, str], float] = defaultdict(float)
+
+        # 热路径事件计数器（只增不减，导出为 Prometheus counter）
+        self._event_counters: defaultdict[str, dict[str, int]] = defaultdict(
+            lambda: {"produced": 0, "dispatched": 0, "parse_error": 0}
         )
 
+        # 系统监控协程从Redis采集的最新快照（导出为 Prometheus gauge）
+        self._gauges: dict[str, float] = {}
+
+        # 事件循环延迟、消费者忙闲和本地队列占用
+        self.runtime = RuntimeMonitor()
+
         # 消息处理开始时间记录
         self._start_times: dict[str, float] = {}
 
@@ -94,6 +184,14 @@ class MetricsCollector:
             return f"{self.queue_prefix}:{topic}:{suffix.value}"
         return f"{topic}:{suffix.value}"
 
+    def _get_priority_lane_keys(self, topic: str) -> list[str]:
+        """获取主题全部优先级通道键名，与 QueueContext.get_priority_lane_keys 一致"""
+        pending_key = self._get_topic_key(topic, TopicKeys.PENDING)
+        return [
+            pending_key if level == DEFAULT_PRIORITY_LEVEL else f"{pending_key}:{level}"
+            for level in range(MAX_PRIORITY_LEVEL, MIN_PRIORITY_LEVEL - 1, -1)
+        ]
+
     def record_message_produced(self, topic: str, priority: str = "normal") -> None:
         """
         记录消息生产
@@ -104,15 +202,17 @@ class MetricsCollector:
         """
         with self._lock:
             self._queue_counters[topic]["pending"] += 1
+            self._event_counters[topic]["produced"] += 1
 
     def record_message_consumed(self, topic: str) -> None:
         """
-        记录消息消费
+        记录消息消费（分发到本地任务队列）
 
         Args:
             topic: 主题名称
         """
         with self._lock:
+            self._event_counters[topic]["dispatched"] += 1
             if self._queue_counters[topic]["pending"] > 0:
                 self._queue_counters[topic]["pending"] -= 1
                 self._queue_counters[topic]["processing"] += 1
@@ -132,7 +232,8 @@ class MetricsCollector:
 
             self._processing_counters[topic]["total_processed"] += 1
             self._processing_counters[topic]["success"] += 1
-            self._processing_times[topic].append(processing_time)
+        # 直方图记录为 O(1) 分桶累加，放在锁外
+        self._processing_times[topic].record(processing_time)
 
     def record_message_failed(
         self, topic: str, error_message: str, processing_time: float | None = None
@@ -153,8 +254,8 @@ class MetricsCollector:
             self._processing_counters[topic]["total_processed"] += 1
             self._processing_counters[topic]["error"] += 1
 
-            if processing_time is not None:
-                self._processing_times[topic].append(processing_time)
+        if processing_time is not None:
+            self._processing_times[topic].record(processing_time)
 
     def record_message_retried(self, topic: str) -> None:
         """
@@ -178,6 +279,72 @@ class MetricsCollector:
                 self._queue_counters[topic]["processing"] -= 1
             self._queue_counters[topic]["dead_letter"] += 1
 
+    def record_parse_error(self, topic: str) -> None:
+        """
+        记录消息解析失败
+
+        Args:
+            topic: 主题名称
+        """
+        with self._lock:
+            self._event_counters[topic]["parse_error"] += 1
+
+    def record_stage_latency(self, topic: str, stage: str, seconds: float) -> None:
+        """
+        记录消息在某个阶段的耗时
+
+        Args:
+            topic: 主题名称
+            stage: 阶段名称，见 LATENCY_STAGES
+            seconds: 耗时（秒），跨主机时钟偏差导致的负值按0记录
+        """
+        # 卫语句：处理器耗时由完成/失败记录统一采集
+        if stage == HANDLER_STAGE:
+            self._processing_times[topic].record(max(seconds, 0.0))
+            return
+        self._stage_times[(topic, stage)].record(max(seconds, 0.0))
+
+    def record_stage_latency_summary(
+        self,
+        topic: str,
+        stage: str,
+        count: int,
+        total: float,
+        minimum: float,
+        maximum: float,
+    ) -> None:
+        """
+        记录一批样本在某个阶段的耗时汇总（Lua脚本按主题聚合后返回）
+
+        Args:
+            topic: 主题名称
+            stage: 阶段名称，见 LATENCY_STAGES
+            count: 样本数
+            total: 耗时总和（秒）
+            minimum: 最小耗时（秒）
+            maximum: 最大耗时（秒）
+        """
+        # 跨主机时钟偏差导致的负值按0记录
+        minimum = max(minimum, 0.0)
+        maximum = max(maximum, 0.0)
+        total = min(max(total, minimum * count), maximum * count)
+        self._stage_times[(topic, stage)].record_summary(count, total, minimum, maximum)
+
+    def update_gauges(self, gauges: dict[str, Any]) -> None:
+        """
+        更新从Redis采集的队列状态快照
+
+        Args:
+            gauges: 指标名到数值的映射，如 {"orders.pending": 10}
+        """
+        snapshot = {
+            name: float(value)
+            for name, value in gauges.items()
+            if isinstance(value, (int, float))
+        }
+        with self._lock:
+            self._gauges = snapshot
+
     def record_delay_message(self, topic: str) -> None:
         """
         记录延时消息
@@ -243,25 +410,69 @@ class MetricsCollector:
         """
         with self._lock:
             counters = self._processing_counters[topic]
-            times = list(self._processing_times[topic])
-
-            if times:
-                avg_time = sum(times) / len(times)
-                max_time = max(times)
-                min_time = min(times)
-            else:
-                avg_time = max_time = min_time = 0.0
-
+            histogram = self._processing_times.get(topic)
+
+            # 卫语句：没有处理时间样本
+            if histogram is None or not histogram.count:
+                return ProcessingMetrics(
+                    total_processed=counters["total_processed"],
+                    success_count=counters["success"],
+                    error_count=counters["error"],
+                    retry_count=counters["retry"],
+                )
+
+            p50, p90, p99, p999 = (histogram.quantile(q) for q in LATENCY_QUANTILES)
             return ProcessingMetrics(
                 total_processed=counters["total_processed"],
                 success_count=counters["success"],
                 error_count=counters["error"],
                 retry_count=counters["retry"],
-                avg_processing_time=avg_time,
-                max_processing_time=max_time,
-                min_processing_time=min_time,
+                avg_processing_time=histogram.mean,
+                max_processing_time=histogram.max,
+                min_processing_time=histogram.min,
+                p50_processing_time=p50,
+                p90_processing_time=p90,
+                p99_processing_time=p99,
+                p999_processing_time=p999,
             )
 
+    def get_latency_metrics(self, topic: str) -> dict[str, LatencyMetrics]:
+        """
+        获取指定主题各阶段的延迟分布，用于定位延迟升高的环节
+
+        Args:
+            topic: 主题名称
+
+        Returns:
+            阶段名称到延迟分布的映射，顺序与 LATENCY_STAGES 一致
+        """
+        with self._lock:
+            return {
+                stage: LatencyMetrics.from_histogram(histogram)
+                for stage in LATENCY_STAGES
+                if (histogram := self._get_stage_histogram(topic, stage)) is not None
+            }
+
+    def _get_stage_histogram(
+        self, topic: str, stage: str
+    ) -> LatencyHistogram | None:
+        """获取本实例某主题某阶段的直方图，没有样本时为None"""
+        if stage == HANDLER_STAGE:
+            return self._processing_times.get(topic)
+        return self._stage_times.get((topic, stage))
+
+    def _iter_stage_histograms(self) -> list[tuple[str, str, LatencyHistogram]]:
+        """列出本实例全部 (主题, 阶段, 直方图)"""
+        histograms = [
+            (topic, HANDLER_STAGE, histogram)
+            for topic, histogram in self._processing_times.items()
+        ]
+        histograms.extend(
+            (topic, stage, histogram)
+            for (topic, stage), histogram in self._stage_times.items()
+        )
+        return histograms
+
     def get_all_queue_metrics(self) -> dict[str, QueueMetrics]:
         """
         获取所有主题的队列指标
@@ -302,11 +513,265 @@ class MetricsCollector:
             self._queue_counters.clear()
             self._processing_counters.clear()
             self._processing_times.clear()
+            self._stage_times.clear()
+            self._pushed_buckets.clear()
+            self._pushed_sums.clear()
+            self._event_counters.clear()
+            self._gauges.clear()
             self._start_times.clear()
 
+    def render_prometheus(self) -> str:
+        """
+        以 Prometheus 文本格式（0.0.4）导出本实例的指标
+
+        Returns:
+            指标文本
+        """
+        with self._lock:
+            events = {topic: dict(c) for topic, c in self._event_counters.items()}
+            processing = {
+                topic: dict(c) for topic, c in self._processing_counters.items()
+            }
+            dead_letters = {
+                topic: c["dead_letter"] for topic, c in self._queue_counters.items()
+            }
+            durations = [
+                (_summary_labels(topic, stage), _summarize(h))
+                for topic, stage, h in self._iter_stage_histograms()
+            ]
+            gauges = dict(self._gauges)
+        runtime = self.runtime.snapshot()
+
+        lines: list[str] = []
+
+        def family(
+            name: str, kind: str, help_text: str, samples: list[tuple[str, float]]
+        ) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {_format_value(value)}")
+
+        family(
+            "mx_rmq_messages_produced_total",
+            "counter",
+            "Messages produced by this instance.",
+            [(_labels(topic=t), c["produced"]) for t, c in events.items()],
+        )
+        family(
+            "mx_rmq_messages_dispatched_total",
+            "counter",
+            "Messages moved to processing and queued for local workers.",
+            [(_labels(topic=t), c["dispatched"]) for t, c in events.items()],
+        )
+        family(
+            "mx_rmq_messages_processed_total",
+            "counter",
+            "Handler executions by result.",
+            [
+                (_labels(topic=t, result=result), c[key])
+                for t, c in processing.items()
+                for result, key in (("success", "success"), ("error", "error"))
+            ],
+        )
+        family(
+            "mx_rmq_messages_retried_total",
+            "counter",
+            "Messages scheduled for retry.",
+            [(_labels(topic=t), c["retry"]) for t, c in processing.items()],
+        )
+        family(
+            "mx_rmq_messages_dead_lettered_total",
+            "counter",
+            "Messages moved to the dead letter queue.",
+            [(_labels(topic=t), c) for t, c in dead_letters.items()],
+        )
+        family(
+            "mx_rmq_parse_errors_total",
+            "counter",
+            "Messages whose stored payload could not be parsed.",
+            [(_labels(topic=t), c["parse_error"]) for t, c in events.items()],
+        )
+
+        # 处理器耗时沿用独立的指标名，其余阶段以 stage 标签区分
+        for name, help_text, handler_only in (
+            ("mx_rmq_handler_duration_seconds", "Handler execution time.", True),
+            (
+                "mx_rmq_stage_latency_seconds",
+                "Latency of each message stage before and after the handler.",
+                False,
+            ),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} summary")
+            for labels, (quantiles, total, count) in durations:
+                if ("stage" not in labels) != handler_only:
+                    continue
+                for q, value in quantiles:
+                    lines.append(
+                        f"{name}{_labels(**labels, quantile=repr(q))} {_format_value(value)}"
+                    )
+                lines.append(f"{name}_sum{_labels(**labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_labels(**labels)} {count}")
+
+        # 队列状态快照：{topic}.pending / {topic}.processing 按主题导出，其余为全局指标
+        topic_gauges: dict[str, list[tuple[str, float]]] = defaultdict(list)
+        global_gauges: list[tuple[str, float]] = []
+        for name, value in gauges.items():
+            topic, _, state = name.rpartition(".")
+            if state in ("pending", "processing") and topic:
+                topic_gauges[state].append((_labels(topic=topic), value))
+            else:
+                global_gauges.append((_labels(key=name), value))
+
+        for state, samples in topic_gauges.items():
+            family(
+                f"mx_rmq_queue_{state}",
+                "gauge",
+                f"Messages in the {state} lists of each topic.",
+                samples,
+            )
+        if global_gauges:
+            family(
+                "mx_rmq_storage_size",
+                "gauge",
+                "Size of global Redis structures (delays, expires, payloads, dlq).",
+                global_gauges,
+            )
+
+        # 运行时饱和度：事件循环延迟、消费者忙闲、本地队列占用和入队阻塞
+        lag_quantiles, lag_sum, lag_count = _summarize(self.runtime.loop_lag)
+        lines.append(
+            "# HELP mx_rmq_event_loop_lag_seconds "
+            "Delay of the event loop in waking a timer."
+        )
+        lines.append("# TYPE mx_rmq_event_loop_lag_seconds summary")
+        for q, value in lag_quantiles:
+            lines.append(
+                f"mx_rmq_event_loop_lag_seconds{_labels(quantile=repr(q))} "
+                f"{_format_value(value)}"
+            )
+        lines.append(f"mx_rmq_event_loop_lag_seconds_sum {_format_value(lag_sum)}")
+        lines.append(f"mx_rmq_event_loop_lag_seconds_count {lag_count}")
+        family(
+            "mx_rmq_worker_busy_seconds_total",
+            "counter",
+            "Time each consumer worker spent running handlers.",
+            [(_labels(worker=n), w.busy_seconds) for n, w in runtime.workers.items()],
+        )
+        family(
+            "mx_rmq_worker_idle_seconds_total",
+            "counter",
+            "Time each consumer worker spent waiting for tasks.",
+            [(_labels(worker=n), w.idle_seconds) for n, w in runtime.workers.items()],
+        )
+        family(
+            "mx_rmq_task_queue_size",
+            "gauge",
+            "Tasks waiting in the local task queue at the last sample.",
+            [("", runtime.task_queue_size_last)],
+        )
+        family(
+            "mx_rmq_dispatch_blocked_seconds_total",
+            "counter",
+            "Time dispatchers spent waiting for room in the local task queue.",
+            [
+                (_labels(topic=t), seconds)
+                for t, seconds in runtime.dispatch_blocked_seconds.items()
+            ],
+        )
+
+        return "\n".join(lines) + "\n"
+
+    async def push_latency_histograms(self) -> int:
+        """
+        将各阶段直方图自上次推送以来的分桶增量累加到Redis指标Hash
+
+        各实例推送的分桶计数直接相加即为集群整体分布，字段格式：
+        latency:{topic}:{stage}:{bucket}（计数）和 latency:{topic}:{stage}:sum（秒）
+
+        Returns:
+            本次写入的字段数
+        """
+        # 卫语句：未配置Redis连接
+        if self.redis is None:
+            return 0
+
+        metrics_key = self._get_global_key(GlobalKeys.METRICS)
+        pushed: list[tuple[tuple[str, str], dict[int, int], float]] = []
+        field_count = 0
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for topic, stage, histogram in self._iter_stage_histograms():
+                key = (topic, stage)
+                prefix = f"latency:{topic}:{stage}"
+                buckets = histogram.nonzero_buckets()
+                previous = self._pushed_buckets[key]
+                for index, bucket_count in buckets.items():
+                    delta = bucket_count - previous.get(index, 0)
+                    if delta:
+                        pipe.hincrby(metrics_key, f"{prefix}:{index}", delta)
+                        field_count += 1
+                sum_delta = histogram.sum - self._pushed_sums[key]
+                if sum_delta:
+                    pipe.hincrbyfloat(metrics_key, f"{prefix}:sum", sum_delta)
+                    field_count += 1
+                pushed.append((key, buckets, histogram.sum))
+
+            # 卫语句：没有新样本
+            if not field_count:
+                return 0
+
+            try:
+                await pipe.execute()
+            except Exception as e:
+                logger.error(f"推送延迟直方图失败: {e}")
+                return 0
+
+        # 写入成功后才推进基线，失败的增量下次重新推送
+        for key, buckets, total in pushed:
+            self._pushed_buckets[key] = buckets
+            self._pushed_sums[key] = total
+        return field_count
+
+    async def fetch_latency_histogram(
+        self, topic: str, stage: str = HANDLER_STAGE
+    ) -> LatencyHistogram:
+        """
+        从Redis指标Hash读取所有实例合并后的阶段直方图
+
+        Args:
+            topic: 主题名称
+            stage: 阶段名称，见 LATENCY_STAGES，默认为处理器耗时
+
+        Returns:
+            合并后的直方图，未配置Redis时为本实例的直方图副本
+        """
+        # 卫语句：未配置Redis连接
+        if self.redis is None:
+            histogram = LatencyHistogram()
+            local = self._get_stage_histogram(topic, stage)
+            if local is not None:
+                histogram.merge(local)
+            return histogram
+
+        prefix = f"latency:{topic}:{stage}"
+        fields = [f"{prefix}:{index}" for index in range(BUCKET_COUNT)]
+        fields.append(f"{prefix}:sum")
+        values = await self.redis.hmget(
+            self._get_global_key(GlobalKeys.METRICS), fields
+        )  # type: ignore
+
+        buckets = {
+            index: int(value)
+            for index, value in enumerate(values[:-1])
+            if value is not None
+        }
+        return LatencyHistogram.from_buckets(buckets, float(values[-1] or 0.0))
+
     async def collect_queue_metrics(self, topics: list[str]) -> dict[str, Any]:
         """
-        收集队列相关指标
+        收集队列相关指标，所有长度查询在一个流水线中完成
 
         Args:
             topics: 主题列表
@@ -320,46 +785,37 @@ class MetricsCollector:
             return metrics
 
         try:
-            # 队列长度指标
+            lane_count = MAX_PRIORITY_LEVEL - MIN_PRIORITY_LEVEL + 1
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for topic in topics:
+                    for lane_key in self._get_priority_lane_keys(topic):
+                        pipe.llen(lane_key)
+                    pipe.llen(self._get_topic_key(topic, TopicKeys.PROCESSING))
+                pipe.zcard(self._get_global_key(GlobalKeys.DELAY_TASKS))
+                pipe.zcard(self._get_global_key(GlobalKeys.EXPIRE_MONITOR))
+                pipe.hlen(self._get_global_key(GlobalKeys.PAYLOAD_MAP))
+                pipe.llen(self._get_global_key(GlobalKeys.DLQ_QUEUE))
+                pipe.hlen(self._get_global_key(GlobalKeys.DLQ_PAYLOAD_MAP))
+                results = await pipe.execute()
+
+            # 待处理数为全部优先级通道之和
+            offset = 0
             for topic in topics:
-                pending_count = await self.redis.llen(
-                    self._get_topic_key(topic, TopicKeys.PENDING)
-                )  # type: ignore
-                processing_count = await self.redis.llen(
-                    self._get_topic_key(topic, TopicKeys.PROCESSING)
-                )  # type: ignore
+                pending_count = sum(results[offset : offset + lane_count])
+                processing_count = results[offset + lane_count]
+                offset += lane_count + 1
 
                 metrics[f"queue.{topic}.pending"] = pending_count
                 metrics[f"queue.{topic}.processing"] = processing_count
                 metrics[f"queue.{topic}.total"] = pending_count + processing_count
 
-            # 延时队列指标
-            delay_count = await self.redis.zcard(
-                self._get_global_key(GlobalKeys.DELAY_TASKS)
-            )  # type: ignore
-            metrics["delay_tasks.count"] = delay_count
-
-            # 过期监控指标
-            expire_count = await self.redis.zcard(
-                self._get_global_key(GlobalKeys.EXPIRE_MONITOR)
-            )  # type: ignore
-            metrics["expire_monitor.count"] = expire_count
-
-            # 消息存储指标
-            payload_count = await self.redis.hlen(
-                self._get_global_key(GlobalKeys.PAYLOAD_MAP)
-            )  # type: ignore
-            metrics["payload_map.count"] = payload_count
-
-            # 死信队列指标
-            dlq_count = await self.redis.llen(
-                self._get_global_key(GlobalKeys.DLQ_QUEUE)
-            )  # type: ignore
-            dlq_payload_count = await self.redis.hlen(
-                self._get_global_key(GlobalKeys.DLQ_PAYLOAD_MAP)
-            )  # type: ignore
-            metrics["dlq.count"] = dlq_count
-            metrics["dlq_payload_map.count"] = dlq_payload_count
+            (
+                metrics["delay_tasks.count"],
+                metrics["expire_monitor.count"],
+                metrics["payload_map.count"],
+                metrics["dlq.count"],
+                metrics["dlq_payload_map.count"],
+            ) = results[offset:]
 
         except Exception as e:
             logger.error(f"收集队列指标失败: {e}")
@@ -370,11 +826,16 @@ class MetricsCollector:
         """
         收集消息处理相关指标
 
+        每个主题只取processing队列最旧的 PROCESSING_SAMPLE_SIZE 条消息，
+        两个流水线往返完成，开销与队列长度无关：count、max_time（最旧）和
+        min_time（最新）是精确值，avg_time 在处理中消息超过采样数时为最旧消息的平均值，
+        stuck_count 在超时消息不超过采样数时是精确值
+
         Args:
             topics: 主题列表
 
         Returns:
-            处理指标字典
+            处理指标字典（时间单位毫秒）
         """
         metrics = {}
         current_time = int(time.time() * 1000)
@@ -383,44 +844,52 @@ class MetricsCollector:
             return metrics
 
         try:
-            # 处理中消息的时长分布
-            for topic in topics:
-                processing_key = f"{topic}:processing"
-                processing_ids = await self.redis.lrange(processing_key, 0, -1)  # type: ignore
-
-                if processing_ids:
-                    processing_times = []
-                    stuck_count = 0
-
-                    for msg_id in processing_ids:
-                        # 从过期监控中获取处理开始时间
-                        expire_time = await self.redis.zscore(
-                            "all_expire_monitor", msg_id
-                        )
-                        if expire_time:
-                            # 处理开始时间 = 过期时间 - 处理超时时间(默认180秒)
-                            start_time = int(expire_time) - 180
-                            processing_time = current_time - start_time
-                            processing_times.append(processing_time)
-
-                            # 检查是否卡死（处理时间超过5分钟）
-                            if processing_time > 300:
-                                stuck_count += 1
-
-                    if processing_times:
-                        metrics[f"processing.{topic}.count"] = len(processing_times)
-                        metrics[f"processing.{topic}.avg_time"] = sum(
-                            processing_times
-                        ) / len(processing_times)
-                        metrics[f"processing.{topic}.max_time"] = max(processing_times)
-                        metrics[f"processing.{topic}.min_time"] = min(processing_times)
-                        metrics[f"processing.{topic}.stuck_count"] = stuck_count
-                else:
-                    metrics[f"processing.{topic}.count"] = 0
-                    metrics[f"processing.{topic}.avg_time"] = 0
-                    metrics[f"processing.{topic}.max_time"] = 0
-                    metrics[f"processing.{topic}.min_time"] = 0
-                    metrics[f"processing.{topic}.stuck_count"] = 0
+            # 新消息从左侧进入processing队列，右端是最旧的消息
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for topic in topics:
+                    processing_key = self._get_topic_key(topic, TopicKeys.PROCESSING)
+                    pipe.llen(processing_key)
+                    pipe.lindex(processing_key, 0)
+                    pipe.lrange(processing_key, -PROCESSING_SAMPLE_SIZE, -1)
+                results = await pipe.execute()
+
+            # 过期监控中的分数为 分发时间 + 处理超时时间
+            expire_key = self._get_global_key(GlobalKeys.EXPIRE_MONITOR)
+            sampled_topics = []
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for index, topic in enumerate(topics):
+                    newest_id, oldest_ids = results[index * 3 + 1 : index * 3 + 3]
+                    if oldest_ids:
+                        pipe.zmscore(expire_key, [newest_id, *oldest_ids])
+                        sampled_topics.append(topic)
+                scores = await pipe.execute() if sampled_topics else []
+            scores_by_topic = dict(zip(sampled_topics, scores, strict=True))
+
+            timeout_ms = self.processing_timeout * 1000
+            for index, topic in enumerate(topics):
+                topic_scores = scores_by_topic.get(topic) or [None]
+                ages = [
+                    current_time - (int(score) - timeout_ms)
+                    for score in topic_scores[1:]
+                    if score is not None
+                ]
+                newest_score = topic_scores[0]
+
+                metrics[f"processing.{topic}.count"] = results[index * 3]
+                metrics[f"processing.{topic}.sampled"] = len(ages)
+                metrics[f"processing.{topic}.avg_time"] = (
+                    sum(ages) / len(ages) if ages else 0
+                )
+                metrics[f"processing.{topic}.max_time"] = max(ages, default=0)
+                metrics[f"processing.{topic}.min_time"] = (
+                    current_time - (int(newest_score) - timeout_ms)
+                    if newest_score is not None
+                    else 0
+                )
+                # 已超过处理超时时间、等待超时监控回收的消息
+                metrics[f"processing.{topic}.stuck_count"] = sum(
+                    1 for age in ages if age > timeout_ms
+                )
 
         except Exception as e:
             logger.error(f"收集处理指标失败: {e}")
@@ -429,10 +898,10 @@ class MetricsCollector:
 
     async def collect_delay_metrics(self) -> dict[str, Any]:
         """
-        收集延时消息相关指标
+        收集延时消息相关指标，使用区间计数和首尾元素，开销与延时队列大小无关
 
         Returns:
-            延时指标字典
+            延时指标字典（时间单位毫秒）
         """
         metrics = {}
         current_time = int(time.time() * 1000)
@@ -441,47 +910,31 @@ class MetricsCollector:
             return metrics
 
         try:
-            # 延时消息时间分布
-            # 获取所有延时任务的执行时间
-            delay_tasks = await self.redis.zrange(
-                self._get_global_key(GlobalKeys.DELAY_TASKS), 0, -1, withscores=True
-            )  # type: ignore
-
-            if delay_tasks:
-                delays = []
-                ready_count = 0
-
-                for _task_id, execute_time in delay_tasks:
-                    delay = int(execute_time) - current_time
-                    delays.append(delay)
-
-                    # 已到期的延时消息
-                    if delay <= 0:
-                        ready_count += 1
-
-                metrics["delay.total_count"] = len(delays)
-                metrics["delay.ready_count"] = ready_count
-                metrics["delay.pending_count"] = len(delays) - ready_count
-
-                if delays:
-                    positive_delays = [d for d in delays if d > 0]
-                    if positive_delays:
-                        metrics["delay.avg_remaining"] = sum(positive_delays) / len(
-                            positive_delays
-                        )
-                        metrics["delay.max_remaining"] = max(positive_delays)
-                        metrics["delay.min_remaining"] = min(positive_delays)
-                    else:
-                        metrics["delay.avg_remaining"] = 0
-                        metrics["delay.max_remaining"] = 0
-                        metrics["delay.min_remaining"] = 0
-            else:
-                metrics["delay.total_count"] = 0
-                metrics["delay.ready_count"] = 0
-                metrics["delay.pending_count"] = 0
-                metrics["delay.avg_remaining"] = 0
-                metrics["delay.max_remaining"] = 0
-                metrics["delay.min_remaining"] = 0
+            delay_key = self._get_global_key(GlobalKeys.DELAY_TASKS)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.zcard(delay_key)
+                pipe.zcount(delay_key, "-inf", current_time)
+                # 最早的未到期任务和最晚的任务
+                pipe.zrangebyscore(
+                    delay_key,
+                    f"({current_time}",
+                    "+inf",
+                    start=0,
+                    num=1,
+                    withscores=True,
+                )
+                pipe.zrange(delay_key, -1, -1, withscores=True)
+                total_count, ready_count, next_task, last_task = await pipe.execute()
+
+            metrics["delay.total_count"] = total_count
+            metrics["delay.ready_count"] = ready_count
+            metrics["delay.pending_count"] = total_count - ready_count
+            metrics["delay.min_remaining"] = (
+                int(next_task[0][1]) - current_time if next_task else 0
+            )
+            metrics["delay.max_remaining"] = (
+                max(int(last_task[0][1]) - current_time, 0) if last_task else 0
+            )
 
         except Exception as e:
             logger.error(f"收集延时指标失败: {e}")
@@ -492,6 +945,9 @@ class MetricsCollector:
         """
         收集错误相关指标
 
+        各主题的死信数读取 Lua 脚本在指标Hash中维护的累计计数（dead_lettered:{topic}），
+        与导出器使用同一计数，一次流水线读取，不遍历死信队列
+
         Args:
             topics: 主题列表
 
@@ -504,29 +960,55 @@ class MetricsCollector:
             return metrics
 
         try:
-            # 死信队列统计
-            dlq_messages = await self.redis.lrange(
-                self._get_global_key(GlobalKeys.DLQ_QUEUE), 0, -1
-            )  # type: ignore
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.llen(self._get_global_key(GlobalKeys.DLQ_QUEUE))
+                if topics:
+                    pipe.hmget(
+                        self._get_global_key(GlobalKeys.METRICS),
+                        [f"dead_lettered:{topic}" for topic in topics],
+                    )
+                results = await pipe.execute()
+
+            counts = results[1] if topics else []
+            for topic, count in zip(topics, counts, strict=True):
+                metrics[f"error.{topic}.dlq_count"] = max(int(count or 0), 0)
+
+            metrics["error.total_dlq"] = results[0]
+
+        except Exception as e:
+            logger.error(f"收集错误指标失败: {e}")
+
+        return metrics
+
+    async def collect_counter_metrics(self, topics: list[str]) -> dict[str, Any]:
+        """
+        收集服务端累计计数
 
-            # 按topic统计死信消息
-            topic_error_counts = dict.fromkeys(topics, 0)
+        生产、完成、重试、死信计数由Lua脚本在状态变更的同一原子操作中写入指标Hash，
+        一次 HMGET 读取，多实例共享且不会漏计
 
-            for msg_id in dlq_messages:
-                queue_name = await self.redis.hget(
-                    self._get_global_key(GlobalKeys.DLQ_PAYLOAD_MAP), f"{msg_id}:queue"
-                )  # type: ignore
-                if queue_name and queue_name in topic_error_counts:
-                    topic_error_counts[queue_name] += 1
+        Args:
+            topics: 主题列表
 
-            for topic, count in topic_error_counts.items():
-                metrics[f"error.{topic}.dlq_count"] = count
+        Returns:
+            计数指标字典，键为 counter.{topic}.{计数名}
+        """
+        metrics: dict[str, Any] = {}
 
-            # 总体错误率计算需要历史数据，这里只记录当前死信队列数量
-            metrics["error.total_dlq"] = len(dlq_messages)
+        # 卫语句：没有Redis连接或没有主题
+        if self.redis is None or not topics:
+            return metrics
 
+        fields = [(topic, name) for topic in topics for name in SERVER_COUNTERS]
+        try:
+            values = await self.redis.hmget(
+                self._get_global_key(GlobalKeys.METRICS),
+                [f"{name}:{topic}" for topic, name in fields],
+            )  # type: ignore
+            for (topic, name), value in zip(fields, values, strict=True):
+                metrics[f"counter.{topic}.{name}"] = int(value or 0)
         except Exception as e:
-            logger.error(f"收集错误指标失败: {e}")
+            logger.error(f"收集计数指标失败: {e}")
 
         return metrics
 
@@ -534,7 +1016,10 @@ class MetricsCollector:
         self, window_seconds: int = 300
     ) -> dict[str, Any]:
         """
-        收集吞吐率指标（需要配合历史数据计算）
+        收集吞吐率指标
+
+        开启分钟桶时读取窗口内已结束的分钟桶（每分钟一个 HGETALL），得到全局准确的
+        各主题每分钟速率；未开启时由历史快照中累计完成数的差值计算
 
         Args:
             window_seconds: 时间窗口（秒）
@@ -542,49 +1027,67 @@ class MetricsCollector:
         Returns:
             吞吐率指标字典
         """
-        metrics = {}
-        current_time = int(time.time() * 1000)
+        if self.redis is not None and self.bucket_minutes > 0:
+            return await self._collect_bucketed_throughput(window_seconds)
+        return self._collect_history_throughput(window_seconds)
 
-        try:
-            # 从历史记录计算吞吐率
-            if len(self.metrics_history) >= 2:
-                # 获取时间窗口内的记录
-                window_start = current_time - window_seconds
-                window_metrics = [
-                    m
-                    for m in self.metrics_history
-                    if m.get("timestamp", 0) >= window_start
-                ]
+    async def _collect_bucketed_throughput(
+        self, window_seconds: int
+    ) -> dict[str, Any]:
+        """由服务端分钟桶计算窗口内的每分钟速率"""
+        metrics: dict[str, Any] = {"throughput.messages_per_minute": 0}
+        assert self.redis is not None
 
-                if len(window_metrics) >= 2:
-                    # 计算处理完成的消息数（通过payload_map的变化）
-                    latest = window_metrics[-1]
-                    earliest = window_metrics[0]
-
-                    time_diff = latest["timestamp"] - earliest["timestamp"]
-                    if time_diff > 0:
-                        # 简单的吞吐率计算
-                        payload_diff = earliest.get(
-                            "payload_map.count", 0
-                        ) - latest.get("payload_map.count", 0)
-
-                        if payload_diff > 0:
-                            throughput = payload_diff / time_diff * 60  # 每分钟处理数
-                            metrics["throughput.messages_per_minute"] = throughput
-                        else:
-                            metrics["throughput.messages_per_minute"] = 0
-                    else:
-                        metrics["throughput.messages_per_minute"] = 0
-                else:
-                    metrics["throughput.messages_per_minute"] = 0
-            else:
-                metrics["throughput.messages_per_minute"] = 0
+        minutes = max(1, min(window_seconds // 60, self.bucket_minutes))
+        # 当前分钟仍在写入，只统计已结束的分钟桶
+        current_minute = int(time.time()) // 60
+        metrics_key = self._get_global_key(GlobalKeys.METRICS)
+
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for offset in range(1, minutes + 1):
+                    pipe.hgetall(f"{metrics_key}:{current_minute - offset}")
+                buckets = await pipe.execute()
+
+            totals: defaultdict[str, int] = defaultdict(int)
+            for bucket in buckets:
+                for field, value in bucket.items():
+                    totals[field] += int(value)
+
+            for field, total in totals.items():
+                name, _, topic = field.partition(":")
+                metrics[f"throughput.{topic}.{name}_per_minute"] = total / minutes
+                if name == "completed":
+                    metrics["throughput.messages_per_minute"] += total / minutes
 
         except Exception as e:
             logger.error(f"收集吞吐率指标失败: {e}")
 
         return metrics
 
+    def _collect_history_throughput(self, window_seconds: int) -> dict[str, Any]:
+        """由历史快照中的累计完成数差值计算每分钟速率"""
+        metrics: dict[str, Any] = {"throughput.messages_per_minute": 0}
+        window_start = int(time.time() * 1000) - window_seconds * 1000
+        window_metrics = [
+            m for m in self.metrics_history if m.get("timestamp", 0) >= window_start
+        ]
+
+        # 卫语句：窗口内不足两个快照
+        if len(window_metrics) < 2:
+            return metrics
+
+        earliest, latest = window_metrics[0], window_metrics[-1]
+        time_diff = latest["timestamp"] - earliest["timestamp"]
+        completed_diff = _sum_counter(latest, "completed") - _sum_counter(
+            earliest, "completed"
+        )
+        if time_diff > 0 and completed_diff > 0:
+            metrics["throughput.messages_per_minute"] = (
+                completed_diff / time_diff * 60_000
+            )
+        return metrics
+
     async def collect_all_metrics(self, topics: list[str]) -> dict[str, Any]:
         """
         收集所有指标
@@ -598,25 +1101,34 @@ class MetricsCollector:
         try:
             all_metrics = {}
 
-            # 收集各类指标
-            queue_metrics = await self.collect_queue_metrics(topics)
-            processing_metrics = await self.collect_processing_metrics(topics)
-            delay_metrics = await self.collect_delay_metrics()
-            error_metrics = await self.collect_error_metrics(topics)
-            throughput_metrics = await self.collect_throughput_metrics()
+            # 收集各类指标：各自只有一到两个流水线往返，并发执行
+            (
+                queue_metrics,
+                processing_metrics,
+                delay_metrics,
+                error_metrics,
+                counter_metrics,
+            ) = await asyncio.gather(
+                self.collect_queue_metrics(topics),
+                self.collect_processing_metrics(topics),
+                self.collect_delay_metrics(),
+                self.collect_error_metrics(topics),
+                self.collect_counter_metrics(topics),
+            )
 
             # 合并所有指标
             all_metrics.update(queue_metrics)
             all_metrics.update(processing_metrics)
             all_metrics.update(delay_metrics)
             all_metrics.update(error_metrics)
-            all_metrics.update(throughput_metrics)
+            all_metrics.update(counter_metrics)
 
             # 添加时间戳
             all_metrics["timestamp"] = int(time.time() * 1000)
 
-            # 保存到历史记录
+            # 保存到历史记录，未开启分钟桶时吞吐率由包含本次快照的历史计算
             self._save_to_history(all_metrics)
+            all_metrics.update(await self.collect_throughput_metrics())
 
             return all_metrics
 
@@ -657,3 +1169,47 @@ class MetricsCollector:
         """清空历史记录"""
         self.metrics_history.clear()
         logger.info("指标历史记录已清空")
+
+
+def _sum_counter(snapshot: dict[str, Any], name: str) -> int:
+    """汇总快照中各主题的某项累计计数"""
+    suffix = f".{name}"
+    return sum(
+        value
+        for key, value in snapshot.items()
+        if key.startswith("counter.") and key.endswith(suffix)
+    )
+
+
+def _labels(**labels: str) -> str:
+    """构造 Prometheus 标签字符串"""
+    return "{" + ",".join(
+        f'{name}="{_escape_label(value)}"' for name, value in labels.items()
+    ) + "}"
+
+
+def _summary_labels(topic: str, stage: str) -> dict[str, str]:
+    """阶段直方图的标签，处理器耗时只带主题"""
+    if stage == HANDLER_STAGE:
+        return {"topic": topic}
+    return {"topic": topic, "stage": stage}
+
+
+def _summarize(
+    histogram: LatencyHistogram,
+) -> tuple[list[tuple[float, float]], float, int]:
+    """直方图的 summary 样本：(分位数列表, 总和, 样本数)"""
+    quantiles = [(q, histogram.quantile(q)) for q in LATENCY_QUANTILES]
+    return quantiles, histogram.sum, histogram.count
+
+
+def _escape_label(value: str) -> str:
+    """转义标签值中的反斜杠、双引号和换行"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    """整数值不带小数点，其余使用 repr 保留精度"""
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -0,0 +1,180 @@
+"""
+运行时饱和度监控模块
+测量事件循环延迟、消费者协程忙闲时间、本地任务队列占用和分发协程的入队阻塞时间，
+用于判断延迟升高应增加工作协程、增加进程还是修复阻塞事件循环的处理器
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+from .histogram import LatencyHistogram
+
+
+class WorkerStats:
+    """单个消费者协程的忙闲时间累计，只在事件循环线程中更新，不加锁"""
+
+    __slots__ = ("started_at", "busy_seconds", "busy_since", "tasks")
+
+    def __init__(self) -> None:
+        self.started_at = time.monotonic()
+        self.busy_seconds = 0.0
+        # 正在处理任务时为开始时间（time.monotonic），空闲时为None
+        self.busy_since: float | None = None
+        self.tasks = 0
+
+    def begin(self) -> None:
+        """取到任务，开始计忙"""
+        self.busy_since = time.monotonic()
+
+    def end(self) -> None:
+        """任务处理结束，累计本次忙碌时间"""
+        # 卫语句：未开始计忙
+        if self.busy_since is None:
+            return
+        self.busy_seconds += time.monotonic() - self.busy_since
+        self.busy_since = None
+        self.tasks += 1
+
+    def busy_until(self, now: float) -> float:
+        """截至给定时间的累计忙碌时间，包含正在处理的任务"""
+        if self.busy_since is None:
+            return self.busy_seconds
+        return self.busy_seconds + now - self.busy_since
+
+
+class WorkerMetrics(BaseModel):
+    """消费者协程忙闲指标"""
+
+    busy_seconds: float = Field(default=0.0, description="累计处理任务时间（秒）")
+    idle_seconds: float = Field(default=0.0, description="累计等待任务时间（秒）")
+    utilization: float = Field(default=0.0, description="忙碌时间占比（0-1）")
+    tasks: int = Field(default=0, description="已处理任务数")
+    busy: bool = Field(default=False, description="当前是否正在处理任务")
+
+
+class RuntimeMetrics(BaseModel):
+    """运行时饱和度指标"""
+
+    loop_lag_last: float = Field(default=0.0, description="最近一次事件循环延迟（秒）")
+    loop_lag_avg: float = Field(default=0.0, description="平均事件循环延迟（秒）")
+    loop_lag_p99: float = Field(default=0.0, description="事件循环延迟P99（秒）")
+    loop_lag_max: float = Field(default=0.0, description="最大事件循环延迟（秒）")
+    loop_lag_samples: int = Field(default=0, description="事件循环延迟采样数")
+    task_queue_size_last: int = Field(default=0, description="最近一次采样的本地任务数")
+    task_queue_size_avg: float = Field(default=0.0, description="本地任务数采样均值")
+    task_queue_size_max: int = Field(default=0, description="本地任务数采样最大值")
+    dispatch_blocked_seconds: dict[str, float] = Field(
+        default_factory=dict, description="各主题分发协程等待本地队列空位的累计时间（秒）"
+    )
+    workers: dict[str, WorkerMetrics] = Field(
+        default_factory=dict, description="各消费者协程的忙闲指标"
+    )
+
+    @property
+    def worker_utilization(self) -> float:
+        """所有消费者协程的平均忙碌时间占比"""
+        if not self.workers:
+            return 0.0
+        return sum(w.utilization for w in self.workers.values()) / len(self.workers)
+
+
+class RuntimeMonitor:
+    """
+    运行时饱和度监控器
+
+    - 事件循环延迟：采样协程按固定间隔休眠，实际唤醒时间与预期的差值即为延迟，
+      持续偏高说明有处理器或日志在阻塞事件循环，应修复处理器或增加进程
+    - 消费者忙闲：各消费者协程取到任务后计忙、处理结束后计闲，
+      利用率接近1且本地队列持续堆积时应增加工作协程
+    - 本地任务队列占用：采样协程每次唤醒时记录队列长度
+    - 入队阻塞：分发协程等待本地队列空位的时间，说明消费跟不上分发
+    """
+
+    def __init__(self) -> None:
+        self.loop_lag = LatencyHistogram()
+        self.loop_lag_last = 0.0
+        self._workers: dict[str, WorkerStats] = {}
+        self._dispatch_blocked: defaultdict[str, float] = defaultdict(float)
+        self._queue_size_last = 0
+        self._queue_size_sum = 0
+        self._queue_size_max = 0
+        self._queue_samples = 0
+
+    def worker(self, name: str) -> WorkerStats:
+        """获取（或注册）消费者协程的忙闲统计"""
+        stats = self._workers.get(name)
+        if stats is None:
+            stats = self._workers[name] = WorkerStats()
+        return stats
+
+    def record_dispatch_blocked(self, topic: str, seconds: float) -> None:
+        """记录分发协程等待本地队列空位的时间"""
+        self._dispatch_blocked[topic] += seconds
+
+    def record_loop_lag(self, seconds: float) -> None:
+        """记录一次事件循环延迟"""
+        self.loop_lag_last = max(seconds, 0.0)
+        self.loop_lag.record(self.loop_lag_last)
+
+    def record_queue_size(self, size: int) -> None:
+        """记录一次本地任务队列长度采样"""
+        self._queue_size_last = size
+        self._queue_size_sum += size
+        self._queue_samples += 1
+        if size > self._queue_size_max:
+            self._queue_size_max = size
+
+    async def run(
+        self, task_queue: Any, interval: float, is_running: Callable[[], bool]
+    ) -> None:
+        """
+        采样协程：测量事件循环延迟并记录本地任务队列长度
+
+        Args:
+            task_queue: 本地任务队列（需提供 qsize()）
+            interval: 采样间隔（秒）
+            is_running: 返回队列是否仍在运行
+        """
+        while is_running():
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            self.record_loop_lag(time.monotonic() - expected)
+            self.record_queue_size(task_queue.qsize())
+
+    def snapshot(self) -> RuntimeMetrics:
+        """生成当前的运行时饱和度指标"""
+        now = time.monotonic()
+        workers = {}
+        for name, stats in self._workers.items():
+            busy = stats.busy_until(now)
+            elapsed = max(now - stats.started_at, busy)
+            workers[name] = WorkerMetrics(
+                busy_seconds=busy,
+                idle_seconds=elapsed - busy,
+                utilization=busy / elapsed if elapsed > 0 else 0.0,
+                tasks=stats.tasks,
+                busy=stats.busy_since is not None,
+            )
+
+        lag = self.loop_lag
+        return RuntimeMetrics(
+            loop_lag_last=self.loop_lag_last,
+            loop_lag_avg=lag.mean,
+            loop_lag_p99=lag.quantile(0.99),
+            loop_lag_max=lag.max,
+            loop_lag_samples=lag.count,
+            task_queue_size_last=self._queue_size_last,
+            task_queue_size_avg=(
+                self._queue_size_sum / self._queue_samples
+                if self._queue_samples
+                else 0.0
+            ),
+            task_queue_size_max=self._queue_size_max,
+            dispatch_blocked_seconds=dict(self._dispatch_blocked),
+            workers=workers,
+        )
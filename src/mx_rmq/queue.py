@@ -3,9 +3,11 @@ Redis消息队列核心实现 - 重构为组合模式
 """
 
 import asyncio
+import math
 import time
 import uuid
 from collections.abc import Callable
+from datetime import timedelta
 from typing import Any
 from dataclasses import dataclass, field
 
@@ -14,16 +16,31 @@ from redis.commands.core import AsyncScript
 from loguru import logger
 
 from .config import MQConfig
+from .hooks import CallHook
 from .constants import GlobalKeys, TopicKeys
 from .core import (
+    AdaptiveConcurrency,
     ConsumerService,
     DispatchService,
+    FairTaskQueue,
     MessageLifecycleService,
     QueueContext,
+    ReplyListener,
     ScheduleService,
 )
+from .monitoring import MetricsServer, RuntimeMetrics
+from .tracing import message_attributes
 from .storage import RedisConnectionManager
-from .message import Message, MessagePriority
+from .message import (
+    DEFAULT_PRIORITY_LEVEL,
+    FANOUT_SEPARATOR,
+    Message,
+    MessagePriority,
+    get_group_topic,
+    get_priority_level,
+)
+from .ratelimit import RateLimit
+from .recurring import RecurringSchedule
 
 
 @dataclass
@@ -35,6 +52,8 @@ class QueueMetrics:
     active_tasks_count: int = 0
     registered_topics: list[str] = field(default_factory=list)
     shutting_down: bool = False
+    # 事件循环延迟、消费者忙闲、本地队列占用和入队阻塞，队列未初始化时为None
+    runtime: RuntimeMetrics | None = None
 
 
 class RedisMessageQueue:
@@ -55,9 +74,13 @@ class RedisMessageQueue:
         # 核心上下文（延迟初始化，私有）
         self._context: QueueContext | None = None
 
-        # 本地任务队列（私有）
-        self._task_queue: asyncio.Queue = asyncio.Queue(
-            maxsize=self.config.task_queue_size
+        # 本地任务队列（私有）：按主题加权公平调度
+        self._task_queue: FairTaskQueue = FairTaskQueue(
+            maxsize=self.config.task_queue_size,
+            weights=self.config.topic_weights,
+            max_inflight=self.config.topic_max_inflight,
+            capacities=self.config.topic_prefetch,
+            dedicated=set(self.config.topic_workers),
         )
 
         # 服务组件（延迟初始化，私有）
@@ -65,6 +88,13 @@ class RedisMessageQueue:
         self._message_handler_service: MessageLifecycleService | None = None
         self._monitor_service: ScheduleService | None = None
         self._dispatch_service: DispatchService | None = None
+        self._reply_listener: ReplyListener | None = None
+
+        # 调用剖析钩子，初始化前注册的在创建上下文时挂载
+        self._hooks: list[CallHook] = []
+
+        # 实例ID，用于区分各实例的RPC回复队列
+        self._instance_id = uuid.uuid4().hex
 
         # 状态管理
         self.initialized = False
@@ -97,6 +127,25 @@ class RedisMessageQueue:
             logger.exception("消息队列初始化失败")
             raise
 
+    def _create_adaptive_concurrency(self) -> AdaptiveConcurrency | None:
+        """创建自适应并发控制器，未启用时返回None"""
+        # 卫语句：未启用自适应并发
+        if not self.config.adaptive_concurrency:
+            return None
+
+        # 并发上限的最大值：专属协程数与显式配置的最大同时处理数取较小值
+        max_limits = dict(self.config.topic_workers)
+        for topic, limit in self.config.topic_max_inflight.items():
+            max_limits[topic] = min(limit, max_limits.get(topic, limit))
+
+        return AdaptiveConcurrency(
+            self._task_queue,
+            max_limits=max_limits,
+            default_max_limit=self.config.max_workers,
+            min_limit=self.config.adaptive_min_concurrency,
+            latency_tolerance=self.config.adaptive_latency_tolerance,
+        )
+
     async def _initialize_services(self, lua_scripts: dict[str, AsyncScript]) -> None:
         """初始化服务组件"""
         # 确保Redis连接已建立
@@ -108,20 +157,32 @@ class RedisMessageQueue:
             redis=self._connection_manager.redis,
             lua_scripts=lua_scripts,
         )
+        for hook in self._hooks:
+            self._context.add_hook(hook)
 
         # 初始化服务组件
-        self._consumer_service = ConsumerService(self._context, self._task_queue)
+        self._consumer_service = ConsumerService(
+            self._context, self._task_queue, self._create_adaptive_concurrency()
+        )
         self._message_handler_service = MessageLifecycleService(self._context)
         self._monitor_service = ScheduleService(self._context)
         self._dispatch_service = DispatchService(
             self._context, self._task_queue, self._connection_manager
         )
+        self._reply_listener = ReplyListener(
+            self._context,
+            self._context.get_global_key(
+                f"{GlobalKeys.REPLY_PREFIX.value}:{self._instance_id}"
+            ),
+        )
 
 
 
     async def cleanup(self) -> None:
         """清理资源"""
         try:
+            if self._reply_listener:
+                await self._reply_listener.close()
             await self._connection_manager.cleanup()
         except Exception as e:
             logger.exception("清理资源时出错")
@@ -132,10 +193,12 @@ class RedisMessageQueue:
         self,
         topic: str,
         payload: dict[str, Any],
-        delay: int = 0,
-        priority: MessagePriority = MessagePriority.NORMAL,
+        delay: float | timedelta = 0,
+        priority: MessagePriority | int = MessagePriority.NORMAL,
         ttl: int | None = None,
         message_id: str | None = None,
+        deliver_at: int | None = None,
+        ordering_key: str | None = None,
     ) -> str:
         """
         生产消息
@@ -143,14 +206,32 @@ class RedisMessageQueue:
         Args:
             topic: 主题名称
             payload: 消息负载，其他语言保持相同的json即可
-            delay: 延迟执行时间（秒），0表示立即执行
-            priority: 消息优先级
+            delay: 延迟执行时间（秒或timedelta），支持毫秒精度，0表示立即执行
+            priority: 消息优先级，枚举或0-9的数值（越大越优先）
             ttl: 消息生存时间（秒），None使用配置默认值
-            message_id: 消息ID，None则自动生成
+            message_id: 消息ID，None则自动生成，不能包含广播分隔符 @
+            deliver_at: 绝对投递时间戳（毫秒），与delay二选一
+            ordering_key: 顺序键，同一主题内同键的消息在所有消费者间串行、
+                按生产顺序处理（延时消息按到期顺序），不同键之间仍然并行
 
         Returns:
             消息ID
         """
+        if isinstance(delay, timedelta):
+            delay = delay.total_seconds()
+
+        # 卫语句：delay 与 deliver_at 只能指定一个
+        if deliver_at is not None and delay:
+            raise ValueError("delay 和 deliver_at 只能指定一个")
+
+        # 卫语句：延迟时间不能为负数
+        if delay < 0:
+            raise ValueError(f"延迟时间不能为负数: {delay}")
+
+        # 卫语句：分隔符用于区分广播消息的分组投递ID
+        if message_id and FANOUT_SEPARATOR in message_id:
+            raise ValueError(f"消息ID不能包含 {FANOUT_SEPARATOR}: {message_id}")
+
         if not self.initialized:
             await self.initialize()
 
@@ -163,47 +244,272 @@ class RedisMessageQueue:
             payload=payload,
             priority=priority,
         )
+        message.ordering_key = ordering_key
 
         # 设置过期时间
         ttl = ttl or self.config.message_ttl
-        message.meta.delay=delay
+        message.meta.delay = delay
+        message.meta.deliver_at = deliver_at
+        if delay > 0 or deliver_at is not None:
+            message.meta.scheduled_at = deliver_at or (
+                message.meta.created_at + round(delay * 1000)
+            )
         expire_time = int(time.time() * 1000) + ttl * 1000
         message.meta.expire_at = expire_time
         message.meta.max_retries = self.config.max_retries
         message.meta.retry_delays = self.config.retry_delays.copy()
    
 
-        message_json = message.model_dump_json(by_alias=True, exclude_none=True)
+        # 生产 span 作为消费端处理 span 的父上下文，随消息元数据跨服务传播
+        tracer = self._context.tracer
+        with tracer.span(
+            f"{topic} publish",
+            kind="producer",
+            attributes=message_attributes(topic, message.id),
+        ):
+            message.meta.trace_context = tracer.inject()
+            message_json = message.model_dump_json(by_alias=True, exclude_none=True)
 
-        try:
-            # 根据延迟时间选择生产策略
-            if delay > 0:
-                await self._produce_delayed_message_with_logging(
-                    message, message_json, topic, delay, priority
+            try:
+                # 根据延迟时间选择生产策略
+                if delay > 0 or deliver_at is not None:
+                    await self._produce_delayed_message_with_logging(
+                        message,
+                        message_json,
+                        topic,
+                        delay,
+                        priority,
+                        deliver_at=deliver_at,
+                    )
+                else:
+                    await self._produce_immediate_message_with_logging(
+                        message, message_json, topic, expire_time, priority
+                    )
+
+                self._context.metrics.record_message_produced(topic)
+                return message.id
+
+            except Exception as e:
+                logger.exception(
+                    f"消息生产失败, message_id={message.id}, topic={topic}"
                 )
-            else:
+                raise
+
+    async def call(
+        self,
+        topic: str,
+        payload: dict[str, Any],
+        timeout: float = 30.0,
+        priority: MessagePriority | int = MessagePriority.NORMAL,
+        max_retries: int = 0,
+    ) -> Any:
+        """
+        请求/回复调用：生产带回复地址的消息并等待处理器的返回值
+
+        所有调用共用本实例的一个回复队列和一个回复监听协程。
+
+        Args:
+            topic: 主题名称
+            payload: 消息负载
+            timeout: 等待回复的超时时间（秒），同时作为消息生存时间
+            priority: 消息优先级，枚举或0-9的数值（越大越优先）
+            max_retries: 处理失败时的最大重试次数，默认不重试，立即返回错误
+
+        Returns:
+            处理器的返回值（经JSON往返）
+
+        Raises:
+            TimeoutError: 超时未收到回复
+            RuntimeError: 处理器执行失败
+        """
+        # 卫语句：超时时间必须为正数
+        if timeout <= 0:
+            raise ValueError(f"超时时间必须大于0: {timeout}")
+
+        if not self.initialized:
+            await self.initialize()
+
+        assert self._context is not None
+        assert self._reply_listener is not None
+
+        message = Message(topic=topic, payload=payload, priority=priority)
+        message.reply_to = self._reply_listener.reply_key
+        expire_time = int(time.time() * 1000) + math.ceil(timeout * 1000)
+        message.meta.expire_at = expire_time
+        message.meta.max_retries = max_retries
+        message.meta.retry_delays = self.config.retry_delays.copy()
+
+        # 先登记再生产，避免回复先于登记到达
+        future = self._reply_listener.register(message.id)
+        tracer = self._context.tracer
+        try:
+            # 调用 span 覆盖生产和等待回复，处理端 span 是它的子 span
+            with tracer.span(
+                f"{topic} publish",
+                kind="producer",
+                attributes=message_attributes(topic, message.id),
+            ):
+                message.meta.trace_context = tracer.inject()
                 await self._produce_immediate_message_with_logging(
-                    message, message_json, topic, expire_time, priority
+                    message,
+                    message.model_dump_json(by_alias=True, exclude_none=True),
+                    topic,
+                    expire_time,
+                    priority,
                 )
+                self._context.metrics.record_message_produced(topic)
+                return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                f"RPC调用超时, message_id={message.id}, topic={topic}, timeout={timeout}"
+            ) from None
+        finally:
+            self._reply_listener.discard(message.id)
+
+    async def publish(
+        self,
+        topic: str,
+        payload: dict[str, Any],
+        priority: MessagePriority | int = MessagePriority.NORMAL,
+        ttl: int | None = None,
+        message_id: str | None = None,
+    ) -> str:
+        """
+        发布广播消息：一次发布投递到广播主题的每个订阅分组
 
-            return message.id
+        消息体只存储一份，每个分组拥有独立的 pending/processing 状态、重试和死信，
+        所有分组处理结束后消息体才被删除。没有订阅分组时消息被丢弃。
 
-        except Exception as e:
-            logger.exception(f"消息生产失败, message_id={message.id}, topic={topic}")
+        Args:
+            topic: 广播主题名称
+            payload: 消息负载
+            priority: 消息优先级，枚举或0-9的数值（越大越优先）
+            ttl: 消息生存时间（秒），None使用配置默认值
+            message_id: 消息ID，None则自动生成
+
+        Returns:
+            消息ID，各分组的投递ID为 {消息ID}@{分组}
+        """
+        # 卫语句：分隔符用于区分分组投递ID
+        if message_id and FANOUT_SEPARATOR in message_id:
+            raise ValueError(f"广播消息ID不能包含 {FANOUT_SEPARATOR}: {message_id}")
+
+        if not self.initialized:
+            await self.initialize()
+
+        assert self._context is not None
+
+        message = Message(
+            id=message_id or str(uuid.uuid4()),
+            topic=topic,
+            payload=payload,
+            priority=priority,
+        )
+        expire_time = int(time.time() * 1000) + (ttl or self.config.message_ttl) * 1000
+        message.meta.expire_at = expire_time
+        message.meta.max_retries = self.config.max_retries
+        message.meta.retry_delays = self.config.retry_delays.copy()
+
+        tracer = self._context.tracer
+        try:
+            with tracer.span(
+                f"{topic} publish",
+                kind="producer",
+                attributes=message_attributes(topic, message.id),
+            ):
+                message.meta.trace_context = tracer.inject()
+                delivered = await self._context.lua_scripts["publish_message"](
+                    keys=[
+                        self._context.get_global_key(GlobalKeys.PAYLOAD_MAP),
+                        self._context.get_global_key(GlobalKeys.EXPIRE_MONITOR),
+                        self._context.get_global_topic_key(topic, TopicKeys.GROUPS),
+                        self._context.get_global_key(GlobalKeys.METRICS),
+                    ],
+                    args=[
+                        message.id,
+                        message.model_dump_json(by_alias=True, exclude_none=True),
+                        self._context.get_global_key(topic),
+                        expire_time,
+                        self._context.get_priority_lane_arg(
+                            get_priority_level(priority)
+                        ),
+                        topic,
+                        self._context.get_counter_bucket_ttl(),
+                    ],
+                )  # type: ignore
+        except Exception:
+            logger.exception(f"广播消息发布失败, message_id={message.id}, topic={topic}")
             raise
 
+        self._context.metrics.record_message_produced(topic)
+        if not delivered:
+            logger.warning(
+                f"广播主题没有订阅分组，消息已丢弃, message_id={message.id}, topic={topic}"
+            )
+        elif self._context.log_sampler.should_log("publish"):
+            logger.info(
+                "广播消息发布成功, message_id={message_id}, topic={topic}, groups={groups}",
+                message_id=message.id,
+                topic=topic,
+                groups=delivered,
+            )
+        return message.id
+
+    async def unsubscribe(self, topic: str, group: str) -> bool:
+        """
+        注销广播主题的订阅分组，之后发布的广播消息不再投递到该分组
+
+        已投递到该分组的消息仍留在分组队列中，由该分组的消费者继续处理或按过期清理。
+
+        Args:
+            topic: 广播主题名称
+            group: 订阅分组名称
+
+        Returns:
+            bool: True表示注销成功，False表示分组未订阅
+        """
+        if not self.initialized:
+            await self.initialize()
+
+        assert self._context is not None
+
+        removed = await self._context.redis.srem(
+            self._context.get_global_topic_key(topic, TopicKeys.GROUPS), group
+        )  # type: ignore
+        logger.info(f"广播订阅分组注销, topic={topic}, group={group}, removed={bool(removed)}")
+        return bool(removed)
+
     async def _produce_delayed_message_with_logging(
         self,
         message: Message,
         message_json: str,
         topic: str,
-        delay: int,
-        priority: MessagePriority,
+        delay: float,
+        priority: MessagePriority | int,
+        deliver_at: int | None = None,
     ) -> None:
         """生产延时消息并记录日志"""
-        await self._produce_delay_message(message.id, message_json, topic, delay)
+        await self._produce_delay_message(
+            message.id,
+            message_json,
+            topic,
+            round(delay * 1000),
+            deliver_at,
+            get_priority_level(priority),
+            ordering_key=message.ordering_key,
+        )
+        self._context.metrics.record_delay_message(topic)  # type: ignore
+        # 卫语句：按采样率跳过逐条生产日志
+        if not self._context.log_sampler.should_log("produce"):  # type: ignore
+            return
         logger.info(
-            f"消息生产成功[延时] - message_id={message.id}, topic={topic}, delay={delay}, priority={priority.value}"
+            "消息生产成功[延时] - message_id={message_id}, topic={topic}, "
+            "delay={delay}, deliver_at={deliver_at}, priority={priority}",
+            message_id=message.id,
+            topic=topic,
+            delay=delay,
+            deliver_at=deliver_at,
+            priority=getattr(priority, "value", priority),
         )
 
     async def _produce_immediate_message_with_logging(
@@ -212,14 +518,26 @@ class RedisMessageQueue:
         message_json: str,
         topic: str,
         expire_time: int,
-        priority: MessagePriority,
+        priority: MessagePriority | int,
     ) -> None:
         """生产立即消息并记录日志"""
         await self._produce_normal_message(
-            message.id, message_json, topic, expire_time, priority
+            message.id,
+            message_json,
+            topic,
+            expire_time,
+            priority,
+            ordering_key=message.ordering_key,
         )
+        # 卫语句：按采样率跳过逐条生产日志
+        if not self._context.log_sampler.should_log("produce"):  # type: ignore
+            return
         logger.info(
-            f"消息生产成功[立即] - message_id={message.id}, topic={topic}, priority={priority.value}"
+            "消息生产成功[立即] - message_id={message_id}, topic={topic}, "
+            "priority={priority}",
+            message_id=message.id,
+            topic=topic,
+            priority=getattr(priority, "value", priority),
         )
 
     async def _produce_normal_message(
@@ -228,11 +546,13 @@ class RedisMessageQueue:
         payload_json: str,
         topic: str,
         expire_time: int,
-        priority: MessagePriority,
+        priority: MessagePriority | int,
+        ordering_key: str | None = None,
     ) -> None:
         """生产普通消息"""
         assert self._context is not None
-        is_urgent = "1" if priority == MessagePriority.HIGH else "0"
+        level = get_priority_level(priority)
+        ordering_hash = self._context.get_global_topic_key(topic, TopicKeys.ORDERING)
 
         # 在存储时就使用完整的带前缀的队列名
         full_topic_name = self._context.get_global_key(topic)
@@ -240,18 +560,36 @@ class RedisMessageQueue:
         await self._context.lua_scripts["produce_normal"](
             keys=[
                 self._context.get_global_key(GlobalKeys.PAYLOAD_MAP),
-                self._context.get_global_topic_key(
-                    topic, TopicKeys.PENDING
-                ),  # 用于入队
+                self._context.get_priority_lane_key(topic, level),  # 用于入队
                 self._context.get_global_key(GlobalKeys.EXPIRE_MONITOR),
+                self._context.get_global_topic_key(topic, TopicKeys.SIGNAL),
+                ordering_hash,
+                f"{ordering_hash}:{ordering_key}" if ordering_key else "",
+                self._context.get_global_key(GlobalKeys.METRICS),
+            ],
+            args=[
+                message_id,
+                payload_json,
+                full_topic_name,
+                expire_time,
+                self._context.get_priority_lane_arg(level),
+                ordering_key or "",
+                topic,
+                self._context.get_counter_bucket_ttl(),
             ],
-            args=[message_id, payload_json, full_topic_name, expire_time, is_urgent],
         )  # type: ignore
 
     async def _produce_delay_message(
-        self, message_id: str, payload_json: str, topic: str, delay_seconds: int
+        self,
+        message_id: str,
+        payload_json: str,
+        topic: str,
+        delay_ms: int,
+        deliver_at: int | None = None,
+        priority_level: int = DEFAULT_PRIORITY_LEVEL,
+        ordering_key: str | None = None,
     ) -> None:
-        """生产延时消息"""
+        """生产延时消息（毫秒精度）"""
         assert self._context is not None
 
         # 在存储时就使用完整的带前缀的队列名
@@ -262,13 +600,131 @@ class RedisMessageQueue:
             keys=[
                 self._context.get_global_key(GlobalKeys.PAYLOAD_MAP),
                 self._context.get_global_key(GlobalKeys.DELAY_TASKS),
-                self._context.get_global_key(
-                    GlobalKeys.DELAY_PUBSUB_CHANNEL
-                ),  # pubsub 通道
+                self._context.get_delay_wakeup_key(),  # 唤醒目标
+                self._context.get_global_key(GlobalKeys.DELAY_BUCKETS),
+                self._context.get_global_key(GlobalKeys.METRICS),
+            ],
+            args=[
+                message_id,
+                payload_json,
+                full_topic_name,
+                delay_ms,
+                deliver_at or 0,
+                *self._context.get_delay_bucket_args(),
+                self.config.delay_wakeup_mode,
+                self._context.get_priority_lane_arg(priority_level),
+                ordering_key or "",
+                topic,
+                self._context.get_counter_bucket_ttl(),
+            ],
+        )  # type: ignore
+
+    # ==================== 周期任务接口 ====================
+
+    async def schedule(
+        self,
+        topic: str,
+        payload: dict[str, Any],
+        cron: str | None = None,
+        every: float | None = None,
+        jitter: float = 0.0,
+        priority: MessagePriority | int = MessagePriority.NORMAL,
+        ttl: int | None = None,
+        schedule_id: str | None = None,
+    ) -> str:
+        """
+        创建周期任务，定义存储在Redis中，由延时调度器按周期物化为延时消息
+
+        Args:
+            topic: 主题名称
+            payload: 每次触发投递的消息负载
+            cron: 5字段cron表达式（UTC），与every二选一
+            every: 固定触发间隔（秒），与cron二选一
+            jitter: 触发时间随机抖动上限（秒），用于打散整点洪峰
+            priority: 消息优先级，枚举或0-9的数值（越大越优先）
+            ttl: 每次触发消息的生存时间（秒），None使用配置默认值
+            schedule_id: 周期任务ID，已存在时覆盖原定义；None则自动生成，不能包含广播分隔符 @
+
+        Returns:
+            周期任务ID
+        """
+        if not self.initialized:
+            await self.initialize()
+
+        assert self._context is not None
+
+        definition = RecurringSchedule(
+            topic=topic,
+            payload=payload,
+            cron=cron,
+            every=every,
+            jitter=jitter,
+            priority=priority,
+            ttl=ttl,
+            **({"id": schedule_id} if schedule_id else {}),
+        )
+
+        occurrence = definition.next_occurrence(int(time.time() * 1000))
+        fire_time = definition.fire_time(occurrence)
+        message = definition.build_message(occurrence, fire_time, self.config)
+
+        await self._context.lua_scripts["create_schedule"](
+            keys=[
+                self._context.get_global_key(GlobalKeys.SCHEDULES),
+                self._context.get_global_key(GlobalKeys.SCHEDULE_NEXT),
+                self._context.get_global_key(GlobalKeys.PAYLOAD_MAP),
+                self._context.get_global_key(GlobalKeys.DELAY_TASKS),
+                self._context.get_delay_wakeup_key(),
+            ],
+            args=[
+                definition.id,
+                definition.model_dump_json(),
+                occurrence,
+                fire_time,
+                message.id,
+                message.model_dump_json(by_alias=True, exclude_none=True),
+                self._context.get_global_key(topic),
+                self.config.delay_wakeup_mode,
+                self._context.get_priority_lane_arg(
+                    get_priority_level(definition.priority)
+                ),
             ],
-            args=[message_id, payload_json, full_topic_name, delay_seconds],
         )  # type: ignore
 
+        logger.info(
+            f"周期任务创建成功 - schedule_id={definition.id}, topic={topic}, "
+            f"cron={cron}, every={every}, first_occurrence={occurrence}"
+        )
+        return definition.id
+
+    async def unschedule(self, schedule_id: str) -> bool:
+        """
+        删除周期任务，并撤销其尚未触发的物化消息
+
+        Args:
+            schedule_id: 周期任务ID
+
+        Returns:
+            bool: True表示删除成功，False表示周期任务不存在
+        """
+        if not self.initialized:
+            await self.initialize()
+
+        assert self._context is not None
+
+        removed = await self._context.lua_scripts["remove_schedule"](
+            keys=[
+                self._context.get_global_key(GlobalKeys.SCHEDULES),
+                self._context.get_global_key(GlobalKeys.SCHEDULE_NEXT),
+                self._context.get_global_key(GlobalKeys.PAYLOAD_MAP),
+                self._context.get_global_key(GlobalKeys.DELAY_TASKS),
+            ],
+            args=[schedule_id],
+        )  # type: ignore
+
+        logger.info(f"周期任务删除, schedule_id={schedule_id}, removed={bool(removed)}")
+        return bool(removed)
+
     # ==================== 消费者接口 ====================
 
     async def _prepare_for_consuming(self) -> None:
@@ -281,16 +737,48 @@ class RedisMessageQueue:
         # 注册延迟的处理器
         if hasattr(self, "_pending_handlers"):
             for topic, handler in self._pending_handlers.items():
-                self._context.register_handler(topic, handler)
+                fanout_topic, group = self._pending_subscriptions.get(topic, (topic, None))
+                self._context.register_handler(
+                    fanout_topic,
+                    handler,
+                    self._pending_rate_limits.get(topic),
+                    group,
+                    self._pending_chains.get(topic),
+                )
             delattr(self, "_pending_handlers")
+            delattr(self, "_pending_rate_limits")
+            delattr(self, "_pending_subscriptions")
+            delattr(self, "_pending_chains")
 
         if not self._context.handlers:
             logger.warning("未注册任何消息处理器，队列将启动但不会处理业务消息")
             return
+
+        # 登记广播订阅分组，之后发布的广播消息才会投递到这些分组
+        await self._subscribe_groups()
         
         # 验证Redis连接池大小
         self._validate_connection_pool_size()
 
+    async def _subscribe_groups(self) -> None:
+        """将已注册的订阅分组写入各广播主题的分组集合"""
+        assert self._context is not None
+        # 卫语句：没有订阅分组
+        if not self._context.subscriptions:
+            return
+
+        async with self._context.redis.pipeline(transaction=False) as pipe:
+            for fanout_topic, group in self._context.subscriptions.values():
+                pipe.sadd(
+                    self._context.get_global_topic_key(fanout_topic, TopicKeys.GROUPS),
+                    group,
+                )
+            await pipe.execute()
+
+        logger.info(
+            f"广播订阅分组登记完成, subscriptions={sorted(self._context.subscriptions)}"
+        )
+
     def _validate_connection_pool_size(self) -> None:
         """验证Redis连接池大小是否足够"""
         # 卫语句：如果context不存在则直接返回
@@ -299,6 +787,14 @@ class RedisMessageQueue:
         
         topic_count = len(self._context.handlers)
         max_connections = self.config.redis_max_connections
+
+        # 分发连接数：multiplexed 模式所有topic共用一个阻塞连接
+        if self.config.dispatch_mode == "multiplexed":
+            dispatch_connections = min(topic_count, 1)
+            dispatch_desc = f"{dispatch_connections}个复用分发连接"
+        else:
+            dispatch_connections = topic_count
+            dispatch_desc = f"{topic_count}个topic"
         
         # 预留连接数计算：
         # - 延时消息处理: 1个连接
@@ -308,7 +804,7 @@ class RedisMessageQueue:
         # - 消息生产: 2个连接
         # - 其他操作预留: 2个连接
         reserved_connections = 8
-        required_connections = topic_count + reserved_connections
+        required_connections = dispatch_connections + reserved_connections
         
         # 卫语句：连接数足够则直接返回
         if max_connections >= required_connections:
@@ -317,7 +813,7 @@ class RedisMessageQueue:
         # 连接数不足，抛出详细错误信息
         raise ValueError(
             f"Redis连接池大小不足：当前配置{max_connections}个连接，"
-            f"需要至少{required_connections}个连接（{topic_count}个topic + {reserved_connections}个预留）。\n"
+            f"需要至少{required_connections}个连接（{dispatch_desc} + {reserved_connections}个预留）。\n"
             f"请增加redis_max_connections配置至{required_connections}或更高。\n"
             f"建议配置：redis_max_connections = {required_connections + 5}  # 额外预留5个连接"
         )
@@ -332,15 +828,25 @@ class RedisMessageQueue:
 
         task_definitions = []
 
-        # 1. 消息分发协程（每个topic一个）
-        for topic in self._context.handlers.keys():
-            task_definitions.append(
-                {
-                    "name": f"dispatch_{topic}",
-                    "coro": self._dispatch_service.dispatch_messages(topic),  # type: ignore
-                    "description": f"消息分发协程-{topic}",
-                }
-            )
+        # 1. 消息分发协程（per_topic 模式每个topic一个，multiplexed 模式共用一个）
+        if self.config.dispatch_mode == "multiplexed":
+            if self._context.handlers:
+                task_definitions.append(
+                    {
+                        "name": "dispatch_multiplexed",
+                        "coro": self._dispatch_service.dispatch_multiplexed(),  # type: ignore
+                        "description": "多主题复用分发协程",
+                    }
+                )
+        else:
+            for topic in self._context.handlers.keys():
+                task_definitions.append(
+                    {
+                        "name": f"dispatch_{topic}",
+                        "coro": self._dispatch_service.dispatch_messages(topic),  # type: ignore
+                        "description": f"消息分发协程-{topic}",
+                    }
+                )
 
         # 2. 延时消息处理协程
         task_definitions.append(
@@ -382,6 +888,21 @@ class RedisMessageQueue:
                 }
             )
 
+        # 5.1 主题专属消费者协程池
+        for topic, worker_count in self.config.topic_workers.items():
+            # 卫语句：未注册处理器的主题不启动专属协程
+            if topic not in self._context.handlers:
+                logger.warning(f"主题未注册处理器，忽略专属工作协程配置, topic={topic}")
+                continue
+            for i in range(worker_count):
+                task_definitions.append(
+                    {
+                        "name": f"consumer_{topic}_{i}",
+                        "coro": self._consumer_service.consume_messages(topic),  # type: ignore
+                        "description": f"专属消费者协程-{topic}-{i}",
+                    }
+                )
+
         # 6. 系统监控协程
         task_definitions.append(
             {
@@ -391,6 +912,33 @@ class RedisMessageQueue:
             }
         )
 
+        # 6.1 运行时饱和度采样协程（事件循环延迟、本地队列占用）
+        if self.config.runtime_monitor_interval > 0:
+            task_definitions.append(
+                {
+                    "name": "runtime_monitor",
+                    "coro": self._context.metrics.runtime.run(
+                        self._task_queue,
+                        self.config.runtime_monitor_interval,
+                        self._context.is_running,
+                    ),
+                    "description": "运行时饱和度采样协程",
+                }
+            )
+
+        # 7. Prometheus 指标端点（可选）
+        if self.config.metrics_port:
+            metrics_server = MetricsServer(
+                self._context.metrics, self.config.metrics_host, self.config.metrics_port
+            )
+            task_definitions.append(
+                {
+                    "name": "metrics_server",
+                    "coro": metrics_server.serve(),
+                    "description": "Prometheus指标端点",
+                }
+            )
+
         return task_definitions
 
     def _create_task_from_definition(self, task_def: dict[str, Any]) -> asyncio.Task:
@@ -440,29 +988,95 @@ class RedisMessageQueue:
             # 清理任务（所有模式都需要清理任务）
             await self._cleanup_tasks()
 
-    def register_handler(self, topic: str, handler: Callable) -> None:
+    def register_handler(
+        self,
+        topic: str,
+        handler: Callable,
+        rate_limit: str | None = None,
+        group: str | None = None,
+        then: str | list[str] | None = None,
+    ) -> None:
         """
         注册消息处理器
 
         Args:
             topic: 主题名称
             handler: 消息处理函数，接收payload参数
+            rate_limit: 全局速率限制，如 "500/s"、"30/m"，由所有消费实例共享的
+                Redis令牌桶控制，超出预算的消息留在pending队列中不会被取出
+            group: 广播订阅分组，指定时订阅广播主题，publish 的每条消息都会投递到
+                该分组一次，分组内的多个消费实例竞争消费。分组的内部主题为
+                {topic}@{group}，topic_workers 等按主题的配置使用该名称
+            then: 工作流链的后续主题，处理成功后以处理器返回的字典（返回其他值时沿用
+                当前消息的负载）为负载投递到这些主题，与当前消息的完成确认在同一个
+                Lua脚本中原子写入。处理器也可以直接返回 FollowUp 或其列表指定后续消息
         """
         if not callable(handler):
             raise TypeError("处理器必须是可调用对象")
 
+        # 提前校验速率表达式，避免启动消费时才报错
+        if rate_limit:
+            RateLimit.parse(rate_limit)
+
+        # 卫语句：分组名称不能为空，也不能包含分隔符
+        if group is not None and (not group.strip() or FANOUT_SEPARATOR in group):
+            raise ValueError(f"订阅分组名称不能为空或包含 {FANOUT_SEPARATOR}: {group!r}")
+
+        # 卫语句：后续主题不能为空
+        chain = [then] if isinstance(then, str) else list(then or [])
+        if any(not next_topic or not next_topic.strip() for next_topic in chain):
+            raise ValueError(f"工作流链的后续主题不能为空: {then!r}")
+
         """注册处理器装饰器"""
 
         # 如果已经初始化，直接注册到context
         if self._context:
-            self._context.register_handler(topic, handler)
+            self._context.register_handler(topic, handler, rate_limit, group, then)
         else:
             # 延迟注册，等待初始化
             if not hasattr(self, "_pending_handlers"):
                 self._pending_handlers: dict[str, Callable] = {}
-            self._pending_handlers[topic] = handler
+                self._pending_rate_limits: dict[str, str | None] = {}
+                self._pending_subscriptions: dict[str, tuple[str, str]] = {}
+                self._pending_chains: dict[str, str | list[str] | None] = {}
+            handler_topic = get_group_topic(topic, group) if group else topic
+            self._pending_handlers[handler_topic] = handler
+            self._pending_rate_limits[handler_topic] = rate_limit
+            self._pending_chains[handler_topic] = then
+            if group:
+                self._pending_subscriptions[handler_topic] = (topic, group)
 
-        logger.info(f"消息处理器注册成功, topic={topic}, handler={handler.__name__}")
+        logger.info(
+            f"消息处理器注册成功, topic={topic}, group={group}, handler={handler.__name__}"
+        )
+
+    def add_hook(self, hook: CallHook) -> None:
+        """
+        注册调用剖析钩子
+
+        钩子在每次 Lua 脚本调用、分发/生命周期服务中的 Redis 命令和业务处理器调用
+        前后回调，可用于采样剖析、自定义计时和慢调用日志。未注册钩子时调用路径
+        不经过任何回调
+
+        Args:
+            hook: CallHook 子类实例，按需覆盖 before / after
+        """
+        if hook not in self._hooks:
+            self._hooks.append(hook)
+        if self._context:
+            self._context.add_hook(hook)
+
+    def remove_hook(self, hook: CallHook) -> None:
+        """
+        移除调用剖析钩子
+
+        Args:
+            hook: 已注册的钩子
+        """
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+        if self._context:
+            self._context.remove_hook(hook)
 
     async def start(self) -> None:
         """启动消费"""
@@ -664,6 +1278,7 @@ class RedisMessageQueue:
             metrics.active_tasks_count = len(self._context.active_tasks)
             metrics.registered_topics = list(self._context.handlers.keys())
             metrics.shutting_down = self._context.shutting_down
+            metrics.runtime = self._context.metrics.runtime.snapshot()
 
         return metrics
 
@@ -0,0 +1,65 @@
+"""
+主题级分布式限流定义模块
+令牌桶状态存储在Redis中，由分发脚本在移动消息前原子地检查，所有消费实例共享同一个速率预算
+"""
+
+import math
+import re
+from dataclasses import dataclass
+
+# 速率表达式：数量/[倍数]单位，如 500/s、30/m、1000/h、10/5s
+_RATE_LIMIT_PATTERN = re.compile(
+    r"^\s*(\d+(?:\.\d+)?)\s*/\s*(\d*)\s*(s|sec|second|m|min|minute|h|hour)\s*$",
+    re.IGNORECASE,
+)
+
+# 时间单位对应的秒数
+_UNIT_SECONDS = {
+    "s": 1,
+    "sec": 1,
+    "second": 1,
+    "m": 60,
+    "min": 60,
+    "minute": 60,
+    "h": 3600,
+    "hour": 3600,
+}
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """令牌桶限流参数
+
+    Attributes:
+        rate: 每秒补充的令牌数
+        burst: 令牌桶容量，即一个周期内允许的最大突发数
+    """
+
+    rate: float
+    burst: int
+
+    @classmethod
+    def parse(cls, spec: str) -> "RateLimit":
+        """解析速率表达式
+
+        Args:
+            spec: 速率表达式，如 "500/s"、"30/m"、"1000/h"、"10/5s"
+
+        Raises:
+            ValueError: 表达式格式错误或数量不为正
+        """
+        match = _RATE_LIMIT_PATTERN.match(spec)
+        # 卫语句：格式错误
+        if not match:
+            raise ValueError(
+                f"速率限制格式错误: {spec}，应为 数量/单位，如 500/s、30/m、1000/h"
+            )
+
+        count = float(match.group(1))
+        multiplier = int(match.group(2) or 1)
+        period = multiplier * _UNIT_SECONDS[match.group(3).lower()]
+        # 卫语句：数量和周期必须为正
+        if count <= 0 or period <= 0:
+            raise ValueError(f"速率限制的数量和周期必须大于0: {spec}")
+
+        return cls(rate=count / period, burst=max(1, math.ceil(count)))
@@ -0,0 +1,228 @@
+"""
+周期任务（cron / 固定间隔）定义模块
+周期任务定义存储在Redis中，由延时调度器提前一个周期物化到延时队列
+"""
+
+import calendar
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from .config import MQConfig
+from .message import FANOUT_SEPARATOR, Message, MessagePriority
+
+# cron 字段取值范围：分 时 日 月 周
+_CRON_FIELD_RANGES: list[tuple[int, int]] = [
+    (0, 59),
+    (0, 23),
+    (1, 31),
+    (1, 12),
+    (0, 7),
+]
+
+# 计算下一次触发时间时最多向后搜索的年数（覆盖 2月29日 这类稀疏表达式）
+_CRON_SEARCH_YEARS = 5
+
+
+class CronExpression:
+    """
+    标准5字段cron表达式（分 时 日 月 周），按UTC时间计算
+
+    支持 `*`、`*/n`、`a-b`、`a-b/n`、`a,b,c` 以及它们的组合，
+    周字段中 0 和 7 都表示周日。日与周同时受限时按cron惯例取“或”。
+    """
+
+    def __init__(self, expression: str) -> None:
+        parts = expression.split()
+        # 卫语句：字段数量不正确
+        if len(parts) != 5:
+            raise ValueError(f"cron表达式必须包含5个字段: {expression}")
+
+        self.expression = expression
+        fields = [
+            self._parse_field(part, low, high)
+            for part, (low, high) in zip(parts, _CRON_FIELD_RANGES, strict=True)
+        ]
+        self.minutes, self.hours, self.days, self.months, weekdays = fields
+        # 统一周日表示：7 -> 0
+        self.weekdays = {d % 7 for d in weekdays}
+        self._days_restricted = parts[2] != "*"
+        self._weekdays_restricted = parts[4] != "*"
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> set[int]:
+        """解析单个cron字段为取值集合"""
+        values: set[int] = set()
+        for item in field.split(","):
+            step = 1
+            if "/" in item:
+                item, step_str = item.split("/", 1)
+                step = int(step_str)
+                if step <= 0:
+                    raise ValueError(f"cron步长必须大于0: {field}")
+
+            if item == "*":
+                start, end = low, high
+            elif "-" in item:
+                start_str, end_str = item.split("-", 1)
+                start, end = int(start_str), int(end_str)
+            else:
+                start = int(item)
+                # `5/10` 表示从5开始每10个单位
+                end = high if step > 1 else start
+
+            if start < low or end > high or start > end:
+                raise ValueError(f"cron字段超出范围[{low}-{high}]: {field}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, dt: datetime) -> bool:
+        """判断日期是否命中日/周字段"""
+        day_ok = dt.day in self.days
+        # Python: 周一=0 ... 周日=6；cron: 周日=0 ... 周六=6
+        weekday_ok = (dt.weekday() + 1) % 7 in self.weekdays
+        if self._days_restricted and self._weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, after_ms: int) -> int:
+        """
+        计算严格晚于给定时间的下一次触发时间
+
+        Args:
+            after_ms: 起始时间戳（毫秒）
+
+        Returns:
+            下一次触发时间戳（毫秒）
+        """
+        dt = datetime.fromtimestamp(after_ms / 1000, tz=timezone.utc)
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        deadline = dt.replace(year=dt.year + _CRON_SEARCH_YEARS, month=1, day=1)
+
+        # 逐级跳跃：月 -> 日 -> 时 -> 分，不命中时直接跳到下一个单位的起点
+        while dt < deadline:
+            if dt.month not in self.months:
+                last_day = calendar.monthrange(dt.year, dt.month)[1]
+                dt = dt.replace(day=last_day, hour=0, minute=0) + timedelta(days=1)
+                continue
+            if not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+                continue
+            if dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+                continue
+            return int(dt.timestamp() * 1000)
+
+        raise ValueError(f"cron表达式在{_CRON_SEARCH_YEARS}年内没有触发时间: {self.expression}")
+
+
+class RecurringSchedule(BaseModel):
+    """周期任务定义"""
+
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()), description="周期任务ID")
+    topic: str = Field(description="主题名称")
+    payload: dict[str, Any] = Field(description="每次触发时投递的消息负载")
+    cron: str | None = Field(default=None, description="cron表达式（UTC）")
+    every: float | None = Field(default=None, gt=0, description="固定间隔（秒）")
+    jitter: float = Field(default=0.0, ge=0, description="触发时间随机抖动上限（秒）")
+    priority: MessagePriority | int = Field(
+        default=MessagePriority.NORMAL, description="消息优先级，枚举或0-9的数值"
+    )
+    ttl: int | None = Field(default=None, description="消息生存时间（秒）")
+    anchor: int = Field(
+        default_factory=lambda: int(time.time() * 1000),
+        description="固定间隔模式的起算时间戳 ms",
+    )
+
+    @field_validator("id")
+    @classmethod
+    def validate_id(cls, v: str) -> str:
+        """周期任务ID是物化消息ID的前缀，不能包含广播消息的分组投递分隔符"""
+        if FANOUT_SEPARATOR in v:
+            raise ValueError(f"周期任务ID不能包含 {FANOUT_SEPARATOR}: {v}")
+        return v
+
+    @field_validator("topic")
+    @classmethod
+    def validate_topic(cls, v: str) -> str:
+        """验证主题名称"""
+        if not v or not v.strip():
+            raise ValueError("主题名称不能为空")
+        return v.strip()
+
+    @field_validator("cron")
+    @classmethod
+    def validate_cron(cls, v: str | None) -> str | None:
+        """提前验证cron表达式，避免定义写入Redis后才发现无法解析"""
+        if v is not None:
+            CronExpression(v)
+        return v
+
+    @model_validator(mode="after")
+    def validate_trigger(self) -> "RecurringSchedule":
+        """cron 与 every 必须且只能指定一个"""
+        if (self.cron is None) == (self.every is None):
+            raise ValueError("cron 和 every 必须且只能指定一个")
+        return self
+
+    def next_occurrence(self, after_ms: int) -> int:
+        """
+        计算严格晚于给定时间的下一次（未抖动的）触发时间
+
+        Args:
+            after_ms: 起始时间戳（毫秒）
+
+        Returns:
+            下一次触发时间戳（毫秒）
+        """
+        if self.cron is not None:
+            return CronExpression(self.cron).next_after(after_ms)
+
+        assert self.every is not None
+        interval_ms = max(int(self.every * 1000), 1)
+        if after_ms < self.anchor:
+            return self.anchor
+        periods = (after_ms - self.anchor) // interval_ms + 1
+        return self.anchor + periods * interval_ms
+
+    def occurrence_message_id(self, occurrence_ms: int) -> str:
+        """每次触发使用确定性的消息ID，多实例重复物化时天然幂等"""
+        return f"{self.id}:{occurrence_ms}"
+
+    def fire_time(self, occurrence_ms: int) -> int:
+        """在名义触发时间上叠加随机抖动，打散整点的生产洪峰"""
+        if self.jitter <= 0:
+            return occurrence_ms
+        return occurrence_ms + int(random.uniform(0, self.jitter) * 1000)
+
+    def build_message(self, occurrence_ms: int, fire_ms: int, config: MQConfig) -> Message:
+        """
+        构建某次触发对应的消息
+
+        Args:
+            occurrence_ms: 名义触发时间戳（毫秒）
+            fire_ms: 实际投递时间戳（毫秒）
+            config: 消息队列配置
+
+        Returns:
+            消息对象
+        """
+        message = Message(
+            id=self.occurrence_message_id(occurrence_ms),
+            topic=self.topic,
+            payload=self.payload,
+            priority=self.priority,
+        )
+        ttl = self.ttl or config.message_ttl
+        message.meta.expire_at = fire_ms + ttl * 1000
+        message.meta.scheduled_at = fire_ms
+        message.meta.max_retries = config.max_retries
+        message.meta.retry_delays = config.retry_delays.copy()
+        return message
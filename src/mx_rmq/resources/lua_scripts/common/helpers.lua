@@ -0,0 +1,132 @@
+-- helpers.lua
+-- 公共辅助函数，由 LuaScriptManager 在加载时拼接到每个脚本开头，各脚本不再各自复制
+-- 只定义 local function，不读取 KEYS/ARGV，拼接后不会在加载时执行任何 Redis 命令
+
+-- 唤醒延时调度器：blocking 模式写入唤醒令牌（持久化，不会丢失，只保留一个），pubsub 模式发布通知
+local function wakeup(wakeup_target, wakeup_mode, notify_value)
+    if not wakeup_target or wakeup_target == '' then
+        return
+    end
+    if wakeup_mode == 'blocking' then
+        redis.call('LPUSH', wakeup_target, notify_value)
+        redis.call('LTRIM', wakeup_target, 0, 0)
+    else
+        redis.call('PUBLISH', wakeup_target, notify_value)
+    end
+end
+
+-- 服务端计数器：累计计数写入 metrics 哈希，开启分钟桶时同时写入 {metrics}:{epoch_minute}
+local function incr_counter(metrics_key, counter, topic, bucket_ttl)
+    if not metrics_key or metrics_key == '' or not topic or topic == '' then
+        return
+    end
+    local field = counter..':'..topic
+    redis.call('HINCRBY', metrics_key, field, 1)
+    bucket_ttl = tonumber(bucket_ttl) or 0
+    if bucket_ttl > 0 then
+        local now = redis.call('TIME')
+        local bucket_key = metrics_key..':'..math.floor(tonumber(now[1]) / 60)
+        redis.call('HINCRBY', bucket_key, field, 1)
+        redis.call('EXPIRE', bucket_key, bucket_ttl)
+    end
+end
+
+-- 释放顺序组：消息是该顺序键的在途消息时投递组内下一条消息，仍在组内等待时从组内移除
+local function release_ordering(payload_map, message_id)
+    local ordering_key = redis.call('HGET', payload_map, message_id..':order')
+    local queue_name = redis.call('HGET', payload_map, message_id..':queue')
+    if not ordering_key or not queue_name then
+        return
+    end
+
+    local ordering_hash = queue_name..':ordering'
+    local ordering_group = ordering_hash..':'..ordering_key
+    if redis.call('HGET', ordering_hash, ordering_key) ~= message_id then
+        redis.call('LREM', ordering_group, 1, message_id)
+        return
+    end
+
+    -- 跳过组内已被清理的消息
+    local next_id = redis.call('LPOP', ordering_group)
+    while next_id and redis.call('HEXISTS', payload_map, next_id) == 0 do
+        next_id = redis.call('LPOP', ordering_group)
+    end
+    if not next_id then
+        redis.call('HDEL', ordering_hash, ordering_key)
+        return
+    end
+
+    redis.call('HSET', ordering_hash, ordering_key, next_id)
+    local pending_key = queue_name..':pending'
+    local next_lane = redis.call('HGET', payload_map, next_id..':lane')
+    if next_lane then
+        pending_key = pending_key..':'..next_lane
+    end
+    redis.call('LPUSH', pending_key, next_id)
+    redis.call('LPUSH', queue_name..':signal', 1)
+    redis.call('LTRIM', queue_name..':signal', 0, 0)
+end
+
+-- 释放广播消息的共享消息体：分组投递结束时引用计数减一，最后一个分组结束时删除原始消息体
+local function release_fanout(payload_map, message_id)
+    local separator = string.find(message_id, '@', 1, true)
+    if not separator then
+        return
+    end
+
+    local base_id = string.sub(message_id, 1, separator - 1)
+    -- 只有原始消息仍有引用计数时才是分组投递，避免误把包含@的普通消息ID当作广播消息
+    if redis.call('HEXISTS', payload_map, base_id..':refs') == 0 then
+        return
+    end
+    -- 分组投递字段已被清理（重复确认）时不再减计数
+    if redis.call('HEXISTS', payload_map, message_id..':queue') == 0 then
+        return
+    end
+    if redis.call('HINCRBY', payload_map, base_id..':refs', -1) <= 0 then
+        redis.call('HDEL', payload_map, base_id, base_id..':refs')
+    end
+end
+
+-- 写入延时任务并智能唤醒调度器（生产延时消息与重试共用）
+-- 远期任务写入粗粒度时间桶，新桶第一次出现时通知一次；
+-- 近期任务写入 delay_tasks，成为最早任务或已有任务到期时通知
+local function add_delay_task(delay_tasks, delay_buckets, id, execute_time, current_time,
+                              bucket_horizon, bucket_size, bucket_prefix,
+                              wakeup_target, wakeup_mode)
+    if delay_buckets and delay_buckets ~= '' and bucket_horizon > 0 and bucket_size > 0
+            and execute_time > current_time + bucket_horizon then
+        local bucket_start = execute_time - (execute_time % bucket_size)
+        local bucket_key = bucket_prefix..':'..bucket_start
+        redis.call('ZADD', bucket_key, execute_time, id)
+
+        local is_new_bucket = redis.call('ZADD', delay_buckets, bucket_start, bucket_key)
+        if is_new_bucket == 1 then
+            wakeup(wakeup_target, wakeup_mode, bucket_start - bucket_horizon)
+        end
+        return
+    end
+
+    -- 获取当前最早的任务（在插入新任务之前）
+    -- 索引1: "task_id_123" (任务ID)  索引2: "1672531200000" (执行时间戳)
+    local current_earliest = redis.call('ZRANGE', delay_tasks, 0, 0, 'WITHSCORES')
+
+    redis.call('ZADD', delay_tasks, execute_time, id)
+
+    if not wakeup_target or wakeup_target == '' then
+        return
+    end
+
+    -- 条件1：第一个延时任务，冷启动，必须唤醒
+    -- 条件2：新任务比当前最早任务更早
+    if #current_earliest == 0 or execute_time < tonumber(current_earliest[2]) then
+        wakeup(wakeup_target, wakeup_mode, execute_time)
+        return
+    end
+
+    -- 条件3：已有任务到期（包括新插入的任务），立即处理
+    local expired_tasks = redis.call('ZRANGE', delay_tasks, 0, current_time, 'BYSCORE', 'LIMIT', 0, 1)
+    if #expired_tasks > 0 then
+        wakeup(wakeup_target, wakeup_mode, current_time)
+    end
+end
@@ -0,0 +1,97 @@
+-- dispatch_message.lua
+-- 从主题的优先级通道中取出一条消息移动到processing队列（非阻塞），可选令牌桶限流
+-- KEYS[1]: {topic}:processing
+-- KEYS[2]: {topic}:signal (分发唤醒信号)
+-- KEYS[3]: {topic}:ratelimit (令牌桶状态)
+-- KEYS[4...]: 优先级通道，按优先级从高到低排列
+-- ARGV[1]: mode (strict: 严格按优先级; weighted: 按权重在非空通道中抽取)
+-- ARGV[2]: random (0-1 之间的随机数，weighted 模式使用，由调用方生成以保持脚本确定性)
+-- ARGV[3]: rate (每秒补充的令牌数，0表示不限流)
+-- ARGV[4]: burst (令牌桶容量)
+-- ARGV[5...]: 各优先级通道的权重，与 KEYS[4...] 一一对应
+-- 返回值：消息ID；所有通道都为空时返回 false；超出速率限制时返回需要等待的毫秒数（整数）
+
+local processing_queue = KEYS[1]
+local signal_key = KEYS[2]
+local rate_limit_key = KEYS[3]
+
+local mode = ARGV[1]
+local random = tonumber(ARGV[2])
+local rate = tonumber(ARGV[3]) or 0
+local burst = tonumber(ARGV[4]) or 0
+
+local LANE_OFFSET = 3
+local WEIGHT_OFFSET = 4
+
+local lane_count = #KEYS - LANE_OFFSET
+local lengths = {}
+local total_weight = 0
+local non_empty = 0
+
+for i = 1, lane_count do
+    local length = redis.call('LLEN', KEYS[i + LANE_OFFSET])
+    lengths[i] = length
+    if length > 0 then
+        non_empty = non_empty + 1
+        total_weight = total_weight + tonumber(ARGV[i + WEIGHT_OFFSET])
+    end
+end
+
+-- 卫语句：所有通道都为空
+if non_empty == 0 then
+    return false
+end
+
+-- 令牌桶限流：按距上次取令牌的时间补充令牌，不足一个时消息留在通道中
+if rate > 0 then
+    local redis_time = redis.call('TIME')
+    local now = tonumber(redis_time[1]) * 1000 + math.floor(tonumber(redis_time[2]) / 1000)
+    local state = redis.call('HMGET', rate_limit_key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local last = tonumber(state[2]) or now
+
+    tokens = math.min(burst, tokens + math.max(0, now - last) * rate / 1000)
+    if tokens < 1 then
+        return math.max(1, math.ceil((1 - tokens) * 1000 / rate))
+    end
+
+    redis.call('HSET', rate_limit_key, 'tokens', tokens - 1, 'ts', now)
+    -- 令牌桶补满后状态与不存在等价，过期自动清理
+    redis.call('PEXPIRE', rate_limit_key, math.ceil(burst * 1000 / rate) + 1000)
+end
+
+local selected = nil
+if mode == 'weighted' and total_weight > 0 then
+    -- 按权重抽取：高优先级大概率先出队，低优先级仍有机会，不会饿死
+    local target = random * total_weight
+    for i = 1, lane_count do
+        if lengths[i] > 0 then
+            target = target - tonumber(ARGV[i + WEIGHT_OFFSET])
+            if target < 0 then
+                selected = i
+                break
+            end
+        end
+    end
+end
+
+-- 严格模式（或浮点误差未选中）：取优先级最高的非空通道
+if not selected then
+    for i = 1, lane_count do
+        if lengths[i] > 0 then
+            selected = i
+            break
+        end
+    end
+end
+
+-- 通道内先进先出：左进右出
+local message_id = redis.call('LMOVE', KEYS[selected + LANE_OFFSET], processing_queue, 'RIGHT', 'LEFT')
+
+-- 仍有积压时补发唤醒信号，让其他阻塞等待的分发协程也参与分发
+if non_empty > 1 or lengths[selected] > 1 then
+    redis.call('LPUSH', signal_key, 1)
+    redis.call('LTRIM', signal_key, 0, 0)
+end
+
+return message_id
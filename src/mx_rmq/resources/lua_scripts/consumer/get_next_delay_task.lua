@@ -2,12 +2,16 @@
 -- 获取下一个延时任务的状态和等待时间
 -- 使用Redis服务器时间避免客户端时钟不一致问题
 -- KEYS[1]: delay_tasks (延时任务ZSet)
+-- KEYS[2]: delay_buckets (远期时间桶索引，可选)
+-- ARGV[1]: bucket_horizon_ms (近期窗口毫秒数，可选)
 -- 返回值：
 --   NO_TASK: 没有延时任务
---   EXPIRED: 有任务且已过期，需要立即处理
+--   EXPIRED: 有任务且已过期（或有时间桶需要提升），需要立即处理
 --   WAITING: 有任务但未到期，返回等待毫秒数
 
 local delay_tasks = KEYS[1]
+local delay_buckets = KEYS[2]
+local bucket_horizon = tonumber(ARGV[1]) or 0
 
 -- 获取Redis服务器当前时间（毫秒）
 local redis_time = redis.call('TIME')
@@ -17,15 +21,32 @@ local redis_current_time = tonumber(redis_time[1]) * 1000 + math.floor(tonumber(
 -- 返回值为 元素和 score
 local earliest_task = redis.call('ZRANGE', delay_tasks, 0, 0, 'WITHSCORES')
 
+local task_id = nil
+local earliest_time = nil
+
+if #earliest_task > 0 then
+    -- lua 通过 1 开始
+    task_id = earliest_task[1]
+    earliest_time = tonumber(earliest_task[2])
+end
+
+-- 远期时间桶的提升时间 = 桶起始时间 - 近期窗口
+if delay_buckets then
+    local earliest_bucket = redis.call('ZRANGE', delay_buckets, 0, 0, 'WITHSCORES')
+    if #earliest_bucket > 0 then
+        local promote_time = tonumber(earliest_bucket[2]) - bucket_horizon
+        if earliest_time == nil or promote_time < earliest_time then
+            task_id = earliest_bucket[1]
+            earliest_time = promote_time
+        end
+    end
+end
+
 -- 没有延时任务
-if #earliest_task == 0 then
+if earliest_time == nil then
     return {'NO_TASK'}
 end
 
--- lua 通过 1 开始
-local task_id = earliest_task[1]
-local earliest_time = tonumber(earliest_task[2])
-
 -- 计算等待时间（毫秒）- 保持原生精度
 local wait_milliseconds = earliest_time - redis_current_time
 
@@ -35,4 +56,4 @@ if wait_milliseconds <= 0 then
 else
     -- 任务未到期，返回等待毫秒数
     return {'WAITING', wait_milliseconds, earliest_time, task_id}
-end 
\ No newline at end of file
+end
@@ -0,0 +1,74 @@
+-- materialize_schedule.lua
+-- 周期任务物化：上一次触发到期后，将下一次触发写入延时队列
+-- 通过比较并交换（CAS）物化指针，保证多实例下每次触发只物化一次
+-- KEYS[1]: schedules (周期任务定义Hash)
+-- KEYS[2]: schedules:next (周期任务已物化触发时间ZSet)
+-- KEYS[3]: payload_map
+-- KEYS[4]: delay_tasks
+-- KEYS[5]: wakeup_target (唤醒目标：pubsub通道或唤醒令牌列表，可选)
+-- KEYS[6]: metrics (可选，维护各主题生产数)
+-- ARGV[1]: schedule_id
+-- ARGV[2]: expected_occurrence (调用方读取到的已物化触发时间 ms)
+-- ARGV[3]: next_occurrence (下一次触发的名义时间 ms)
+-- ARGV[4]: fire_time (叠加抖动后的实际投递时间 ms)
+-- ARGV[5]: message_id
+-- ARGV[6]: payload (JSON string)
+-- ARGV[7]: topic
+-- ARGV[8]: wakeup_mode (唤醒方式：pubsub 或 blocking，缺省为 pubsub)
+-- ARGV[9]: lane (非默认优先级的数值等级，默认优先级传空串)
+-- ARGV[10]: counter_topic (计数用主题名称，不带全局前缀)
+-- ARGV[11]: bucket_ttl (计数器分钟桶过期秒数，0表示不分桶)
+-- 返回值：1 物化成功；0 已被其他实例物化或定义已删除
+-- 公共函数 wakeup, incr_counter 定义在 common/helpers.lua，加载时拼接到脚本开头
+
+local schedules = KEYS[1]
+local schedules_next = KEYS[2]
+local payload_map = KEYS[3]
+local delay_tasks = KEYS[4]
+local wakeup_target = KEYS[5]
+local metrics_key = KEYS[6]
+
+local schedule_id = ARGV[1]
+local expected_occurrence = tonumber(ARGV[2])
+local next_occurrence = tonumber(ARGV[3])
+local fire_time = tonumber(ARGV[4])
+local message_id = ARGV[5]
+local payload = ARGV[6]
+local topic = ARGV[7]
+local wakeup_mode = ARGV[8]
+local lane = ARGV[9]
+local counter_topic = ARGV[10]
+local bucket_ttl = ARGV[11]
+
+-- CAS：指针已被其他实例推进，放弃本次物化
+local current_score = redis.call('ZSCORE', schedules_next, schedule_id)
+if not current_score or tonumber(current_score) ~= expected_occurrence then
+    return 0
+end
+
+-- 定义已被删除，清理残留指针
+if redis.call('HEXISTS', schedules, schedule_id) == 0 then
+    redis.call('ZREM', schedules_next, schedule_id)
+    return 0
+end
+
+local current_earliest = redis.call('ZRANGE', delay_tasks, 0, 0, 'WITHSCORES')
+
+redis.call('HSET', payload_map, message_id, payload, message_id..':queue', topic)
+if lane and lane ~= '' then
+    redis.call('HSET', payload_map, message_id..':lane', lane)
+end
+redis.call('ZADD', delay_tasks, fire_time, message_id)
+incr_counter(metrics_key, 'produced', counter_topic, bucket_ttl)
+
+-- 推进物化指针
+redis.call('ZADD', schedules_next, next_occurrence, schedule_id)
+redis.call('HSET', schedules, schedule_id..':current', message_id)
+
+if wakeup_target and wakeup_target ~= '' then
+    if #current_earliest == 0 or fire_time < tonumber(current_earliest[2]) then
+        wakeup(wakeup_target, wakeup_mode, fire_time)
+    end
+end
+
+return 1
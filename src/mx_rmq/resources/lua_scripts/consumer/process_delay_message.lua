@@ -1,44 +1,152 @@
 -- process_delay_messages.lua
--- 处理到期的延时消息，将其移动到对应的pending队列
+-- 处理到期的延时消息，将其批量移动到对应的优先级通道（pending队列）
+-- 带顺序键的消息：同键已有在途消息时排入顺序组，等待前一条消息结束后再投递
 -- KEYS[1]: delay_tasks
--- KEYS[2]: payload_map  
+-- KEYS[2]: payload_map
 -- ARGV[1]: batch_size
+-- 返回值：{moved_count, dropped_count, has_more, queue_name, count, sum_ms, min_ms, max_ms, ...}
+--   moved_count: 移动到pending队列（或排入顺序组）的消息数
+--   dropped_count: 找不到目标队列（消息已被清理）而直接移除的任务数
+--   has_more: 1 表示本批次已满，可能还有到期任务
+--   其后每五个元素为一个目标队列的调度滞后汇总（实际提升时间 - 计划投递时间，毫秒）：
+--   队列名、消息数、滞后总和、最小值、最大值，每个目标队列只返回一组
 
 local delay_tasks = KEYS[1]
 local payload_map = KEYS[2]
 
-local batch_size = ARGV[1]
+local batch_size = tonumber(ARGV[1])
+
+-- 变参命令单次参数上限，避免 unpack 超出 Lua 栈
+local chunk_size = 1000
 
 -- 获取Redis服务器当前时间（毫秒）- 与get_next_delay_task.lua保持一致
 local redis_time = redis.call('TIME')
 local current_time = tonumber(redis_time[1]) * 1000 + math.floor(tonumber(redis_time[2]) / 1000)
 
--- 获取到期的延时任务
-local ready_tasks = redis.call('ZRANGE', delay_tasks, 0, current_time, 'BYSCORE', 'LIMIT', 0, batch_size)
-
-local results = {}
-
-for i = 1, #ready_tasks do
-    local task_id = ready_tasks[i]
-    
-    -- 获取队列名称
-    local queue_name = redis.call('HGET', payload_map, task_id..':queue')
-    
-    if queue_name then
-        -- 移动到对应的pending队列
-        -- 生产时 传入全局前缀了
-        local pending_key = queue_name..':pending'
-        redis.call('LPUSH', pending_key, task_id)
-        
-        -- 从延时队列中移除
-        redis.call('ZREM', delay_tasks, task_id)
-        
-        -- 记录处理结果
-        results[#results + 1] = {task_id, queue_name}
-    else
-        -- 如果找不到队列名，说明消息已被清理，直接移除
-        redis.call('ZREM', delay_tasks, task_id)
+-- 获取到期的延时任务及其计划投递时间
+local ready_entries = redis.call('ZRANGE', delay_tasks, '-inf', current_time, 'BYSCORE', 'LIMIT', 0, batch_size, 'WITHSCORES')
+if #ready_entries == 0 then
+    return {0, 0, 0}
+end
+
+local ready_tasks = {}
+local lateness = {}
+for i = 1, #ready_entries, 2 do
+    ready_tasks[#ready_tasks + 1] = ready_entries[i]
+    lateness[#lateness + 1] = current_time - tonumber(ready_entries[i + 1])
+end
+
+-- 按目标优先级通道分组，组内保持到期顺序
+local groups = {}
+local group_order = {}
+local signal_keys = {}
+local moved = 0
+-- 按目标队列聚合调度滞后，返回值长度与目标队列数相关而与批量大小无关
+local lateness_stats = {}
+local lateness_order = {}
+
+-- 每个任务读取 :queue、:lane 和 :order 三个字段，HMGET 分段按任务数缩小
+local task_fields = 3
+local task_chunk_size = math.floor(chunk_size / task_fields)
+
+for offset = 1, #ready_tasks, task_chunk_size do
+    local last = math.min(offset + task_chunk_size - 1, #ready_tasks)
+    local fields = {}
+    for i = offset, last do
+        fields[#fields + 1] = ready_tasks[i]..':queue'
+        fields[#fields + 1] = ready_tasks[i]..':lane'
+        fields[#fields + 1] = ready_tasks[i]..':order'
+    end
+
+    -- 一次 HMGET 取回整段任务的目标队列和优先级通道
+    local values = redis.call('HMGET', payload_map, unpack(fields))
+    for i = 1, #values, task_fields do
+        local queue_name = values[i]
+        local task_index = offset + (i - 1) / task_fields
+        local task_id = ready_tasks[task_index]
+        local ordering_key = values[i + 2]
+        local deliver = true
+
+        -- 顺序键：同键在途消息仍存在时排入顺序组队尾，否则成为该键的在途消息
+        if queue_name and ordering_key then
+            local ordering_hash = queue_name..':ordering'
+            local active = redis.call('HGET', ordering_hash, ordering_key)
+            if active and active ~= task_id and redis.call('HEXISTS', payload_map, active) == 1 then
+                redis.call('RPUSH', ordering_hash..':'..ordering_key, task_id)
+                moved = moved + 1
+                deliver = false
+            else
+                redis.call('HSET', ordering_hash, ordering_key, task_id)
+            end
+        end
+
+        if queue_name then
+            local value = lateness[task_index]
+            local stats = lateness_stats[queue_name]
+            if not stats then
+                lateness_stats[queue_name] = {1, value, value, value}
+                lateness_order[#lateness_order + 1] = queue_name
+            else
+                stats[1] = stats[1] + 1
+                stats[2] = stats[2] + value
+                stats[3] = math.min(stats[3], value)
+                stats[4] = math.max(stats[4], value)
+            end
+        end
+
+        -- 找不到队列名，说明消息已被清理，只需从延时队列移除
+        if queue_name and deliver then
+            -- 生产时 传入全局前缀了；默认优先级沿用 pending，其余为 pending:{等级}
+            local pending_key = queue_name..':pending'
+            if values[i + 1] then
+                pending_key = pending_key..':'..values[i + 1]
+            end
+
+            local group = groups[pending_key]
+            if not group then
+                group = {}
+                groups[pending_key] = group
+                group_order[#group_order + 1] = pending_key
+                signal_keys[queue_name..':signal'] = true
+            end
+            group[#group + 1] = task_id
+            moved = moved + 1
+        end
+    end
+end
+
+-- 每个优先级通道使用变参 LPUSH，顺序与逐条 LPUSH 一致
+for _, pending_key in ipairs(group_order) do
+    local group = groups[pending_key]
+    for offset = 1, #group, chunk_size do
+        redis.call('LPUSH', pending_key, unpack(group, offset, math.min(offset + chunk_size - 1, #group)))
     end
 end
 
-return results
\ No newline at end of file
+-- 唤醒各主题阻塞等待的分发协程（每个主题只保留一个信号）
+for signal_key, _ in pairs(signal_keys) do
+    redis.call('LPUSH', signal_key, 1)
+    redis.call('LTRIM', signal_key, 0, 0)
+end
+
+-- 从延时队列移除：批次未满说明已取完全部到期任务，可按分数区间一次性删除
+local has_more = 0
+if #ready_tasks < batch_size then
+    redis.call('ZREMRANGEBYSCORE', delay_tasks, '-inf', current_time)
+else
+    has_more = 1
+    for offset = 1, #ready_tasks, chunk_size do
+        redis.call('ZREM', delay_tasks, unpack(ready_tasks, offset, math.min(offset + chunk_size - 1, #ready_tasks)))
+    end
+end
+
+local result = {moved, #ready_tasks - moved, has_more}
+for _, queue_name in ipairs(lateness_order) do
+    local stats = lateness_stats[queue_name]
+    result[#result + 1] = queue_name
+    result[#result + 1] = stats[1]
+    result[#result + 1] = stats[2]
+    result[#result + 1] = stats[3]
+    result[#result + 1] = stats[4]
+end
+return result
@@ -0,0 +1,53 @@
+-- promote_delay_buckets.lua
+-- 将进入近期窗口的远期时间桶批量提升到 delay_tasks
+-- KEYS[1]: delay_buckets (远期时间桶索引，score为桶起始时间)
+-- KEYS[2]: delay_tasks
+-- ARGV[1]: bucket_horizon_ms (近期窗口毫秒数)
+-- ARGV[2]: batch_size (单次脚本最多提升的消息数，限制单次阻塞Redis的时间)
+-- 注意：时间桶键名由脚本动态生成、未在 KEYS 中声明，分桶仅支持单节点Redis，不支持Redis Cluster
+-- 返回值：{promoted_count, has_more}，has_more 为 1 表示仍有到期桶未提升完
+
+local delay_buckets = KEYS[1]
+local delay_tasks = KEYS[2]
+
+local bucket_horizon = tonumber(ARGV[1])
+local batch_size = tonumber(ARGV[2])
+
+local redis_time = redis.call('TIME')
+local current_time = tonumber(redis_time[1]) * 1000 + math.floor(tonumber(redis_time[2]) / 1000)
+local promote_before = current_time + bucket_horizon
+
+local promoted = 0
+
+while promoted < batch_size do
+    local due_bucket = redis.call('ZRANGE', delay_buckets, '-inf', promote_before, 'BYSCORE', 'LIMIT', 0, 1)
+    if #due_bucket == 0 then
+        return {promoted, 0}
+    end
+
+    local bucket_key = due_bucket[1]
+    -- ZPOPMIN 一次取出 member/score 对，省去 ZRANGE + ZREM 两次遍历
+    local items = redis.call('ZPOPMIN', bucket_key, batch_size - promoted)
+
+    if #items > 0 then
+        local zadd_args = {}
+        for i = 1, #items, 2 do
+            zadd_args[#zadd_args + 1] = items[i + 1]
+            zadd_args[#zadd_args + 1] = items[i]
+        end
+        redis.call('ZADD', delay_tasks, unpack(zadd_args))
+        promoted = promoted + #items / 2
+    end
+
+    -- 桶已清空，从索引中移除
+    if redis.call('EXISTS', bucket_key) == 0 then
+        redis.call('ZREM', delay_buckets, bucket_key)
+    end
+end
+
+-- 批次已用完，检查是否还有到期桶
+local remaining = redis.call('ZRANGE', delay_buckets, '-inf', promote_before, 'BYSCORE', 'LIMIT', 0, 1)
+if #remaining > 0 then
+    return {promoted, 1}
+end
+return {promoted, 0}
@@ -3,22 +3,82 @@
 -- KEYS[1]: payload_map
 -- KEYS[2]: {topic}:processing
 -- KEYS[3]: all_expire_monitor
+-- KEYS[4]: reply_queue (可选，RPC调用方的回复队列，无回复时传空串)
+-- KEYS[5]: metrics (可选，维护各主题完成数与生产数，不统计时传空串)
 -- ARGV[1]: message_id
+-- ARGV[2]: reply (可选，RPC回复内容 JSON string，无回复时传空串)
+-- ARGV[3]: reply_ttl (可选，回复队列过期秒数)
+-- ARGV[4]: topic (计数用主题名称，不带全局前缀)
+-- ARGV[5]: bucket_ttl (计数器分钟桶过期秒数，0表示不分桶)
+-- ARGV[6...]: 后续消息（可选），每条6个参数：message_id, payload, queue_name(带全局前缀), expire_time, lane, topic
+-- 返回值：从processing队列移除的数量，0表示重复确认或迟到确认（不做任何清理、回复和后续消息入队）
+-- 公共函数 incr_counter, release_ordering, release_fanout 定义在 common/helpers.lua，加载时拼接到脚本开头
 
 local payload_map = KEYS[1]
 local processing_queue = KEYS[2]
 local expire_monitor = KEYS[3]
+local reply_queue = KEYS[4]
+local metrics_key = KEYS[5]
 
 local message_id = ARGV[1]
+local reply = ARGV[2]
+local reply_ttl = tonumber(ARGV[3])
+local topic = ARGV[4]
+local bucket_ttl = ARGV[5]
+
+local FOLLOW_UP_OFFSET = 5
+local FOLLOW_UP_FIELDS = 6
 
--- 原子性清理所有相关数据
 -- 从processing队列中移除
-redis.call('LREM', processing_queue, 1, message_id)
+local removed = redis.call('LREM', processing_queue, 1, message_id)
+
+-- 卫语句：消息已不在processing队列中（重复确认或超时回收后的迟到确认）
+-- 此时消息已由重试、死信或重新投递接管，不释放顺序键和共享消息体、不删除消息数据，
+-- 也不计数、不回复、不入队后续消息，否则同键的下一条消息会与重试中的消息并发处理
+if removed == 0 then
+    return 0
+end
 
+-- 原子性清理所有相关数据
 -- 从过期监控中移除
 redis.call('ZREM', expire_monitor, message_id)
 
--- 从payload存储中删除消息数据和队列信息
-redis.call('HDEL', payload_map, message_id, message_id..':queue')
+-- 顺序键：投递同键的下一条消息
+release_ordering(payload_map, message_id)
+
+-- 广播消息：释放共享消息体的引用
+release_fanout(payload_map, message_id)
+
+-- 从payload存储中删除消息数据、队列信息和优先级通道
+redis.call('HDEL', payload_map, message_id, message_id..':queue', message_id..':lane', message_id..':order')
+
+incr_counter(metrics_key, 'completed', topic, bucket_ttl)
+
+-- RPC回复与完成确认原子写入，调用方不会收到未确认消息的回复
+if reply_queue and reply_queue ~= '' and reply and reply ~= '' then
+    redis.call('LPUSH', reply_queue, reply)
+    if reply_ttl then
+        redis.call('EXPIRE', reply_queue, reply_ttl)
+    end
+end
+
+-- 工作流链：后续消息与完成确认原子写入，不会出现已确认但后续消息丢失的情况
+for i = FOLLOW_UP_OFFSET + 1, #ARGV, FOLLOW_UP_FIELDS do
+    local next_id = ARGV[i]
+    local queue_name = ARGV[i + 2]
+    local lane = ARGV[i + 4]
+    local pending_key = queue_name..':pending'
+
+    redis.call('HSET', payload_map, next_id, ARGV[i + 1], next_id..':queue', queue_name)
+    if lane ~= '' then
+        redis.call('HSET', payload_map, next_id..':lane', lane)
+        pending_key = pending_key..':'..lane
+    end
+    redis.call('ZADD', expire_monitor, ARGV[i + 3], next_id)
+    redis.call('LPUSH', pending_key, next_id)
+    redis.call('LPUSH', queue_name..':signal', 1)
+    redis.call('LTRIM', queue_name..':signal', 0, 0)
+    incr_counter(metrics_key, 'produced', ARGV[i + 5], bucket_ttl)
+end
 
-return 'OK' 
\ No newline at end of file
+return removed
@@ -4,33 +4,53 @@
 -- KEYS[2]: delay_tasks
 -- KEYS[3]: all_expire_monitor
 -- KEYS[4]: {topic}:processing (可选，用于清理processing队列)
+-- KEYS[5]: delay_buckets (远期时间桶索引，可选)
+-- KEYS[6]: metrics (可选，维护各主题重试数)
+-- KEYS[7]: wakeup_target (唤醒目标：pubsub通道或唤醒令牌列表，可选)
 -- ARGV[1]: message_id
 -- ARGV[2]: updated_payload (JSON string)
--- ARGV[3]: retry_delay (seconds)
+-- ARGV[3]: retry_delay_ms (重试延迟毫秒数)
 -- ARGV[4]: topic (可选，用于构建processing队列key)
+-- ARGV[5]: bucket_horizon_ms (近期窗口毫秒数，0或缺省表示不分桶)
+-- ARGV[6]: bucket_size_ms (时间桶跨度毫秒数)
+-- ARGV[7]: bucket_prefix (时间桶键前缀)
+-- 注意：时间桶键名由脚本动态生成、未在 KEYS 中声明，分桶仅支持单节点Redis，不支持Redis Cluster
+-- ARGV[8]: bucket_ttl (计数器分钟桶过期秒数，0表示不分桶)
+-- ARGV[9]: wakeup_mode (唤醒方式：pubsub 或 blocking，缺省为 pubsub)
+-- 公共函数 add_delay_task, incr_counter 定义在 common/helpers.lua，加载时拼接到脚本开头
 
 local payload_map = KEYS[1]
 local delay_tasks = KEYS[2]
 local expire_monitor = KEYS[3]
 local processing_queue = KEYS[4]  -- 新增：processing队列
+local delay_buckets = KEYS[5]
+local metrics_key = KEYS[6]
+local wakeup_target = KEYS[7]
 
 local message_id = ARGV[1]
 local updated_payload = ARGV[2]
-local retry_delay = ARGV[3]
+local retry_delay_ms = tonumber(ARGV[3])
 local topic = ARGV[4]  -- 新增：topic参数
+local bucket_horizon = tonumber(ARGV[5]) or 0
+local bucket_size = tonumber(ARGV[6]) or 0
+local bucket_prefix = ARGV[7]
+local bucket_ttl = ARGV[8]
+local wakeup_mode = ARGV[9]
 
 -- 获取Redis服务端当前时间（毫秒时间戳）- 与其他脚本保持一致
 local time_result = redis.call('TIME')
 local current_time = tonumber(time_result[1]) * 1000 + math.floor(tonumber(time_result[2]) / 1000)
 
--- 计算执行时间（retry_delay是秒数，需要转换为毫秒）
-local execute_time = current_time + tonumber(retry_delay) * 1000
+-- 计算执行时间（毫秒精度，支持亚秒级退避）
+local execute_time = current_time + retry_delay_ms
 
 -- 更新消息内容
 redis.call('HSET', payload_map, message_id, updated_payload)
 
--- 添加到延时队列进行重试
-redis.call('ZADD', delay_tasks, execute_time, message_id)
+-- 添加到延时队列进行重试，超出近期窗口的重试写入远期时间桶
+-- 重试成为最早的延时任务时唤醒调度器，亚秒级退避不必等待兜底轮询
+add_delay_task(delay_tasks, delay_buckets, message_id, execute_time, current_time,
+               bucket_horizon, bucket_size, bucket_prefix, wakeup_target, wakeup_mode)
 redis.call('ZREM', expire_monitor, message_id)
 
 -- 重要：从processing队列中移除消息ID
@@ -39,4 +59,6 @@ if processing_queue and processing_queue ~= '' then
     redis.call('LREM', processing_queue, 1, message_id)
 end
 
+incr_counter(metrics_key, 'retried', topic, bucket_ttl)
+
 return 'OK'
\ No newline at end of file
@@ -5,6 +5,7 @@
 -- KEYS[3]: {topic}:processing         (处理中队列)
 -- KEYS[4]: expire:monitor             (过期监控)
 -- KEYS[5]: payload:map                (原始消息存储)
+-- KEYS[6]: metrics                    (可选，维护各主题死信计数)
 -- ARGV[1]: message_id                 (消息ID)
 -- ARGV[2]: original_payload           (原始损坏的JSON)
 -- ARGV[3]: topic                      (消息主题)
@@ -13,6 +14,8 @@
 -- ARGV[6]: expire_days                (过期天数，可选)
 -- ARGV[7]: max_count                  (最大记录数，可选)
 -- ARGV[8]: supports_hexpire           (是否支持HEXPIRE命令，"1"或"0"，可选)
+-- ARGV[9]: bucket_ttl                 (计数器分钟桶过期秒数，0表示不分桶)
+-- 公共函数 incr_counter, release_ordering, release_fanout 定义在 common/helpers.lua，加载时拼接到脚本开头
 
 -- 常量定义
 local MAX_ERROR_MESSAGE_LENGTH = 20
@@ -49,6 +52,7 @@ local error_queue = KEYS[2]
 local processing_key = KEYS[3]
 local expire_monitor = KEYS[4]
 local payload_map = KEYS[5]
+local metrics_key = KEYS[6]
 
 local message_id = ARGV[1]
 local original_payload = ARGV[2]
@@ -58,6 +62,7 @@ local timestamp = ARGV[5]
 local expire_days = ARGV[6]
 local max_count = ARGV[7]
 local supports_hexpire = ARGV[8] == "1"
+local bucket_ttl = ARGV[9]
 
 -- 限制错误信息长度（使用#操作符优化性能）
 if #error_message > MAX_ERROR_MESSAGE_LENGTH then
@@ -139,8 +144,13 @@ if max_count and max_count ~= "" then
 end
 
 -- 4. 清理相关数据
+release_ordering(payload_map, message_id)
 redis.call('LREM', processing_key, 1, message_id)
 redis.call('ZREM', expire_monitor, message_id)
-redis.call('HDEL', payload_map, message_id, message_id..':queue')
+release_fanout(payload_map, message_id)
+redis.call('HDEL', payload_map, message_id, message_id..':queue', message_id..':lane', message_id..':order')
+
+-- 无法解析的消息不会再被处理，计入死信
+incr_counter(metrics_key, 'dead_lettered', topic, bucket_ttl)
 
 return 'OK'
\ No newline at end of file
@@ -24,6 +24,15 @@ for i = 1, #expired_ids do
     local payload = redis.call('HGET', payload_map, msg_id)
     --  包含全局前缀了
     local queue_name = redis.call('HGET', payload_map, msg_id..':queue')
+
+    -- 广播消息的分组投递（重试前）没有独立消息体，读取共享的原始消息体
+    local separator = string.find(msg_id, '@', 1, true)
+    if not payload and separator then
+        local base_id = string.sub(msg_id, 1, separator - 1)
+        if redis.call('HEXISTS', payload_map, base_id..':refs') == 1 then
+            payload = redis.call('HGET', payload_map, base_id)
+        end
+    end
     
     if payload and queue_name then
         local processing_key = queue_name..':processing'
@@ -5,19 +5,24 @@
 -- KEYS[3]: all_expire_monitor
 -- KEYS[4]: payload_map
 -- KEYS[5]: {topic}:processing (可选，用于清理processing队列)
+-- KEYS[6]: metrics (可选，维护各主题累计死信数 dead_lettered:{topic})
 -- ARGV[1]: message_id
 -- ARGV[2]: updated_payload (JSON string)
 -- ARGV[3]: topic (可选，用于构建processing队列key)
+-- ARGV[4]: bucket_ttl (计数器分钟桶过期秒数，0表示不分桶)
+-- 公共函数 incr_counter, release_ordering, release_fanout 定义在 common/helpers.lua，加载时拼接到脚本开头
 
 local dlq_payload_map = KEYS[1]
 local dlq = KEYS[2]
 local expire_monitor = KEYS[3]
 local payload_map = KEYS[4]
 local processing_queue = KEYS[5]  -- 新增：processing队列
+local metrics_key = KEYS[6]
 
 local msg_id = ARGV[1]
 local updated_payload = ARGV[2]
 local topic = ARGV[3]  -- 新增：topic参数
+local bucket_ttl = ARGV[4]
 
 -- 将消息移入死信队列存储
 redis.call('HSET', dlq_payload_map, msg_id, updated_payload)
@@ -31,6 +36,9 @@ end
 -- 添加到死信队列列表
 redis.call('LPUSH', dlq, msg_id)
 
+-- 按主题维护死信数，监控无需遍历死信队列
+incr_counter(metrics_key, 'dead_lettered', topic, bucket_ttl)
+
 -- 从过期监控中移除（死信队列消息不再监控过期）
 redis.call('ZREM', expire_monitor, msg_id)
 
@@ -40,7 +48,13 @@ if processing_queue and processing_queue ~= '' then
     redis.call('LREM', processing_queue, 1, msg_id)
 end
 
+-- 顺序键：投递同键的下一条消息，避免顺序组被死信消息阻塞
+release_ordering(payload_map, msg_id)
+
+-- 广播消息：释放共享消息体的引用
+release_fanout(payload_map, msg_id)
+
 -- 从原始payload存储中删除
-redis.call('HDEL', payload_map, msg_id, msg_id..':queue')
+redis.call('HDEL', payload_map, msg_id, msg_id..':queue', msg_id..':lane', msg_id..':order')
 
 return 'OK'
\ No newline at end of file
@@ -0,0 +1,31 @@
+-- remove_schedule.lua
+-- 删除周期任务定义，并撤销尚未触发的已物化消息
+-- KEYS[1]: schedules (周期任务定义Hash)
+-- KEYS[2]: schedules:next (周期任务已物化触发时间ZSet)
+-- KEYS[3]: payload_map
+-- KEYS[4]: delay_tasks
+-- ARGV[1]: schedule_id
+-- 返回值：1 删除成功；0 周期任务不存在
+
+local schedules = KEYS[1]
+local schedules_next = KEYS[2]
+local payload_map = KEYS[3]
+local delay_tasks = KEYS[4]
+
+local schedule_id = ARGV[1]
+
+if redis.call('HEXISTS', schedules, schedule_id) == 0 then
+    return 0
+end
+
+-- 只撤销仍在延时队列中的物化消息，已投递到pending的消息正常消费
+local current = redis.call('HGET', schedules, schedule_id..':current')
+if current and redis.call('ZSCORE', delay_tasks, current) then
+    redis.call('ZREM', delay_tasks, current)
+    redis.call('HDEL', payload_map, current, current..':queue', current..':lane')
+end
+
+redis.call('HDEL', schedules, schedule_id, schedule_id..':current')
+redis.call('ZREM', schedules_next, schedule_id)
+
+return 1
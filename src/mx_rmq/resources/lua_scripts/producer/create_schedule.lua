@@ -0,0 +1,61 @@
+-- create_schedule.lua
+-- 原子性创建（或覆盖）周期任务定义，并物化第一次触发到延时队列
+-- KEYS[1]: schedules (周期任务定义Hash)
+-- KEYS[2]: schedules:next (周期任务已物化触发时间ZSet)
+-- KEYS[3]: payload_map
+-- KEYS[4]: delay_tasks
+-- KEYS[5]: wakeup_target (唤醒目标：pubsub通道或唤醒令牌列表，可选)
+-- ARGV[1]: schedule_id
+-- ARGV[2]: definition (JSON string)
+-- ARGV[3]: occurrence_time (本次触发的名义时间 ms)
+-- ARGV[4]: fire_time (叠加抖动后的实际投递时间 ms)
+-- ARGV[5]: message_id
+-- ARGV[6]: payload (JSON string)
+-- ARGV[7]: topic
+-- ARGV[8]: wakeup_mode (唤醒方式：pubsub 或 blocking，缺省为 pubsub)
+-- ARGV[9]: lane (非默认优先级的数值等级，默认优先级传空串)
+-- 公共函数 wakeup 定义在 common/helpers.lua，加载时拼接到脚本开头
+
+local schedules = KEYS[1]
+local schedules_next = KEYS[2]
+local payload_map = KEYS[3]
+local delay_tasks = KEYS[4]
+local wakeup_target = KEYS[5]
+
+local schedule_id = ARGV[1]
+local definition = ARGV[2]
+local occurrence_time = tonumber(ARGV[3])
+local fire_time = tonumber(ARGV[4])
+local message_id = ARGV[5]
+local payload = ARGV[6]
+local topic = ARGV[7]
+local wakeup_mode = ARGV[8]
+local lane = ARGV[9]
+
+-- 覆盖已有定义时，撤销尚未触发的旧物化消息
+local previous = redis.call('HGET', schedules, schedule_id..':current')
+if previous and redis.call('ZSCORE', delay_tasks, previous) then
+    redis.call('ZREM', delay_tasks, previous)
+    redis.call('HDEL', payload_map, previous, previous..':queue', previous..':lane')
+end
+
+-- 保存定义与物化指针
+redis.call('HSET', schedules, schedule_id, definition, schedule_id..':current', message_id)
+redis.call('ZADD', schedules_next, occurrence_time, schedule_id)
+
+-- 物化第一次触发（在插入之前获取当前最早任务，用于判断是否需要通知）
+local current_earliest = redis.call('ZRANGE', delay_tasks, 0, 0, 'WITHSCORES')
+
+redis.call('HSET', payload_map, message_id, payload, message_id..':queue', topic)
+if lane and lane ~= '' then
+    redis.call('HSET', payload_map, message_id..':lane', lane)
+end
+redis.call('ZADD', delay_tasks, fire_time, message_id)
+
+if wakeup_target and wakeup_target ~= '' then
+    if #current_earliest == 0 or fire_time < tonumber(current_earliest[2]) then
+        wakeup(wakeup_target, wakeup_mode, fire_time)
+    end
+end
+
+return 'OK'
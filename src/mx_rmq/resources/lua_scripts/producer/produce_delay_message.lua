@@ -1,65 +1,77 @@
 -- produce_delay_message.lua
--- 原子性生产延时消息 + 智能pubsub通知
+-- 原子性生产延时消息 + 智能唤醒通知（pubsub 或阻塞唤醒令牌）
 -- KEYS[1]: payload_map
 -- KEYS[2]: delay_tasks
--- KEYS[3]: pubsub_channel (可选，如果提供则发送通知)
+-- KEYS[3]: wakeup_target (唤醒目标：pubsub通道或唤醒令牌列表，可选)
+-- KEYS[4]: delay_buckets (远期时间桶索引)
+-- KEYS[5]: metrics (可选，维护各主题生产数)
 -- ARGV[1]: message_id
 -- ARGV[2]: payload (JSON string)
 -- ARGV[3]: topic
--- ARGV[4]: delay_seconds (延时秒数)
+-- ARGV[4]: delay_ms (延时毫秒数)
+-- ARGV[5]: deliver_at_ms (绝对投递时间戳毫秒，0表示使用相对延时)
+-- ARGV[6]: bucket_horizon_ms (近期窗口毫秒数，0表示不分桶)
+-- ARGV[7]: bucket_size_ms (时间桶跨度毫秒数)
+-- ARGV[8]: bucket_prefix (时间桶键前缀)
+-- 注意：时间桶键名由脚本动态生成、未在 KEYS 中声明，分桶仅支持单节点Redis，不支持Redis Cluster
+-- ARGV[9]: wakeup_mode (唤醒方式：pubsub 或 blocking，缺省为 pubsub)
+-- ARGV[10]: lane (非默认优先级的数值等级，默认优先级传空串)
+-- ARGV[11]: ordering_key (顺序键，可选，到期时按顺序组投递)
+-- ARGV[12]: counter_topic (计数用主题名称，不带全局前缀)
+-- ARGV[13]: bucket_ttl (计数器分钟桶过期秒数，0表示不分桶)
+-- 公共函数 add_delay_task, incr_counter 定义在 common/helpers.lua，加载时拼接到脚本开头
 
 local payload_map = KEYS[1]
 local delay_tasks = KEYS[2]
-local pubsub_channel = KEYS[3]
+local wakeup_target = KEYS[3]
+local delay_buckets = KEYS[4]
+local metrics_key = KEYS[5]
 
 local id = ARGV[1]
 local payload = ARGV[2]
 local topic = ARGV[3]
-local delay_seconds = tonumber(ARGV[4])
+local delay_ms = tonumber(ARGV[4])
+local deliver_at = tonumber(ARGV[5]) or 0
+local bucket_horizon = tonumber(ARGV[6]) or 0
+local bucket_size = tonumber(ARGV[7]) or 0
+local bucket_prefix = ARGV[8]
+local wakeup_mode = ARGV[9]
+local lane = ARGV[10]
+local ordering_key = ARGV[11]
+local counter_topic = ARGV[12]
+local bucket_ttl = ARGV[13]
 
 -- 获取Redis服务器当前时间（毫秒）
 local redis_time = redis.call('TIME')
 local current_time = tonumber(redis_time[1]) * 1000 + math.floor(tonumber(redis_time[2]) / 1000)
 
--- 计算执行时间（当前时间 + 延时秒数转换为毫秒）
-local execute_time = current_time + delay_seconds * 1000
-
--- 获取当前最早的任务（在插入新任务之前）
--- 索引1: "task_id_123" (任务ID)  索引2: "1672531200000" (执行时间戳)
-local current_earliest = redis.call('ZRANGE', delay_tasks, 0, 0, 'WITHSCORES')
+-- 计算执行时间：指定了绝对投递时间则直接使用，否则为当前时间 + 延时毫秒数
+local execute_time = current_time + delay_ms
+if deliver_at > 0 then
+    execute_time = deliver_at
+end
 
 -- 原子性插入消息数据
 redis.call('HSET', payload_map, id, payload)
 redis.call('HSET', payload_map, id..':queue', topic)
 
--- 添加到延时任务队列
-redis.call('ZADD', delay_tasks, execute_time, id)
+-- 记录优先级通道，到期后投递到对应的优先级通道
+if lane and lane ~= '' then
+    redis.call('HSET', payload_map, id..':lane', lane)
+end
 
--- 智能通知：发送通知的条件
-if pubsub_channel and pubsub_channel ~= '' then
-    local should_notify = false
-    local notify_time = execute_time
-    
-    -- 条件1：第一个延时任务，冷启动，所以必须启动
-    if #current_earliest == 0 then
-        should_notify = true
-    -- 条件2：新任务比当前最早任务更早，需要通知  
-    elseif execute_time < tonumber(current_earliest[2]) then
-        should_notify = true
-    -- 条件3：检查是否有任务已到期（包括新插入的任务）
-    else
-        -- 获取所有到期的任务
-        local expired_tasks = redis.call('ZRANGE', delay_tasks, 0, current_time, 'BYSCORE', 'LIMIT', 0, 1)
-        if #expired_tasks > 0 then
-            should_notify = true
-            notify_time = current_time  -- 立即处理到期任务
-        end
-    end
-    
-    -- 这个才是关键
-    if should_notify then
-        redis.call('PUBLISH', pubsub_channel, notify_time)
-    end
+-- 记录顺序键，到期时同键已有在途消息则排入顺序组
+if ordering_key and ordering_key ~= '' then
+    redis.call('HSET', payload_map, id..':order', ordering_key)
 end
 
-return 'OK'
\ No newline at end of file
+-- 生产计数在分支前写入，远期消息提前返回时同样计入
+incr_counter(metrics_key, 'produced', counter_topic, bucket_ttl)
+
+-- 远期消息写入粗粒度时间桶，由调度器在进入近期窗口时批量提升到 delay_tasks
+-- 热路径只触达一个小的桶ZSet和桶索引，不再让 delay_tasks 随远期消息无限膨胀
+-- 近期消息写入 delay_tasks，并在成为最早任务时唤醒调度器
+add_delay_task(delay_tasks, delay_buckets, id, execute_time, current_time,
+               bucket_horizon, bucket_size, bucket_prefix, wakeup_target, wakeup_mode)
+
+return 'OK'
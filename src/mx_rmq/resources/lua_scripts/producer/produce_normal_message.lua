@@ -1,38 +1,73 @@
 -- produce_normal_message.lua
 -- 原子性生产普通消息
 -- KEYS[1]: payload_map
--- KEYS[2]: {topic}:pending
+-- KEYS[2]: {topic}:pending 或 {topic}:pending:{level} (消息所属优先级通道)
 -- KEYS[3]: all_expire_monitor
+-- KEYS[4]: {topic}:signal (可选，分发唤醒信号)
+-- KEYS[5]: {topic}:ordering (可选，顺序键 -> 在途消息ID)
+-- KEYS[6]: {topic}:ordering:{ordering_key} (可选，顺序组等待队列)
+-- KEYS[7]: metrics (可选，维护各主题生产数)
 -- ARGV[1]: message_id
 -- ARGV[2]: payload (JSON string)
 -- ARGV[3]: topic
 -- ARGV[4]: expire_time
--- ARGV[5]: is_urgent ("1" for high priority, "0" for normal/low)
+-- ARGV[5]: lane (非默认优先级的数值等级，默认优先级传空串)
+-- ARGV[6]: ordering_key (顺序键，可选，同键消息串行且按生产顺序处理)
+-- ARGV[7]: counter_topic (计数用主题名称，不带全局前缀)
+-- ARGV[8]: bucket_ttl (计数器分钟桶过期秒数，0表示不分桶)
+-- 公共函数 incr_counter 定义在 common/helpers.lua，加载时拼接到脚本开头
 
 local payload_map = KEYS[1]
-local pending_queue = KEYS[2] 
+local pending_queue = KEYS[2]
 local expire_monitor = KEYS[3]
+local signal_key = KEYS[4]
+local ordering_hash = KEYS[5]
+local ordering_group = KEYS[6]
+local metrics_key = KEYS[7]
 
 local id = ARGV[1]
 local payload = ARGV[2]
 local topic = ARGV[3]
 local expire_time = ARGV[4]
-local is_urgent = ARGV[5]
+local lane = ARGV[5]
+local ordering_key = ARGV[6]
+local counter_topic = ARGV[7]
+local bucket_ttl = ARGV[8]
 
 -- 原子性插入消息数据
 redis.call('HSET', payload_map, id, payload)
 redis.call('HSET', payload_map, id..':queue', topic)
 
+-- 记录优先级通道，重试或延时投递时回到同一通道
+if lane and lane ~= '' then
+    redis.call('HSET', payload_map, id..':lane', lane)
+end
+
+-- 生产计数（排入顺序组的消息同样计入）
+incr_counter(metrics_key, 'produced', counter_topic, bucket_ttl)
+
 -- 添加到过期监控
 redis.call('ZADD', expire_monitor, expire_time, id)
 
--- 根据优先级插入队列
-if is_urgent == '1' then
-    -- 高优先级消息插入队列右边（优先被处理）
-    redis.call('RPUSH', pending_queue, id)
-else
-    -- 普通/低优先级消息插入队列左边
-    redis.call('LPUSH', pending_queue, id)
+-- 顺序键：同键已有在途消息时排入顺序组队尾，由前一条消息结束时投递
+if ordering_key and ordering_key ~= '' then
+    redis.call('HSET', payload_map, id..':order', ordering_key)
+    local active = redis.call('HGET', ordering_hash, ordering_key)
+    -- 在途消息已不存在（异常清理）时直接接管，避免顺序组永久阻塞
+    if active and active ~= id and redis.call('HEXISTS', payload_map, active) == 1 then
+        redis.call('RPUSH', ordering_group, id)
+        return 'OK'
+    end
+    redis.call('HSET', ordering_hash, ordering_key, id)
+end
+
+-- 每个优先级一个通道，通道内先进先出（左进右出）
+redis.call('LPUSH', pending_queue, id)
+
+-- 唤醒阻塞等待的分发协程（只保留一个信号）
+if signal_key and signal_key ~= '' then
+    redis.call('LPUSH', signal_key, 1)
+    redis.call('LTRIM', signal_key, 0, 0)
 end
 
-return 'OK' 
\ No newline at end of file
+return 'OK'
@@ -0,0 +1,64 @@
+-- publish_message.lua
+-- 原子性发布广播消息：消息体只存储一份，向每个订阅分组的优先级通道投递一个分组投递ID
+-- KEYS[1]: payload_map
+-- KEYS[2]: all_expire_monitor
+-- KEYS[3]: {topic}:groups (订阅分组集合)
+-- KEYS[4]: metrics (可选，维护各主题生产数)
+-- ARGV[1]: message_id
+-- ARGV[2]: payload (JSON string)
+-- ARGV[3]: topic (带全局前缀的广播主题名)
+-- ARGV[4]: expire_time
+-- ARGV[5]: lane (非默认优先级的数值等级，默认优先级传空串)
+-- ARGV[6]: counter_topic (计数用主题名称，不带全局前缀)
+-- ARGV[7]: bucket_ttl (计数器分钟桶过期秒数，0表示不分桶)
+-- 返回值：投递的分组数量，没有订阅分组时返回 0 且不存储消息
+-- 公共函数 incr_counter 定义在 common/helpers.lua，加载时拼接到脚本开头
+
+local payload_map = KEYS[1]
+local expire_monitor = KEYS[2]
+local groups_key = KEYS[3]
+local metrics_key = KEYS[4]
+
+local id = ARGV[1]
+local payload = ARGV[2]
+local topic = ARGV[3]
+local expire_time = ARGV[4]
+local lane = ARGV[5]
+local counter_topic = ARGV[6]
+local bucket_ttl = ARGV[7]
+
+local groups = redis.call('SMEMBERS', groups_key)
+
+-- 卫语句：没有订阅分组
+if #groups == 0 then
+    return 0
+end
+
+-- 消息体只存储一份，引用计数为分组数量，最后一个分组结束时删除
+redis.call('HSET', payload_map, id, payload, id..':refs', #groups)
+
+for _, group in ipairs(groups) do
+    -- 分组投递ID为 {消息ID}@{分组}，分组内部主题为 {主题}@{分组}
+    local delivery_id = id..'@'..group
+    local group_queue = topic..'@'..group
+    local pending_key = group_queue..':pending'
+
+    redis.call('HSET', payload_map, delivery_id..':queue', group_queue)
+    if lane and lane ~= '' then
+        redis.call('HSET', payload_map, delivery_id..':lane', lane)
+        pending_key = pending_key..':'..lane
+    end
+
+    -- 每个分组独立过期监控，互不影响
+    redis.call('ZADD', expire_monitor, expire_time, delivery_id)
+    redis.call('LPUSH', pending_key, delivery_id)
+
+    -- 唤醒该分组阻塞等待的分发协程（只保留一个信号）
+    redis.call('LPUSH', group_queue..':signal', 1)
+    redis.call('LTRIM', group_queue..':signal', 0, 0)
+end
+
+-- 一次广播只计一条生产消息，分组投递在各分组主题下计完成
+incr_counter(metrics_key, 'produced', counter_topic, bucket_ttl)
+
+return #groups
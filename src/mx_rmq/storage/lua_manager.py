@@ -10,6 +10,9 @@ import redis.asyncio as aioredis
 from redis.commands.core import AsyncScript
 from loguru import logger
 
+# 公共辅助函数脚本（只定义 local function，不单独注册）
+HELPERS_SCRIPT = "common/helpers.lua"
+
 
 class LuaScriptManager:
     """Lua脚本管理器"""
@@ -33,20 +36,31 @@ class LuaScriptManager:
         script_files = {
             "produce_normal": "producer/produce_normal_message.lua",
             "produce_delay": "producer/produce_delay_message.lua",
+            "publish_message": "producer/publish_message.lua",
             "process_delay": "consumer/process_delay_message.lua",
+            "dispatch_message": "consumer/dispatch_message.lua",
             "get_next_delay_task": "consumer/get_next_delay_task.lua",  # 新增：获取下一个延时任务
+            "promote_delay_buckets": "consumer/promote_delay_buckets.lua",
             "complete_message": "lifecycle/complete_message.lua",
             "handle_timeout": "management/handle_timeout_message.lua",
             "retry_message": "lifecycle/retry_message.lua",
             "move_to_dlq": "management/move_to_dlq.lua",
             "handle_parse_error": "management/handle_parse_error.lua",  # 新增：处理解析错误
+            "create_schedule": "producer/create_schedule.lua",
+            "materialize_schedule": "consumer/materialize_schedule.lua",
+            "remove_schedule": "management/remove_schedule.lua",
         }
 
+        # 公共辅助函数只维护一份，拼接到每个脚本开头后再注册
+        helpers = await self._load_script_content(HELPERS_SCRIPT)
+
         lua_scripts = {}
         for script_name, filename in script_files.items():
             script_content = await self._load_script_content(filename)
             # 注册脚本到Redis
-            lua_scripts[script_name] = self.redis.register_script(script_content)
+            lua_scripts[script_name] = self.redis.register_script(
+                f"{helpers}\n{script_content}"
+            )
 
         logger.info(f"Lua脚本加载完成, count={len(lua_scripts)}")
         return lua_scripts
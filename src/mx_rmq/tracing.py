@@ -0,0 +1,142 @@
+"""
+OpenTelemetry 链路追踪模块
+可选依赖：pip install mx-rmq[otel]，未启用时所有操作为空操作
+"""
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+except ImportError:  # pragma: no cover - 未安装可选依赖
+    propagate = None  # type: ignore[assignment]
+    trace = None  # type: ignore[assignment]
+    SpanKind = Status = StatusCode = None  # type: ignore[assignment,misc]
+
+OTEL_AVAILABLE = trace is not None
+TRACER_NAME = "mx_rmq"
+
+# 消息系统语义约定的属性名
+MESSAGING_SYSTEM = "mx_rmq"
+
+
+class Tracer:
+    """
+    消息队列链路追踪器
+
+    生产时把当前追踪上下文（W3C traceparent/tracestate）注入消息元数据，
+    消费时从消息元数据中提取作为处理 span 的父上下文，一次请求可以跨服务经由队列串联。
+    Lua 脚本调用只在已有活跃 span 时记录子 span，不会为分发轮询产生大量根 span。
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        # 卫语句：启用追踪但未安装依赖
+        if enabled and not OTEL_AVAILABLE:
+            raise ImportError(
+                "启用链路追踪需要安装 opentelemetry-api：pip install mx-rmq[otel]"
+            )
+        self.enabled = enabled
+        self._tracer = trace.get_tracer(TRACER_NAME) if enabled else None
+
+    def inject(self) -> dict[str, str] | None:
+        """
+        导出当前追踪上下文
+
+        Returns:
+            传播字段（traceparent 等），未启用或没有活跃 span 时为None
+        """
+        # 卫语句：未启用追踪
+        if not self.enabled:
+            return None
+        carrier: dict[str, str] = {}
+        propagate.inject(carrier)
+        return carrier or None
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        kind: str = "internal",
+        attributes: dict[str, Any] | None = None,
+        parent: dict[str, str] | None = None,
+    ) -> Iterator[Any]:
+        """
+        创建 span 并设为当前 span，异常自动记录到 span 上
+
+        Args:
+            name: span 名称
+            kind: producer / consumer / client / internal
+            attributes: span 属性
+            parent: 消息元数据中的追踪上下文，当前没有活跃 span 时作为父上下文
+
+        Yields:
+            span 对象，未启用时为None
+        """
+        # 卫语句：未启用追踪
+        if not self.enabled:
+            yield None
+            return
+
+        context = None
+        if parent and not trace.get_current_span().get_span_context().is_valid:
+            context = propagate.extract(parent)
+        with self._tracer.start_as_current_span(
+            name,
+            context=context,
+            kind=getattr(SpanKind, kind.upper()),
+            attributes=attributes,
+        ) as span:
+            yield span
+
+    def record_error(self, span: Any, error: Exception) -> None:
+        """在 span 上记录已被捕获处理的异常（如处理器失败后转入重试）"""
+        # 卫语句：未启用追踪
+        if span is None:
+            return
+        span.record_exception(error)
+        span.set_status(Status(StatusCode.ERROR, str(error)))
+
+    def wrap_script(self, name: str, script: Any) -> Any:
+        """为 Lua 脚本调用包装计时 span"""
+        # 卫语句：未启用追踪
+        if not self.enabled:
+            return script
+        return _TracedScript(self, name, script)
+
+    def has_active_span(self) -> bool:
+        """当前是否有活跃 span"""
+        return self.enabled and trace.get_current_span().get_span_context().is_valid
+
+
+class _TracedScript:
+    """记录每次调用耗时的 Lua 脚本包装"""
+
+    __slots__ = ("_tracer", "_name", "_script")
+
+    def __init__(self, tracer: Tracer, name: str, script: Any) -> None:
+        self._tracer = tracer
+        self._name = name
+        self._script = script
+
+    async def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        # 卫语句：没有活跃 span（如分发轮询）时不记录
+        if not self._tracer.has_active_span():
+            return await self._script(*args, **kwargs)
+
+        with self._tracer.span(
+            f"EVALSHA {self._name}",
+            kind="client",
+            attributes={"db.system": "redis", "mx_rmq.script": self._name},
+        ):
+            return await self._script(*args, **kwargs)
+
+
+def message_attributes(topic: str, message_id: str) -> dict[str, Any]:
+    """消息相关 span 的公共属性（OpenTelemetry 消息系统语义约定）"""
+    return {
+        "messaging.system": MESSAGING_SYSTEM,
+        "messaging.destination.name": topic,
+        "messaging.message.id": message_id,
+    }
@@ -0,0 +1,91 @@
+"""
+工作流链定义模块
+处理器成功后的后续消息与当前消息的完成确认在同一个Lua脚本中原子写入
+"""
+
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any
+
+from .config import MQConfig
+from .message import Message, MessagePriority
+
+
+@dataclass(frozen=True)
+class FollowUp:
+    """
+    后续消息，由处理器返回（单个或列表）
+
+    Attributes:
+        topic: 后续消息的主题
+        payload: 后续消息的负载
+        priority: 消息优先级，枚举或0-9的数值
+        ttl: 消息生存时间（秒），None使用配置默认值
+    """
+
+    topic: str
+    payload: dict[str, Any] = field(default_factory=dict)
+    priority: MessagePriority | int = MessagePriority.NORMAL
+    ttl: int | None = None
+
+    def build_message(self, config: MQConfig) -> Message:
+        """
+        构建后续消息
+
+        Args:
+            config: 消息队列配置
+
+        Returns:
+            消息对象
+        """
+        message = Message(
+            id=str(uuid.uuid4()),
+            topic=self.topic,
+            payload=self.payload,
+            priority=self.priority,
+        )
+        ttl = self.ttl or config.message_ttl
+        message.meta.expire_at = int(time.time() * 1000) + ttl * 1000
+        message.meta.max_retries = config.max_retries
+        message.meta.retry_delays = config.retry_delays.copy()
+        return message
+
+
+def is_follow_up_result(result: Any) -> bool:
+    """处理器返回值是否为后续消息（单个 FollowUp 或非空的 FollowUp 列表）"""
+    if isinstance(result, FollowUp):
+        return True
+    return (
+        isinstance(result, (list, tuple))
+        and bool(result)
+        and all(isinstance(item, FollowUp) for item in result)
+    )
+
+
+def resolve_follow_ups(
+    result: Any, payload: dict[str, Any], chain: tuple[str, ...] = ()
+) -> list[FollowUp]:
+    """
+    根据处理器返回值确定后续消息
+
+    处理器返回 FollowUp（或其列表）时以返回值为准；否则按注册时声明的链，
+    返回字典时作为后续消息的负载，其他返回值时沿用当前消息的负载
+
+    Args:
+        result: 处理器返回值
+        payload: 当前消息的负载
+        chain: 注册时声明的后续主题
+
+    Returns:
+        后续消息列表
+    """
+    if is_follow_up_result(result):
+        return [result] if isinstance(result, FollowUp) else list(result)
+
+    # 卫语句：未声明链
+    if not chain:
+        return []
+
+    next_payload = result if isinstance(result, dict) else payload
+    return [FollowUp(topic=topic, payload=next_payload) for topic in chain]
@@ -0,0 +1,273 @@
+"""
+Lua 脚本集成测试 - 直接在真实 Redis 8.x 上执行脚本并检查数据结构
+"""
+
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+import redis.asyncio as aioredis
+
+from mx_rmq import MQConfig
+from mx_rmq.constants import GlobalKeys, TopicKeys
+from mx_rmq.core.context import QueueContext
+from mx_rmq.core.lifecycle import MessageLifecycleService
+from mx_rmq.core.schedule import ScheduleService
+from mx_rmq.message import Message
+from mx_rmq.storage.lua_manager import LuaScriptManager
+from mx_rmq.workflow import FollowUp
+
+
+@pytest_asyncio.fixture
+async def lua_context(
+    test_config_v8: MQConfig, clean_redis_v8: aioredis.Redis
+) -> QueueContext:
+    """加载全部 Lua 脚本的队列上下文"""
+    scripts = await LuaScriptManager(clean_redis_v8).load_scripts()
+    return QueueContext(test_config_v8, clean_redis_v8, scripts)
+
+
+async def _store_processing(
+    context: QueueContext, topic: str, message_id: str, payload: str = "{}"
+) -> None:
+    """模拟一条已分发到 processing 队列的消息"""
+    await context.redis.hset(
+        context.get_global_key(GlobalKeys.PAYLOAD_MAP),
+        mapping={
+            message_id: payload,
+            f"{message_id}:queue": context.get_global_key(topic),
+        },
+    )  # type: ignore
+    await context.redis.lpush(
+        context.get_global_topic_key(topic, TopicKeys.PROCESSING), message_id
+    )  # type: ignore
+
+
+@pytest.mark.integration
+@pytest.mark.redis_v8
+class TestCompleteMessageScript:
+    """complete_message.lua 测试"""
+
+    @pytest.mark.asyncio
+    async def test_reply_written_on_first_ack(self, lua_context: QueueContext):
+        """测试完成确认时写入RPC回复"""
+        await _store_processing(lua_context, "add", "msg-1")
+        service = MessageLifecycleService(lua_context)
+
+        await service.complete_message(
+            "msg-1", "add", reply_to="test_mq:reply:1", reply='{"ok":1}'
+        )
+
+        assert await lua_context.redis.lrange("test_mq:reply:1", 0, -1) == [
+            '{"ok":1}'
+        ]
+
+    @pytest.mark.asyncio
+    async def test_late_ack_does_not_reply(self, lua_context: QueueContext):
+        """测试重复确认或超时回收后的迟到确认不写入回复"""
+        service = MessageLifecycleService(lua_context)
+
+        await service.complete_message(
+            "msg-1", "add", reply_to="test_mq:reply:1", reply='{"ok":1}'
+        )
+
+        assert not await lua_context.redis.exists("test_mq:reply:1")
+
+    @pytest.mark.asyncio
+    async def test_ack_id_with_separator_keeps_other_payload(
+        self, lua_context: QueueContext
+    ):
+        """测试确认包含@的普通消息ID时不会释放同名前缀消息的消息体"""
+        payload_map = lua_context.get_global_key(GlobalKeys.PAYLOAD_MAP)
+        await _store_processing(lua_context, "users", "alice", '{"id":"alice"}')
+        await _store_processing(
+            lua_context, "mail", "alice@example.com", '{"id":"alice@example.com"}'
+        )
+        service = MessageLifecycleService(lua_context)
+
+        await service.complete_message("alice@example.com", "mail")
+
+        assert await lua_context.redis.hget(payload_map, "alice") == '{"id":"alice"}'
+        assert not await lua_context.redis.hexists(payload_map, "alice@example.com")
+        assert await lua_context.load_message_json("alice@example.com") is None
+
+    @pytest.mark.asyncio
+    async def test_ack_fanout_delivery_releases_shared_payload(
+        self, lua_context: QueueContext
+    ):
+        """测试最后一个分组投递确认后删除共享消息体"""
+        payload_map = lua_context.get_global_key(GlobalKeys.PAYLOAD_MAP)
+        await lua_context.redis.hset(
+            payload_map, mapping={"m1": '{"id":"m1"}', "m1:refs": 1}
+        )  # type: ignore
+        await lua_context.redis.hset(
+            payload_map, "m1@svc:queue", lua_context.get_global_key("cache@svc")
+        )  # type: ignore
+        await lua_context.redis.lpush(
+            lua_context.get_global_topic_key("cache@svc", TopicKeys.PROCESSING),
+            "m1@svc",
+        )  # type: ignore
+        assert await lua_context.load_message_json("m1@svc") == '{"id":"m1"}'
+
+        service = MessageLifecycleService(lua_context)
+        await service.complete_message("m1@svc", "cache@svc")
+
+        assert not await lua_context.redis.hexists(payload_map, "m1")
+        assert not await lua_context.redis.hexists(payload_map, "m1:refs")
+
+    @pytest.mark.asyncio
+    async def test_follow_ups_enqueued_only_on_first_ack(
+        self, lua_context: QueueContext
+    ):
+        """测试后续消息只在消息确实从processing队列移除时入队"""
+        await _store_processing(lua_context, "a", "m1")
+        service = MessageLifecycleService(lua_context)
+        pending_key = lua_context.get_global_topic_key("b", TopicKeys.PENDING)
+
+        await service.complete_message("m1", "a", follow_ups=[FollowUp("b")])
+        await service.complete_message("m1", "a", follow_ups=[FollowUp("b")])
+
+        assert await lua_context.redis.llen(pending_key) == 1
+
+
+    @pytest.mark.asyncio
+    async def test_late_ack_after_retry_keeps_ordering(
+        self, lua_context: QueueContext
+    ):
+        """测试超时重试后的迟到确认不释放顺序键，同键下一条消息不被分发"""
+        payload_map = lua_context.get_global_key(GlobalKeys.PAYLOAD_MAP)
+        ordering_hash = lua_context.get_global_topic_key("orders", TopicKeys.ORDERING)
+        ordering_group = f"{ordering_hash}:user-1"
+        await _store_processing(lua_context, "orders", "m1")
+        await lua_context.redis.hset(
+            payload_map,
+            mapping={
+                "m1:order": "user-1",
+                "m2": "{}",
+                "m2:queue": lua_context.get_global_key("orders"),
+                "m2:order": "user-1",
+            },
+        )  # type: ignore
+        await lua_context.redis.rpush(ordering_group, "m2")  # type: ignore
+        await lua_context.redis.hset(ordering_hash, "user-1", "m1")  # type: ignore
+
+        # 超时回收：消息移出processing队列进入延时重试
+        message = Message(topic="orders", payload={})
+        message.id = "m1"
+        message.meta.retry_count = 1
+        await MessageLifecycleService(lua_context).retry_message(message, "orders")
+
+        removed = await lua_context.lua_scripts["complete_message"](
+            keys=[
+                payload_map,
+                lua_context.get_global_topic_key("orders", TopicKeys.PROCESSING),
+                lua_context.get_global_key(GlobalKeys.EXPIRE_MONITOR),
+                "",
+                "",
+            ],
+            args=["m1", "", "", "orders", 0],
+        )
+
+        assert removed == 0
+        pending_key = lua_context.get_global_topic_key("orders", TopicKeys.PENDING)
+        assert await lua_context.redis.llen(pending_key) == 0
+        assert await lua_context.redis.lrange(ordering_group, 0, -1) == ["m2"]
+        assert await lua_context.redis.hget(ordering_hash, "user-1") == "m1"
+        assert await lua_context.redis.hget(payload_map, "m1:order") == "user-1"
+        assert await lua_context.redis.hexists(payload_map, "m1")
+
+
+@pytest.mark.integration
+@pytest.mark.redis_v8
+class TestProcessDelayScript:
+    """process_delay_message.lua 测试"""
+
+    @pytest.mark.asyncio
+    async def test_lateness_aggregated_per_queue(self, lua_context: QueueContext):
+        """测试调度滞后按目标队列聚合，每个队列只返回一组汇总"""
+        delay_tasks = lua_context.get_global_key(GlobalKeys.DELAY_TASKS)
+        payload_map = lua_context.get_global_key(GlobalKeys.PAYLOAD_MAP)
+        seconds, micros = await lua_context.redis.time()  # type: ignore
+        now_ms = seconds * 1000 + micros // 1000
+        for i, topic in enumerate(["orders", "orders", "orders", "emails"]):
+            message_id = f"m{i}"
+            await lua_context.redis.hset(
+                payload_map, f"{message_id}:queue", lua_context.get_global_key(topic)
+            )  # type: ignore
+            await lua_context.redis.zadd(delay_tasks, {message_id: now_ms - 1000 * i})
+
+        result = await lua_context.lua_scripts["process_delay"](
+            keys=[delay_tasks, payload_map], args=[100]
+        )
+
+        assert result[:3] == [4, 0, 0]
+        summaries = {
+            result[i]: result[i + 1 : i + 5] for i in range(3, len(result), 5)
+        }
+        assert len(result) == 3 + 5 * 2
+        count, total_ms, min_ms, max_ms = summaries["test_mq:orders"]
+        assert count == 3
+        assert 0 <= min_ms <= max_ms
+        assert max_ms - min_ms >= 2000
+        assert total_ms >= 3000
+        assert summaries["test_mq:emails"][0] == 1
+
+
+async def _measure_retry_redelivery(context: QueueContext, retry_delay: float) -> float:
+    """启动延时调度器后重试一条消息，返回从重试到重新进入 pending 队列的耗时（秒）"""
+    scheduler = ScheduleService(context)
+    scheduler_task = asyncio.create_task(scheduler.process_delay_messages())
+    # 等待调度器进入等待状态（pubsub 模式同时完成订阅）
+    await asyncio.sleep(0.5)
+
+    # 已有一个远在之后的延时任务，调度器按它的到期时间等待
+    await context.redis.zadd(
+        context.get_global_key(GlobalKeys.DELAY_TASKS),
+        {"later": int(time.time() * 1000) + 60_000},
+    )
+    message = Message(topic="orders", payload={"n": 1})
+    message.meta.retry_count = 1
+    message.meta.retry_delays = [retry_delay]
+    await _store_processing(
+        context, "orders", message.id, message.model_dump_json(by_alias=True)
+    )
+    pending_key = context.get_global_topic_key("orders", TopicKeys.PENDING)
+
+    try:
+        started = time.monotonic()
+        await MessageLifecycleService(context).retry_message(message, "orders")
+        while message.id not in await context.redis.lrange(pending_key, 0, -1):
+            assert time.monotonic() - started < 5, "重试消息未被重新投递"
+            await asyncio.sleep(0.02)
+        return time.monotonic() - started
+    finally:
+        await scheduler.stop_delay_processing()
+        scheduler_task.cancel()
+        await asyncio.gather(scheduler_task, return_exceptions=True)
+
+
+@pytest.mark.integration
+@pytest.mark.redis_v8
+class TestRetryMessageScript:
+    """retry_message.lua 测试"""
+
+    @pytest.mark.asyncio
+    async def test_sub_second_retry_wakes_scheduler(self, lua_context: QueueContext):
+        """测试亚秒级重试成为最早任务时通知调度器，按时重新投递而不等兜底轮询"""
+        elapsed = await _measure_retry_redelivery(lua_context, 0.3)
+
+        assert 0.25 <= elapsed < 1.5
+
+    @pytest.mark.asyncio
+    async def test_retry_redelivered_in_blocking_mode(
+        self, test_config_v8: MQConfig, clean_redis_v8: aioredis.Redis
+    ):
+        """测试阻塞唤醒模式下重试写入唤醒令牌，消息按时重新投递"""
+        config = test_config_v8.model_copy(update={"delay_wakeup_mode": "blocking"})
+        scripts = await LuaScriptManager(clean_redis_v8).load_scripts()
+        context = QueueContext(config, clean_redis_v8, scripts)
+
+        elapsed = await _measure_retry_redelivery(context, 0.3)
+
+        assert 0.25 <= elapsed < 1.5
@@ -0,0 +1,70 @@
+"""
+基准测试命令行测试
+"""
+
+import pytest
+
+from mx_rmq.bench import SCENARIOS, LocalRedisServer, summarize
+from mx_rmq.cli import build_parser, main
+
+
+class TestSummarize:
+    """延迟样本汇总测试"""
+
+    def test_percentiles_in_milliseconds(self):
+        """测试最近秩分位数并换算为毫秒"""
+        summary = summarize([i / 1000 for i in range(100, 0, -1)])
+
+        assert summary["count"] == 100
+        assert summary["min_ms"] == 1.0
+        assert summary["p50_ms"] == 50.0
+        assert summary["p99_ms"] == 99.0
+        assert summary["max_ms"] == 100.0
+        assert summary["avg_ms"] == 50.5
+
+    def test_empty_samples(self):
+        """测试没有样本时只返回数量"""
+        assert summarize([]) == {"count": 0}
+
+
+class TestBenchCommand:
+    """mx-rmq bench 参数解析测试"""
+
+    def test_defaults_run_all_scenarios(self):
+        """测试默认执行全部场景"""
+        args = build_parser().parse_args(["bench"])
+
+        assert args.scenarios == list(SCENARIOS)
+        assert args.redis_host is None
+
+    def test_parse_lists(self):
+        """测试逗号分隔的场景和扩展性取值"""
+        args = build_parser().parse_args(
+            ["bench", "--scenarios", "produce,ack", "--workers-scale", "1,8"]
+        )
+
+        assert args.scenarios == ["produce", "ack"]
+        assert args.workers_scale == [1, 8]
+
+    @pytest.mark.parametrize(
+        "argv",
+        [
+            ["bench", "--scenarios", "produce,unknown"],
+            ["bench", "--topics-scale", "1,0"],
+            ["bench", "--payload-scale", "large"],
+        ],
+    )
+    def test_invalid_arguments(self, argv):
+        """测试非法场景和取值"""
+        with pytest.raises(SystemExit):
+            build_parser().parse_args(argv)
+
+    def test_missing_redis_server(self):
+        """测试找不到 redis-server 时返回非零退出码"""
+        assert main(["bench", "--redis-server", "no-such-redis-server"]) == 1
+
+    @pytest.mark.asyncio
+    async def test_local_server_requires_executable(self):
+        """测试本地 redis-server 可执行文件不存在时给出提示"""
+        with pytest.raises(FileNotFoundError, match="--redis-server"):
+            await LocalRedisServer("no-such-redis-server").start()
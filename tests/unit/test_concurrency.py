@@ -0,0 +1,84 @@
+"""
+自适应并发控制测试
+"""
+
+import asyncio
+
+import pytest
+
+from mx_rmq.core.concurrency import AdaptiveConcurrency, AIMDLimiter
+from mx_rmq.core.dispatch import TaskItem
+from mx_rmq.core.fair_queue import FairTaskQueue
+from mx_rmq.message import Message
+
+
+class TestAIMDLimiter:
+    """AIMD限制器测试"""
+
+    def test_starts_at_max_limit(self):
+        """测试初始上限为最大值"""
+        assert AIMDLimiter(1, 20, 2.0).limit == 20
+
+    def test_errors_decrease_multiplicatively_once_per_window(self):
+        """测试错误使上限乘性减小，且一轮内只减小一次"""
+        limiter = AIMDLimiter(1, 20, 2.0)
+        for _ in range(20):
+            limiter.record(0.01, success=False)
+        assert limiter.limit == 18
+
+        for _ in range(200):
+            limiter.record(0.01, success=False)
+        assert limiter.limit == 1
+
+    def test_recovers_additively(self):
+        """测试下游恢复后上限逐步回升到最大值"""
+        limiter = AIMDLimiter(1, 10, 2.0)
+        for _ in range(100):
+            limiter.record(0.01, success=False)
+        assert limiter.limit == 1
+
+        for _ in range(100):
+            limiter.record(0.01, success=True)
+        assert limiter.limit == 10
+
+    def test_latency_increase_counts_as_congestion(self):
+        """测试延迟明显高于基线时判定为拥塞"""
+        limiter = AIMDLimiter(1, 20, 2.0)
+        for _ in range(20):
+            limiter.record(0.01, success=True)
+        for _ in range(60):
+            limiter.record(0.1, success=True)
+
+        assert limiter.limit < 20
+
+
+class TestAdaptiveConcurrency:
+    """自适应并发控制器测试"""
+
+    def test_limit_applied_to_task_queue(self):
+        """测试上限变化同步为队列的在途上限和预取数量"""
+        queue = FairTaskQueue(maxsize=8)
+        concurrency = AdaptiveConcurrency(
+            queue,
+            max_limits={"partner": 4},
+            default_max_limit=5,
+            min_limit=1,
+            latency_tolerance=2.0,
+        )
+        for _ in range(50):
+            concurrency.record("partner", 0.01, success=False)
+
+        assert concurrency.limit("partner") == 1
+        assert queue.capacity("partner") == 1
+        assert concurrency.limit("orders") == 5
+
+        item = TaskItem("partner", Message(topic="partner", payload={}))
+        queue.put_nowait(item)
+        with pytest.raises(asyncio.QueueFull):
+            queue.put_nowait(item)
+
+        # 在途数达到上限时不再取出
+        queue.get_nowait()
+        queue.put_nowait(item)
+        with pytest.raises(asyncio.QueueEmpty):
+            queue.get_nowait()
@@ -6,6 +6,7 @@ import pytest
 from pydantic import ValidationError
 
 from mx_rmq.config import MQConfig
+from mx_rmq.log_config import LogSampler
 
 
 class TestMQConfig:
@@ -279,6 +280,62 @@ class TestMQConfig:
         with pytest.raises(ValidationError):
             MQConfig(batch_size=1001)
 
+    def test_delay_bucket_validation(self):
+        """测试延时分桶配置验证"""
+        # 默认关闭分桶
+        assert MQConfig().delay_bucket_horizon == 0
+
+        config = MQConfig(delay_bucket_horizon=7200, delay_bucket_size=600)
+        assert config.delay_bucket_horizon == 7200
+        assert config.delay_bucket_size == 600
+
+        # 关闭分桶时不限制桶跨度
+        config = MQConfig(delay_bucket_horizon=0, delay_bucket_size=86400)
+        assert config.delay_bucket_horizon == 0
+
+        # 桶跨度不能大于近期窗口
+        with pytest.raises(ValidationError):
+            MQConfig(delay_bucket_horizon=600, delay_bucket_size=3600)
+
+        with pytest.raises(ValidationError):
+            MQConfig(delay_bucket_size=59)
+
+    def test_delay_wakeup_mode_validation(self):
+        """测试延时调度唤醒方式验证"""
+        assert MQConfig().delay_wakeup_mode == "pubsub"
+        assert MQConfig(delay_wakeup_mode="BLOCKING").delay_wakeup_mode == "blocking"
+
+        with pytest.raises(ValidationError):
+            MQConfig(delay_wakeup_mode="polling")
+
+    def test_priority_dequeue_mode_validation(self):
+        """测试优先级出队方式验证"""
+        assert MQConfig().priority_dequeue_mode == "strict"
+        assert MQConfig(priority_dequeue_mode="weighted").priority_dequeue_mode == "weighted"
+        assert MQConfig(priority_dequeue_mode="STRICT").priority_dequeue_mode == "strict"
+
+        with pytest.raises(ValidationError):
+            MQConfig(priority_dequeue_mode="fifo")
+
+    def test_dispatch_mode_validation(self):
+        """测试分发方式验证"""
+        assert MQConfig().dispatch_mode == "per_topic"
+        assert MQConfig(dispatch_mode="Multiplexed").dispatch_mode == "multiplexed"
+
+        with pytest.raises(ValidationError):
+            MQConfig(dispatch_mode="round_robin")
+
+    def test_log_sample_rates_validation(self):
+        """测试日志采样事件名称和采样率验证"""
+        assert MQConfig(log_sample_rates={"produce": 100}).log_sample_rates == {
+            "produce": 100
+        }
+
+        with pytest.raises(ValidationError):
+            MQConfig(log_sample_rates={"dispatch": 10})
+        with pytest.raises(ValidationError):
+            MQConfig(log_sample_rates={"produce": 0})
+
     def test_config_from_dict(self):
         """测试从字典创建配置"""
         config_dict = {
@@ -295,4 +352,18 @@ class TestMQConfig:
         assert config.queue_prefix == "production"
         assert config.max_workers == 10
         assert config.task_queue_size == 20
-        assert config.handler_timeout == 90.0
\ No newline at end of file
+        assert config.handler_timeout == 90.0
+
+
+class TestLogSampler:
+    """逐条消息日志采样器测试"""
+
+    def test_sample_one_in_n(self):
+        """测试每N次记录1次，未配置的事件全部记录"""
+        sampler = LogSampler({"produce": 3, "retry": 1})
+
+        assert [sampler.should_log("produce") for _ in range(7)] == [
+            True, False, False, True, False, False, True
+        ]
+        assert all(sampler.should_log("retry") for _ in range(3))
+        assert all(sampler.should_log("complete") for _ in range(3))
@@ -130,4 +130,18 @@ class TestConnectionPoolValidation:
         assert "需要至少11个连接" in error_msg
         assert "3个topic + 8个预留" in error_msg
         assert "redis_max_connections配置至11或更高" in error_msg
-        assert "建议配置：redis_max_connections = 16" in error_msg
\ No newline at end of file
+        assert "建议配置：redis_max_connections = 16" in error_msg
+
+    def test_multiplexed_dispatch_uses_single_connection(self):
+        """测试multiplexed分发模式下连接需求与topic数量无关"""
+        config = MQConfig(redis_max_connections=9, dispatch_mode="multiplexed")
+        queue = RedisMessageQueue(config)
+
+        handlers = {f"topic{i}": (lambda payload: payload) for i in range(50)}
+        queue._context = type('MockContext', (), {'handlers': handlers})() # type: ignore
+
+        # 50个topic共用1个分发连接 + 8个预留 = 9个连接
+        try:
+            queue._validate_connection_pool_size()
+        except ValueError:
+            pytest.fail("multiplexed模式下不应该按topic数量计算连接")
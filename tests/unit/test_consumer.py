@@ -9,6 +9,7 @@ from unittest.mock import AsyncMock, MagicMock, patch
 from mx_rmq.core.consumer import ConsumerService
 from mx_rmq.core.context import QueueContext
 from mx_rmq.core.dispatch import TaskItem
+from mx_rmq.core.fair_queue import FairTaskQueue
 from mx_rmq.message import Message, MessagePriority
 
 
@@ -252,4 +253,125 @@ class TestConsumerService:
         
         assert task_item.topic == "test_topic"
         assert task_item.message == message
-        assert task_item.message.priority == MessagePriority.HIGH
\ No newline at end of file
+        assert task_item.message.priority == MessagePriority.HIGH
+
+class TestPriorityLanes:
+    """优先级通道测试"""
+
+    def _make_context(self, **config_kwargs) -> QueueContext:
+        from mx_rmq.config import MQConfig
+
+        return QueueContext(
+            MQConfig(queue_prefix="app", **config_kwargs), MagicMock(), {}
+        )
+
+    def test_lane_keys(self):
+        """测试默认优先级沿用pending队列，其余使用带等级后缀的通道"""
+        context = self._make_context()
+
+        assert context.get_priority_lane_key("orders", 5) == "app:orders:pending"
+        assert context.get_priority_lane_key("orders", 8) == "app:orders:pending:8"
+
+        lane_keys = context.get_priority_lane_keys("orders")
+        assert len(lane_keys) == 10
+        assert lane_keys[0] == "app:orders:pending:9"
+        assert lane_keys[-1] == "app:orders:pending:0"
+
+        assert context.get_priority_lane_arg(5) == ""
+        assert context.get_priority_lane_arg(2) == "2"
+
+    @pytest.mark.asyncio
+    async def test_fetch_waits_for_signal_when_lanes_empty(self):
+        """测试所有通道为空时阻塞等待唤醒信号后重试"""
+        from mx_rmq.core.dispatch import DispatchService
+
+        context = self._make_context(priority_dequeue_mode="strict")
+        dispatch_script = AsyncMock(side_effect=[None, "msg-1"])
+        context.lua_scripts = {"dispatch_message": dispatch_script}
+        context.redis.blpop = AsyncMock(return_value=["app:orders:signal", "1"])
+
+        service = DispatchService(context, asyncio.Queue())
+        message_id = await service._fetch_message(
+            "orders", "app:orders:pending", "app:orders:processing"
+        )
+
+        assert message_id == "msg-1"
+        context.redis.blpop.assert_called_once()
+        keys = dispatch_script.call_args[1]["keys"]
+        assert keys[:2] == ["app:orders:processing", "app:orders:signal"]
+        assert dispatch_script.call_args[1]["args"][0] == "strict"
+
+    @pytest.mark.asyncio
+    async def test_multiplexed_dispatch_single_blocking_call(self):
+        """测试复用分发用一次阻塞调用等待所有topic，并只从被唤醒的topic取消息"""
+        from mx_rmq.core.dispatch import DispatchService
+
+        context = self._make_context()
+        context.handlers = {"orders": MagicMock(), "emails": MagicMock()}
+        context.lua_scripts = {
+            "dispatch_message": AsyncMock(side_effect=["msg-1", "msg-2", None])
+        }
+
+        async def blpop(keys, timeout):
+            # 只运行一轮
+            context.running = False
+            return ["app:emails:signal", "1"]
+
+        context.redis.blpop = AsyncMock(side_effect=blpop)
+        context.running = True
+
+        service = DispatchService(context, FairTaskQueue(maxsize=10))
+        service._dispatch_fetched_message = AsyncMock(return_value=True)  # type: ignore
+        await service.dispatch_multiplexed()
+
+        waited_keys = context.redis.blpop.call_args[0][0]
+        assert sorted(waited_keys) == ["app:emails:signal", "app:orders:signal"]
+        dispatched = service._dispatch_fetched_message.call_args_list
+        assert [call.args[:2] for call in dispatched] == [
+            ("msg-1", "emails"),
+            ("msg-2", "emails"),
+        ]
+        assert dispatched[0].args[2] == "app:emails:processing"
+
+    @pytest.mark.asyncio
+    async def test_multiplexed_dispatch_parks_full_topic(self):
+        """测试复用分发时本地子队列已满的topic被暂停，不阻塞其他topic"""
+        from mx_rmq.core.dispatch import PARKED_RECHECK_SECONDS, DispatchService
+
+        context = self._make_context(topic_max_inflight={"slow": 1})
+        context.handlers = {"slow": MagicMock(), "fast": MagicMock()}
+        dispatch_script = AsyncMock(side_effect=["msg-1", None])
+        context.lua_scripts = {"dispatch_message": dispatch_script}
+        context.redis.zadd = AsyncMock()
+        signals = [["app:slow:signal", "1"], ["app:fast:signal", "1"]]
+
+        async def blpop(keys, timeout):
+            if len(signals) == 1:
+                # 只运行两轮
+                context.running = False
+            return signals.pop(0)
+
+        context.redis.blpop = AsyncMock(side_effect=blpop)
+        context.running = True
+
+        task_queue = FairTaskQueue(
+            maxsize=10, max_inflight={"slow": 1}, capacities={"slow": 1}
+        )
+        task_queue.put_nowait(TaskItem("slow", Message(topic="slow", payload={})))
+        service = DispatchService(context, task_queue)
+        service._parse_message = AsyncMock(  # type: ignore
+            side_effect=lambda message_id, topic: Message(topic=topic, payload={})
+        )
+        await asyncio.wait_for(service.dispatch_multiplexed(), timeout=1)
+
+        # 已满的slow没有从Redis移动消息，fast正常分发
+        moved_keys = [call.kwargs["keys"][0] for call in dispatch_script.call_args_list]
+        assert moved_keys == ["app:fast:processing", "app:fast:processing"]
+        assert task_queue.topic_qsize("fast") == 1
+        assert service._parked == {"slow"}
+        assert service._multiplexed_wait_timeout() == PARKED_RECHECK_SECONDS
+
+        # 子队列腾出空间后恢复分发
+        task_queue.get_nowait("slow")
+        assert service._pop_unparked_topics() == ["slow"]
+        assert service._parked == set()
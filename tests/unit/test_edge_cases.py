@@ -10,6 +10,7 @@ from unittest.mock import patch, MagicMock, AsyncMock
 from mx_rmq import RedisMessageQueue, MQConfig
 from mx_rmq.message import Message, MessagePriority, MessageStatus
 from mx_rmq.monitoring.metrics import MetricsCollector
+from mx_rmq.monitoring.histogram import BUCKET_COUNT
 
 
 class TestBoundaryConditions:
@@ -220,7 +221,7 @@ class TestExceptionScenarios:
         
         # 验证内存使用受限
         processing_times = collector._processing_times[topic]
-        assert len(processing_times) <= 1000  # 应该有上限
+        assert len(processing_times.counts) == BUCKET_COUNT  # 固定分桶数
         
         # 验证统计仍然正确
         metrics = collector.get_processing_metrics(topic)
@@ -338,7 +339,7 @@ class TestResourceExhaustion:
         
         # 验证内存使用被控制
         processing_times = collector._processing_times[topic]
-        assert len(processing_times) <= 1000
+        assert len(processing_times.counts) == BUCKET_COUNT
         
         # 但总计数应该是准确的
         metrics = collector.get_processing_metrics(topic)
@@ -0,0 +1,140 @@
+"""
+本地公平任务队列测试
+"""
+
+import asyncio
+
+import pytest
+
+from mx_rmq import MQConfig
+from mx_rmq.core.dispatch import TaskItem
+from mx_rmq.core.fair_queue import FairTaskQueue
+from mx_rmq.message import Message
+
+
+def _item(topic: str, index: int = 0) -> TaskItem:
+    return TaskItem(topic, Message(topic=topic, payload={"i": index}))
+
+
+def _drain(queue: FairTaskQueue) -> list[str]:
+    topics = []
+    while not queue.empty():
+        item = queue.get_nowait()
+        topics.append(item.topic)
+        queue.task_done(item.topic)
+    return topics
+
+
+class TestFairTaskQueue:
+    """公平任务队列测试"""
+
+    def test_round_robin_across_topics(self):
+        """测试洪峰主题不会挤占其他主题"""
+        queue = FairTaskQueue(maxsize=10)
+        for i in range(6):
+            queue.put_nowait(_item("batch", i))
+        queue.put_nowait(_item("rpc"))
+
+        assert _drain(queue)[:3] == ["batch", "rpc", "batch"]
+
+    def test_weighted_deficit_round_robin(self):
+        """测试按权重分配取出比例"""
+        queue = FairTaskQueue(maxsize=10, weights={"payments": 3})
+        for i in range(6):
+            queue.put_nowait(_item("payments", i))
+            queue.put_nowait(_item("reports", i))
+
+        assert _drain(queue)[:8] == ["payments"] * 3 + ["reports"] + ["payments"] * 3 + [
+            "reports"
+        ]
+
+    def test_per_topic_capacity(self):
+        """测试子队列容量按主题独立计算"""
+        queue = FairTaskQueue(maxsize=2)
+        queue.put_nowait(_item("batch"))
+        queue.put_nowait(_item("batch"))
+
+        with pytest.raises(asyncio.QueueFull):
+            queue.put_nowait(_item("batch"))
+        queue.put_nowait(_item("rpc"))
+        assert queue.qsize() == 3
+
+    def test_max_inflight_limits_topic(self):
+        """测试主题在途数达到上限后暂停取出，释放后恢复"""
+        queue = FairTaskQueue(maxsize=10, max_inflight={"reports": 1})
+        queue.put_nowait(_item("reports", 1))
+        queue.put_nowait(_item("reports", 2))
+
+        assert queue.get_nowait().topic == "reports"
+        with pytest.raises(asyncio.QueueEmpty):
+            queue.get_nowait()
+
+        queue.task_done("reports")
+        assert queue.get_nowait().message.payload == {"i": 2}
+
+    def test_dedicated_topic_only_served_by_own_workers(self):
+        """测试专属主题不参与共享轮询，只能被专属工作协程取出"""
+        queue = FairTaskQueue(maxsize=10, dedicated={"partner"})
+        queue.put_nowait(_item("partner"))
+        queue.put_nowait(_item("orders"))
+
+        assert queue.get_nowait().topic == "orders"
+        with pytest.raises(asyncio.QueueEmpty):
+            queue.get_nowait()
+        assert queue.get_nowait("partner").topic == "partner"
+
+    def test_per_topic_prefetch(self):
+        """测试主题预取数量覆盖默认子队列容量"""
+        queue = FairTaskQueue(maxsize=2, capacities={"bulk": 3})
+        for i in range(3):
+            queue.put_nowait(_item("bulk", i))
+
+        assert queue.full("bulk")
+        assert queue.capacity("orders") == 2
+
+    def test_topic_limit_capped_by_configured_prefetch(self):
+        """测试调整在途上限时预取数量不超过显式配置的值"""
+        queue = FairTaskQueue(maxsize=2, capacities={"bulk": 3})
+
+        queue.set_topic_limit("bulk", 10)
+        queue.set_topic_limit("orders", 10)
+
+        assert queue.capacity("bulk") == 3
+        assert queue.capacity("orders") == 10
+
+        queue.set_topic_limit("bulk", 1)
+        assert queue.capacity("bulk") == 1
+
+    @pytest.mark.asyncio
+    async def test_blocked_put_and_get_are_woken(self):
+        """测试阻塞的put/get在条件满足时被唤醒"""
+        queue = FairTaskQueue(maxsize=1)
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+
+        await queue.put(_item("a", 1))
+        assert (await asyncio.wait_for(getter, 1)).message.payload == {"i": 1}
+
+        await queue.put(_item("a", 2))
+        putter = asyncio.create_task(queue.put(_item("a", 3)))
+        await asyncio.sleep(0)
+        assert not putter.done()
+
+        queue.get_nowait()
+        await asyncio.wait_for(putter, 1)
+        assert queue.topic_qsize("a") == 1
+
+
+def test_topic_limits_validation():
+    """测试主题权重和在途上限必须为正整数"""
+    config = MQConfig(topic_weights={"a": 3}, topic_max_inflight={"b": 2})
+    assert config.topic_weights == {"a": 3}
+
+    with pytest.raises(ValueError):
+        MQConfig(topic_weights={"a": 0})
+    with pytest.raises(ValueError):
+        MQConfig(topic_max_inflight={"b": -1})
+    with pytest.raises(ValueError):
+        MQConfig(topic_workers={"c": 0})
+    with pytest.raises(ValueError):
+        MQConfig(topic_prefetch={"d": 0})
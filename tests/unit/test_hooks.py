@@ -0,0 +1,162 @@
+"""
+调用剖析钩子测试
+"""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from mx_rmq import CallHook, MQConfig, Message, RedisMessageQueue, SlowCallHook
+from mx_rmq.core.consumer import ConsumerService
+from mx_rmq.core.context import QueueContext
+from mx_rmq.core.dispatch import TaskItem
+from mx_rmq.hooks import CallInfo
+
+
+class RecordingHook(CallHook):
+    """记录回调顺序的钩子"""
+
+    def __init__(self) -> None:
+        self.events: list[tuple[str, str, str, str | None]] = []
+        self.calls: list[CallInfo] = []
+
+    def before(self, call: CallInfo) -> None:
+        self.events.append(("before", call.kind, call.name, call.topic))
+
+    def after(self, call: CallInfo) -> None:
+        self.events.append(("after", call.kind, call.name, call.topic))
+        self.calls.append(call)
+
+
+class TestContextHooks:
+    """上下文钩子注册与回调测试"""
+
+    def test_scripts_unwrapped_without_hooks(self):
+        """测试未注册钩子时脚本保持原对象，移除最后一个钩子后恢复"""
+        script = AsyncMock()
+        context = QueueContext(MQConfig(), MagicMock(), {"complete_message": script})
+        assert context.lua_scripts["complete_message"] is script
+
+        hook = RecordingHook()
+        context.add_hook(hook)
+        context.add_hook(hook)
+        assert context.hooks == (hook,)
+        assert context.lua_scripts["complete_message"] is not script
+
+        context.remove_hook(hook)
+        assert context.hooks == ()
+        assert context.lua_scripts["complete_message"] is script
+
+    @pytest.mark.asyncio
+    async def test_script_call_hooked(self):
+        """测试脚本调用前后回调并记录耗时"""
+        script = AsyncMock(return_value=1)
+        context = QueueContext(MQConfig(), MagicMock(), {"retry_message": script})
+        hook = RecordingHook()
+        context.add_hook(hook)
+
+        result = await context.lua_scripts["retry_message"](keys=["k"], args=[])
+
+        assert result == 1
+        script.assert_awaited_once_with(keys=["k"], args=[])
+        assert hook.events == [
+            ("before", "script", "retry_message", None),
+            ("after", "script", "retry_message", None),
+        ]
+        assert hook.calls[0].elapsed >= 0
+        assert hook.calls[0].error is None
+
+    @pytest.mark.asyncio
+    async def test_observe_records_error_and_reraises(self):
+        """测试调用异常记录到调用信息并原样抛出"""
+        context = QueueContext(MQConfig(), MagicMock(), {})
+        hook = RecordingHook()
+        context.add_hook(hook)
+
+        zadd = AsyncMock(side_effect=ConnectionError())
+        with pytest.raises(ConnectionError):
+            await context.observe("redis", "zadd", zadd())
+
+        assert isinstance(hook.calls[0].error, ConnectionError)
+
+    @pytest.mark.asyncio
+    async def test_hook_failure_does_not_break_call(self):
+        """测试钩子回调抛出异常时不影响被观测的调用"""
+
+        class BrokenHook(CallHook):
+            def before(self, call: CallInfo) -> None:
+                raise RuntimeError("boom")
+
+            def after(self, call: CallInfo) -> None:
+                raise RuntimeError("boom")
+
+        context = QueueContext(MQConfig(), MagicMock(), {})
+        context.add_hook(BrokenHook())
+
+        assert await context.observe("redis", "lrem", AsyncMock(return_value=1)()) == 1
+
+    @pytest.mark.asyncio
+    async def test_handler_call_hooked(self):
+        """测试处理器调用带主题回调，处理器内的脚本调用同样被观测"""
+        complete = AsyncMock()
+        context = QueueContext(MQConfig(), MagicMock(), {"complete_message": complete})
+
+        async def handle_order(payload):
+            return None
+
+        context.register_handler("orders", handle_order)
+        hook = RecordingHook()
+        context.add_hook(hook)
+
+        await ConsumerService(context, MagicMock())._handle_task(
+            TaskItem("orders", Message(topic="orders", payload={}))
+        )
+
+        assert hook.events == [
+            ("before", "handler", "handle_order", "orders"),
+            ("after", "handler", "handle_order", "orders"),
+            ("before", "script", "complete_message", None),
+            ("after", "script", "complete_message", None),
+        ]
+
+
+class TestSlowCallHook:
+    """慢调用日志钩子测试"""
+
+    def test_threshold_and_kinds(self, monkeypatch):
+        """测试只记录超过阈值且属于指定类型的调用"""
+        from mx_rmq import hooks
+
+        warning = MagicMock()
+        monkeypatch.setattr(hooks.logger, "warning", warning)
+        hook = SlowCallHook(threshold=0.005, kinds=["script"])
+
+        fast = CallInfo("script", "complete_message")
+        fast.elapsed = 0.001
+        slow_handler = CallInfo("handler", "handle_order", "orders")
+        slow_handler.elapsed = 0.01
+        slow_script = CallInfo("script", "dispatch_message")
+        slow_script.elapsed = 0.01
+        for call in (fast, slow_handler, slow_script):
+            hook.after(call)
+
+        warning.assert_called_once()
+        assert "dispatch_message" in warning.call_args[0][0]
+
+
+class TestQueueHooks:
+    """队列级钩子注册测试"""
+
+    @pytest.mark.asyncio
+    async def test_hooks_registered_before_initialize(self):
+        """测试初始化前注册的钩子在创建上下文时挂载"""
+        queue = RedisMessageQueue()
+        hook = RecordingHook()
+        queue.add_hook(hook)
+        queue._connection_manager.redis = MagicMock()
+
+        await queue._initialize_services({"produce_normal": AsyncMock()})
+
+        assert queue._context.hooks == (hook,)
+        queue.remove_hook(hook)
+        assert queue._context.hooks == ()
@@ -42,8 +42,9 @@ class TestMessageLifecycleService:
         mock_script.assert_called_once()
         call_args = mock_script.call_args
         
-        assert len(call_args[1]['keys']) == 3  # 3个键
-        assert call_args[1]['args'] == [message_id]
+        assert len(call_args[1]['keys']) == 5  # 5个键，无回复时回复队列为空串
+        assert call_args[1]['keys'][3] == ""
+        assert call_args[1]['args'][:4] == [message_id, "", "", topic]
         
         # 验证上下文方法被调用
         mock_context.get_global_key.assert_called()
@@ -250,6 +251,91 @@ class TestMessageLifecycleService:
         message.meta.retry_count = 10
         assert message.get_retry_delay() == 300
     
+    @pytest.mark.asyncio
+    async def test_retry_message_sub_second_delay(self):
+        """测试亚秒级重试延迟以毫秒传给Lua脚本"""
+        mock_context = MagicMock(spec=QueueContext)
+        mock_script = AsyncMock()
+        mock_context.lua_scripts = {"retry_message": mock_script}
+        mock_context.config = MQConfig()
+        mock_context.get_global_key = MagicMock(return_value="test:global:key")
+        mock_context.get_global_topic_key = MagicMock(return_value="test:topic:key")
+        mock_context.get_delay_bucket_args = MagicMock(return_value=[0, 0, ""])
+
+        service = MessageLifecycleService(mock_context)
+
+        message = Message(topic="retry_test", payload={"test": "retry"})
+        message.meta.retry_delays = [0.25, 0.9]
+        message.meta.retry_count = 1
+
+        await service.retry_message(message, "retry_test")
+
+        args = mock_script.call_args[1]["args"]
+        assert args[2] == 250
+
+    @pytest.mark.asyncio
+    async def test_retry_message_passes_wakeup_target(self):
+        """测试重试时传入唤醒目标和唤醒方式，由脚本在成为最早任务时唤醒调度器"""
+        mock_context = MagicMock(spec=QueueContext)
+        mock_script = AsyncMock()
+        mock_context.lua_scripts = {"retry_message": mock_script}
+        mock_context.config = MQConfig(delay_wakeup_mode="blocking")
+        mock_context.get_global_key = MagicMock(return_value="test:global:key")
+        mock_context.get_global_topic_key = MagicMock(return_value="test:topic:key")
+        mock_context.get_delay_bucket_args = MagicMock(return_value=[0, 0, ""])
+        mock_context.get_delay_wakeup_key = MagicMock(return_value="test:wakeup")
+
+        service = MessageLifecycleService(mock_context)
+
+        message = Message(topic="retry_test", payload={"test": "retry"})
+        await service.retry_message(message, "retry_test")
+
+        assert mock_script.call_args[1]["keys"][6] == "test:wakeup"
+        assert mock_script.call_args[1]["args"][8] == "blocking"
+
+    @pytest.mark.asyncio
+    async def test_expired_retry_uses_unprefixed_topic(self):
+        """测试超时重试按不带前缀的主题名计数，而不是带前缀的队列名"""
+        mock_context = MagicMock(spec=QueueContext)
+        mock_script = AsyncMock()
+        mock_context.lua_scripts = {"retry_message": mock_script}
+        mock_context.config = MQConfig(queue_prefix="app")
+        mock_context.get_global_key = MagicMock(return_value="test:global:key")
+        mock_context.get_global_topic_key = MagicMock(return_value="test:topic:key")
+        mock_context.get_delay_bucket_args = MagicMock(return_value=[0, 0, ""])
+        mock_context.metrics = MagicMock()
+        mock_context.tracer = MagicMock()
+
+        service = MessageLifecycleService(mock_context)
+
+        message = Message(topic="orders", payload={"test": "retry"})
+        await service.handle_expired_message(message, "app:orders")
+
+        assert mock_script.call_args[1]["args"][3] == "orders"
+        mock_context.metrics.record_message_retried.assert_called_once_with("orders")
+        assert mock_context.tracer.span.call_args[0][0] == "orders retry"
+
+    @pytest.mark.asyncio
+    async def test_retry_message_expire_at_uses_ttl_in_ms(self):
+        """测试重试后的过期时间按毫秒累加 message_ttl"""
+        mock_context = MagicMock(spec=QueueContext)
+        mock_script = AsyncMock()
+        mock_context.lua_scripts = {"retry_message": mock_script}
+        mock_context.config = MQConfig(message_ttl=3600)
+        mock_context.get_global_key = MagicMock(return_value="test:global:key")
+        mock_context.get_global_topic_key = MagicMock(return_value="test:topic:key")
+        mock_context.get_delay_bucket_args = MagicMock(return_value=[0, 0, ""])
+
+        service = MessageLifecycleService(mock_context)
+
+        message = Message(topic="retry_test", payload={"test": "retry"})
+        message.meta.retry_delays = [1]
+
+        await service.retry_message(message, "retry_test")
+
+        assert message.meta.scheduled_at is not None
+        assert message.meta.expire_at == message.meta.scheduled_at + 3600 * 1000
+
     def test_retry_delay_empty_config(self):
         """测试空重试延迟配置"""
         message = Message(
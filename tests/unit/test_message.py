@@ -7,7 +7,16 @@ import uuid
 import pytest
 from unittest.mock import patch
 
-from mx_rmq.message import Message, MessageMeta, MessageStatus, MessagePriority
+from pydantic import ValidationError
+
+from mx_rmq.message import (
+    DEFAULT_PRIORITY_LEVEL,
+    Message,
+    MessageMeta,
+    MessagePriority,
+    MessageStatus,
+    get_priority_level,
+)
 
 
 class TestMessageStatus:
@@ -32,6 +41,32 @@ class TestMessagePriority:
         assert MessagePriority.NORMAL == "normal"
         assert MessagePriority.HIGH == "high"
 
+    def test_priority_levels(self):
+        """测试枚举优先级与数值优先级的等级映射"""
+        assert get_priority_level(MessagePriority.LOW) == 2
+        assert get_priority_level(MessagePriority.NORMAL) == DEFAULT_PRIORITY_LEVEL
+        assert get_priority_level(MessagePriority.HIGH) == 8
+        assert get_priority_level(0) == 0
+        assert get_priority_level(9) == 9
+
+        with pytest.raises(ValueError):
+            get_priority_level(10)
+
+    def test_numeric_priority_round_trip(self):
+        """测试数值优先级的校验与序列化"""
+        message = Message(topic="t", payload={}, priority=7)
+        restored = Message.model_validate_json(message.model_dump_json())
+        assert restored.priority == 7
+        assert restored.get_priority_level() == 7
+
+        restored = Message.model_validate_json(
+            Message(topic="t", payload={}, priority=MessagePriority.HIGH).model_dump_json()
+        )
+        assert restored.priority == MessagePriority.HIGH
+
+        with pytest.raises(ValidationError):
+            Message(topic="t", payload={}, priority=-1)
+
 
 class TestMessageMeta:
     """消息元数据测试"""
@@ -247,6 +282,35 @@ class TestMessage:
         
         assert message.can_retry() is False
     
+    def test_get_ready_at(self):
+        """测试可投递时间取创建、计划投递和死信重试中最晚的一个"""
+        message = Message(topic="t", payload={})
+        assert message.get_ready_at() == message.meta.created_at
+
+        message.meta.scheduled_at = message.meta.created_at + 5000
+        assert message.get_ready_at() == message.meta.scheduled_at
+
+        message.meta.retried_from_dlq_at = message.meta.created_at + 9000
+        assert message.get_ready_at() == message.meta.retried_from_dlq_at
+
+    def test_from_stored_fanout_delivery(self):
+        """测试广播分组投递共享原始消息体时改写投递ID和分组主题"""
+        message = Message(id="m1", topic="cache", payload={"k": 1})
+        stored = message.model_dump_json(by_alias=True)
+
+        delivery = Message.from_stored(stored, "m1@svc-a")
+        assert delivery.id == "m1@svc-a"
+        assert delivery.topic == "cache@svc-a"
+        assert delivery.payload == {"k": 1}
+
+        # 重试后分组投递拥有独立消息体，按原样解析
+        retried = Message.from_stored(delivery.model_dump_json(by_alias=True), "m1@svc-a")
+        assert retried.id == "m1@svc-a"
+        assert retried.topic == "cache@svc-a"
+
+        # 普通消息不受影响
+        assert Message.from_stored(stored, "m1").topic == "cache"
+
     def test_is_expired_false(self):
         """测试消息未过期"""
         future_time = int(time.time() * 1000) + 3600000  # 1小时后
@@ -7,7 +7,9 @@ import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from collections import deque
 
+from mx_rmq.monitoring.histogram import BUCKET_COUNT, LatencyHistogram
 from mx_rmq.monitoring.metrics import (
+    PROCESSING_SAMPLE_SIZE,
     MetricsCollector, 
     QueueMetrics, 
     ProcessingMetrics
@@ -336,20 +338,25 @@ class TestMetricsCollector:
         assert processing_metrics.max_processing_time == 5.0  # 最大值
         assert processing_metrics.min_processing_time == 1.0  # 最小值
     
-    def test_processing_time_window_limit(self):
-        """测试处理时间窗口限制"""
+    def test_processing_time_histogram(self):
+        """测试处理时间直方图固定内存并保留全部样本的分布"""
         collector = MetricsCollector()
         topic = "test_topic"
-        
-        # 记录超过窗口大小的处理时间
-        for i in range(1200):  # 超过默认1000的窗口大小
-            collector.record_message_completed(topic, processing_time=float(i))
-        
-        # 验证只保留最近的1000条记录
-        processing_times = collector._processing_times[topic]
-        assert len(processing_times) == 1000
-        assert processing_times[0] == 200.0  # 最旧的应该是200
-        assert processing_times[-1] == 1199.0  # 最新的应该是1199
+
+        for i in range(1, 1201):
+            collector.record_message_completed(topic, processing_time=i / 1000)
+
+        # 分桶数固定，与样本数无关
+        histogram = collector._processing_times[topic]
+        assert len(histogram.counts) == BUCKET_COUNT
+        assert histogram.count == 1200
+
+        metrics = collector.get_processing_metrics(topic)
+        assert metrics.min_processing_time == 0.001
+        assert metrics.max_processing_time == 1.2
+        assert metrics.p50_processing_time == pytest.approx(0.6, rel=0.03)
+        assert metrics.p99_processing_time == pytest.approx(1.188, rel=0.03)
+        assert metrics.p999_processing_time == pytest.approx(1.199, rel=0.03)
     
     def test_metrics_summary(self):
         """测试指标摘要"""
@@ -386,4 +393,359 @@ class TestMetricsCollector:
         assert processing_metrics.total_processed == 2  # 1成功 + 1失败
         assert processing_metrics.success_count == 1
         assert processing_metrics.error_count == 1
-        assert processing_metrics.retry_count == 1
\ No newline at end of file
+        assert processing_metrics.retry_count == 1
+
+class TestLatencyHistogram:
+    """对数分桶延迟直方图测试"""
+
+    def test_quantile_relative_error(self):
+        """测试分位数相对误差受分桶精度约束"""
+        histogram = LatencyHistogram()
+        for i in range(1, 10001):
+            histogram.record(i / 10000)
+
+        for q in (0.5, 0.9, 0.99, 0.999):
+            assert histogram.quantile(q) == pytest.approx(q, rel=0.02)
+        assert LatencyHistogram().quantile(0.5) == 0.0
+
+    def test_merge_and_rebuild(self):
+        """测试合并与由分桶计数重建的结果一致"""
+        first, second = LatencyHistogram(), LatencyHistogram()
+        for i in range(100):
+            first.record(0.01)
+            second.record(1.0)
+
+        merged = LatencyHistogram()
+        merged.merge(first)
+        merged.merge(second)
+        rebuilt = LatencyHistogram.from_buckets(
+            {**first.nonzero_buckets(), **second.nonzero_buckets()}, 101.0
+        )
+
+        assert merged.count == rebuilt.count == 200
+        assert merged.quantile(0.25) == pytest.approx(0.01, rel=0.02)
+        assert rebuilt.quantile(0.75) == pytest.approx(1.0, rel=0.02)
+        assert rebuilt.mean == pytest.approx(merged.mean)
+
+    def test_record_summary(self):
+        """测试按汇总值记录时数量、总和与极值与逐个记录一致"""
+        histogram = LatencyHistogram()
+        histogram.record_summary(4, 0.2, 0.01, 0.12)
+
+        assert histogram.count == 4
+        assert histogram.sum == pytest.approx(0.2)
+        assert histogram.min == 0.01
+        assert histogram.max == 0.12
+        assert histogram.quantile(0.5) == pytest.approx(0.035, rel=0.02)
+
+        single = LatencyHistogram()
+        single.record_summary(1, 0.03, 0.03, 0.03)
+        single.record_summary(0, 0.0, 0.0, 0.0)
+        assert single.count == 1
+        assert single.max == 0.03
+
+    @pytest.mark.asyncio
+    async def test_push_latency_histograms_writes_deltas(self):
+        """测试推送只写入自上次推送以来的分桶增量"""
+        pipe = MagicMock()
+        pipe.execute = AsyncMock()
+        pipe.__aenter__ = AsyncMock(return_value=pipe)
+        pipe.__aexit__ = AsyncMock(return_value=False)
+        redis = MagicMock()
+        redis.pipeline.return_value = pipe
+        collector = MetricsCollector(redis, "app")
+
+        collector.record_message_completed("orders", processing_time=0.5)
+        collector.record_message_completed("orders", processing_time=0.5)
+        assert await collector.push_latency_histograms() == 2
+        pipe.hincrby.assert_called_once()
+        key, field, delta = pipe.hincrby.call_args[0]
+        assert key == "app:metrics"
+        assert field.startswith("latency:orders:")
+        assert delta == 2
+
+        # 没有新样本时不访问Redis
+        pipe.execute.reset_mock()
+        assert await collector.push_latency_histograms() == 0
+        pipe.execute.assert_not_called()
+
+
+class TestStageLatency:
+    """端到端阶段延迟测试"""
+
+    def test_stage_latency_breakdown(self):
+        """测试各阶段分别记录，处理器阶段与处理时间共用直方图"""
+        collector = MetricsCollector()
+        collector.record_stage_latency("orders", "queue_lag", 0.2)
+        collector.record_stage_latency("orders", "queue_lag", -0.1)
+        collector.record_stage_latency("orders", "ack", 0.003)
+        collector.record_message_completed("orders", processing_time=0.05)
+
+        latencies = collector.get_latency_metrics("orders")
+
+        assert list(latencies) == ["queue_lag", "handler", "ack"]
+        assert latencies["queue_lag"].count == 2
+        assert latencies["queue_lag"].max == 0.2
+        assert latencies["handler"].p99 == 0.05
+
+        text = collector.render_prometheus()
+        assert 'mx_rmq_stage_latency_seconds_count{topic="orders",stage="queue_lag"} 2' in text
+        assert 'mx_rmq_handler_duration_seconds_count{topic="orders"} 1' in text
+
+
+class TestBoundedCollection:
+    """有界开销的指标采集测试"""
+
+    @staticmethod
+    def _collector_with_pipeline(results: list) -> tuple[MetricsCollector, MagicMock]:
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(side_effect=results)
+        pipe.__aenter__ = AsyncMock(return_value=pipe)
+        pipe.__aexit__ = AsyncMock(return_value=False)
+        redis = MagicMock()
+        redis.pipeline.return_value = pipe
+        return MetricsCollector(redis, "app", processing_timeout=60), pipe
+
+    @pytest.mark.asyncio
+    async def test_error_metrics_read_maintained_counters(self):
+        """测试死信数读取维护的计数，不遍历死信队列"""
+        collector, pipe = self._collector_with_pipeline([[500000, ["7", None]]])
+
+        metrics = await collector.collect_error_metrics(["orders", "users"])
+
+        assert metrics == {
+            "error.orders.dlq_count": 7,
+            "error.users.dlq_count": 0,
+            "error.total_dlq": 500000,
+        }
+        pipe.hmget.assert_called_once_with(
+            "app:metrics", ["dead_lettered:orders", "dead_lettered:users"]
+        )
+        pipe.lrange.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_processing_metrics_sample_oldest(self):
+        """测试只采样最旧的处理中消息，由过期监控分数推算处理时长"""
+        now_ms = 1_700_000_000_000
+        collector, pipe = self._collector_with_pipeline(
+            [
+                [300, "newest", ["m2", "m1"]],
+                [[now_ms + 59_000, now_ms - 10_000, now_ms + 30_000]],
+            ]
+        )
+
+        with patch("time.time", return_value=now_ms / 1000):
+            metrics = await collector.collect_processing_metrics(["orders"])
+
+        pipe.lrange.assert_called_once_with(
+            "app:orders:processing", -PROCESSING_SAMPLE_SIZE, -1
+        )
+        assert metrics["processing.orders.count"] == 300
+        assert metrics["processing.orders.sampled"] == 2
+        assert metrics["processing.orders.max_time"] == 70_000
+        assert metrics["processing.orders.min_time"] == 1_000
+        assert metrics["processing.orders.stuck_count"] == 1
+
+
+class TestServerCounters:
+    """服务端计数器与吞吐率测试"""
+
+    @pytest.mark.asyncio
+    async def test_counter_metrics_single_hmget(self):
+        """测试累计计数一次 HMGET 读取"""
+        redis = MagicMock()
+        redis.hmget = AsyncMock(return_value=["12", "10", None, "1"])
+        collector = MetricsCollector(redis, "app")
+
+        metrics = await collector.collect_counter_metrics(["orders"])
+
+        redis.hmget.assert_called_once_with(
+            "app:metrics",
+            [
+                "produced:orders",
+                "completed:orders",
+                "retried:orders",
+                "dead_lettered:orders",
+            ],
+        )
+        assert metrics == {
+            "counter.orders.produced": 12,
+            "counter.orders.completed": 10,
+            "counter.orders.retried": 0,
+            "counter.orders.dead_lettered": 1,
+        }
+
+    @pytest.mark.asyncio
+    async def test_bucketed_throughput_reads_closed_minutes(self):
+        """测试开启分钟桶时只读取已结束的分钟桶"""
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(
+            return_value=[
+                {"completed:orders": "30", "produced:orders": "40"},
+                {"completed:orders": "10", "completed:users": "20"},
+            ]
+        )
+        pipe.__aenter__ = AsyncMock(return_value=pipe)
+        pipe.__aexit__ = AsyncMock(return_value=False)
+        redis = MagicMock()
+        redis.pipeline.return_value = pipe
+        collector = MetricsCollector(redis, "app", bucket_minutes=2)
+
+        with patch("time.time", return_value=600 * 60 + 30):
+            metrics = await collector.collect_throughput_metrics(window_seconds=300)
+
+        assert [c.args[0] for c in pipe.hgetall.call_args_list] == [
+            "app:metrics:599",
+            "app:metrics:598",
+        ]
+        assert metrics["throughput.orders.completed_per_minute"] == 20
+        assert metrics["throughput.orders.produced_per_minute"] == 20
+        assert metrics["throughput.users.completed_per_minute"] == 10
+        assert metrics["throughput.messages_per_minute"] == 30
+
+    @pytest.mark.asyncio
+    async def test_history_throughput_uses_completed_counters(self):
+        """测试未开启分钟桶时由累计完成数的差值计算速率"""
+        collector = MetricsCollector()
+        now_ms = int(time.time() * 1000)
+        collector.metrics_history = [
+            {"timestamp": now_ms - 120_000, "counter.orders.completed": 100},
+            {"timestamp": now_ms, "counter.orders.completed": 160},
+        ]
+
+        metrics = await collector.collect_throughput_metrics()
+
+        assert metrics["throughput.messages_per_minute"] == 30
+
+
+class TestRuntimeMonitor:
+    """运行时饱和度监控测试"""
+
+    def test_worker_busy_and_idle_time(self):
+        """测试消费者协程忙闲时间与利用率"""
+        from mx_rmq.monitoring.runtime import RuntimeMonitor
+
+        monitor = RuntimeMonitor()
+        with patch("time.monotonic", return_value=100.0):
+            stats = monitor.worker("consumer_0")
+        with patch("time.monotonic", return_value=101.0):
+            stats.begin()
+        with patch("time.monotonic", return_value=104.0):
+            stats.end()
+        with patch("time.monotonic", return_value=105.0):
+            stats.begin()
+        with patch("time.monotonic", return_value=110.0):
+            snapshot = monitor.snapshot()
+
+        worker = snapshot.workers["consumer_0"]
+        assert monitor.worker("consumer_0") is stats
+        assert worker.busy_seconds == 8.0
+        assert worker.idle_seconds == 2.0
+        assert worker.utilization == 0.8
+        assert worker.tasks == 1
+        assert worker.busy is True
+
+    @pytest.mark.asyncio
+    async def test_sampler_detects_blocked_event_loop(self):
+        """测试采样协程测量事件循环被阻塞的时间和本地队列长度"""
+        import asyncio
+
+        from mx_rmq.monitoring.runtime import RuntimeMonitor
+
+        monitor = RuntimeMonitor()
+        task_queue = MagicMock()
+        task_queue.qsize.side_effect = [3, 7]
+        samples = iter([True, True, False])
+        sampler = asyncio.create_task(
+            monitor.run(task_queue, 0.01, lambda: next(samples))
+        )
+        await asyncio.sleep(0)
+        # 同步阻塞事件循环，模拟阻塞的处理器
+        time.sleep(0.05)
+        await sampler
+
+        snapshot = monitor.snapshot()
+        assert snapshot.loop_lag_samples == 2
+        assert snapshot.loop_lag_max >= 0.03
+        assert snapshot.task_queue_size_last == 7
+        assert snapshot.task_queue_size_max == 7
+        assert snapshot.task_queue_size_avg == 5
+
+    def test_runtime_metrics_exported(self):
+        """测试运行时指标导出为 Prometheus 文本"""
+        collector = MetricsCollector()
+        collector.runtime.worker("consumer_0")
+        collector.runtime.record_dispatch_blocked("orders", 1.5)
+        collector.runtime.record_loop_lag(0.2)
+
+        text = collector.render_prometheus()
+
+        assert 'mx_rmq_dispatch_blocked_seconds_total{topic="orders"} 1.5' in text
+        assert 'mx_rmq_worker_busy_seconds_total{worker="consumer_0"} 0' in text
+        assert "mx_rmq_event_loop_lag_seconds_count 1" in text
+        assert "mx_rmq_task_queue_size 0" in text
+
+
+class TestPrometheusExport:
+    """Prometheus 指标导出测试"""
+
+    def test_render_prometheus(self):
+        """测试热路径计数和队列快照以文本格式导出"""
+        collector = MetricsCollector()
+        collector.record_message_produced("orders")
+        collector.record_message_consumed("orders")
+        collector.record_message_completed("orders", processing_time=0.5)
+        collector.record_message_failed("orders", "boom", processing_time=0.25)
+        collector.record_message_retried("orders")
+        collector.record_parse_error("orders")
+        collector.update_gauges({"orders.pending": 3, "dlq.count": 2, "bad": "x"})
+
+        text = collector.render_prometheus()
+
+        assert 'mx_rmq_messages_produced_total{topic="orders"} 1' in text
+        assert 'mx_rmq_messages_dispatched_total{topic="orders"} 1' in text
+        assert 'mx_rmq_messages_processed_total{topic="orders",result="error"} 1' in text
+        assert 'mx_rmq_messages_retried_total{topic="orders"} 1' in text
+        assert 'mx_rmq_parse_errors_total{topic="orders"} 1' in text
+        assert 'mx_rmq_handler_duration_seconds_sum{topic="orders"} 0.75' in text
+        assert 'mx_rmq_handler_duration_seconds_count{topic="orders"} 2' in text
+        assert 'mx_rmq_handler_duration_seconds{topic="orders",quantile="0.99"} 0.5' in text
+        assert 'mx_rmq_queue_pending{topic="orders"} 3' in text
+        assert 'mx_rmq_storage_size{key="dlq.count"} 2' in text
+        assert "bad" not in text
+
+    def test_label_escaping(self):
+        """测试标签值转义"""
+        collector = MetricsCollector()
+        collector.record_message_produced('a"b\\c')
+
+        assert 'topic="a\\"b\\\\c"' in collector.render_prometheus()
+
+    @pytest.mark.asyncio
+    async def test_metrics_server(self):
+        """测试 /metrics 端点响应"""
+        import asyncio
+
+        from mx_rmq.monitoring import MetricsServer
+
+        collector = MetricsCollector()
+        collector.record_message_produced("orders")
+        metrics_server = MetricsServer(collector, "127.0.0.1", 0)
+        server = await asyncio.start_server(metrics_server._handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        async def request(path: str) -> bytes:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\n\r\n".encode())
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+
+        async with server:
+            ok = await request("/metrics")
+            missing = await request("/other")
+
+        assert ok.startswith(b"HTTP/1.1 200 OK")
+        assert b'mx_rmq_messages_produced_total{topic="orders"} 1' in ok
+        assert missing.startswith(b"HTTP/1.1 404")
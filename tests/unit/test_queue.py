@@ -128,6 +128,123 @@ class TestRedisMessageQueue:
                 assert delay == 300
                 assert priority == MessagePriority.NORMAL
 
+    @pytest.mark.asyncio
+    async def test_delayed_message_sub_second_and_deliver_at(self):
+        """测试毫秒精度延时与绝对投递时间"""
+        from datetime import timedelta
+
+        queue = RedisMessageQueue()
+
+        with patch.object(queue, '_produce_delayed_message_with_logging', new_callable=AsyncMock) as mock_produce:
+            queue.initialized = True
+            queue._context = MagicMock()
+
+            await queue.produce(topic="test_topic", payload={}, delay=timedelta(milliseconds=150))
+            message, _, _, delay, _ = mock_produce.call_args[0]
+            assert delay == 0.15
+            assert message.meta.delay == 0.15
+
+            await queue.produce(topic="test_topic", payload={}, deliver_at=1_900_000_000_123)
+            message = mock_produce.call_args[0][0]
+            assert mock_produce.call_args[1]["deliver_at"] == 1_900_000_000_123
+            assert message.meta.deliver_at == 1_900_000_000_123
+
+    @pytest.mark.asyncio
+    async def test_ordering_key_production(self):
+        """测试顺序键写入消息并传递给生产脚本"""
+        from mx_rmq.core.context import QueueContext
+
+        queue = RedisMessageQueue(MQConfig(queue_prefix="app"))
+        queue.initialized = True
+        produce_script = AsyncMock()
+        queue._context = QueueContext(
+            queue.config, MagicMock(), {"produce_normal": produce_script}
+        )
+
+        await queue.produce(topic="acct", payload={}, ordering_key="user-1")
+
+        keys = produce_script.call_args[1]["keys"]
+        args = produce_script.call_args[1]["args"]
+        assert keys[4:6] == ["app:acct:ordering", "app:acct:ordering:user-1"]
+        assert keys[6] == "app:metrics"
+        assert args[5] == "user-1"
+        assert args[6:] == ["acct", 0]
+        assert Message.model_validate_json(args[1]).ordering_key == "user-1"
+
+        await queue.produce(topic="acct", payload={})
+        assert produce_script.call_args[1]["keys"][5] == ""
+        assert produce_script.call_args[1]["args"][5] == ""
+
+    @pytest.mark.asyncio
+    async def test_publish_fanout_message(self):
+        """测试广播消息发布到订阅分组集合"""
+        from mx_rmq.core.context import QueueContext
+
+        queue = RedisMessageQueue(MQConfig(queue_prefix="app"))
+        queue.initialized = True
+        publish_script = AsyncMock(return_value=2)
+        queue._context = QueueContext(
+            queue.config, MagicMock(), {"publish_message": publish_script}
+        )
+
+        message_id = await queue.publish("cache", {"k": 1}, priority=8)
+
+        keys = publish_script.call_args[1]["keys"]
+        args = publish_script.call_args[1]["args"]
+        assert keys == [
+            "app:payloads",
+            "app:expires",
+            "app:cache:groups",
+            "app:metrics",
+        ]
+        assert args[0] == message_id
+        assert args[2] == "app:cache"
+        assert args[4] == "8"
+        assert args[5:] == ["cache", 0]
+        assert Message.model_validate_json(args[1]).topic == "cache"
+
+        with pytest.raises(ValueError, match="广播消息ID"):
+            await queue.publish("cache", {}, message_id="a@b")
+
+    def test_register_group_handler(self):
+        """测试订阅分组的处理器注册到分组内部主题"""
+        queue = RedisMessageQueue()
+
+        async def handler(payload):
+            pass
+
+        queue.register_handler("cache", handler, group="svc-a")
+        assert queue._pending_handlers["cache@svc-a"] is handler
+        assert queue._pending_subscriptions["cache@svc-a"] == ("cache", "svc-a")
+
+        with pytest.raises(ValueError, match="订阅分组"):
+            queue.register_handler("cache", handler, group="a@b")
+        with pytest.raises(ValueError, match="订阅分组"):
+            queue.register_handler("cache", handler, group=" ")
+
+    @pytest.mark.asyncio
+    async def test_delay_and_deliver_at_are_exclusive(self):
+        """测试delay与deliver_at不能同时指定"""
+        queue = RedisMessageQueue()
+        queue.initialized = True
+        queue._context = MagicMock()
+
+        with pytest.raises(ValueError, match="只能指定一个"):
+            await queue.produce(topic="t", payload={}, delay=1, deliver_at=1)
+
+        with pytest.raises(ValueError, match="不能为负数"):
+            await queue.produce(topic="t", payload={}, delay=-1)
+
+    @pytest.mark.asyncio
+    async def test_produce_rejects_fanout_separator_in_message_id(self):
+        """测试消息ID不能包含广播分组投递分隔符"""
+        queue = RedisMessageQueue()
+        queue.initialized = True
+        queue._context = MagicMock()
+
+        with pytest.raises(ValueError, match="消息ID不能包含"):
+            await queue.produce(topic="t", payload={}, message_id="alice@example.com")
+
     @pytest.mark.asyncio
     async def test_immediate_message_production(self):
         """测试立即消息生产"""
@@ -171,6 +288,20 @@ class TestRedisMessageQueue:
         assert metrics.registered_topics == ["topic1", "topic2"]
         assert metrics.shutting_down is False
 
+    def test_queue_metrics_include_runtime(self):
+        """测试队列指标包含运行时饱和度指标"""
+        from mx_rmq.core.context import QueueContext
+
+        queue = RedisMessageQueue(MQConfig())
+        assert queue.metrics.runtime is None
+
+        queue._context = QueueContext(queue.config, MagicMock(), {})
+        queue._context.metrics.runtime.record_dispatch_blocked("orders", 0.5)
+
+        runtime = queue.metrics.runtime
+        assert runtime is not None
+        assert runtime.dispatch_blocked_seconds == {"orders": 0.5}
+
     @pytest.mark.asyncio
     async def test_message_ttl_configuration(self):
         """测试消息TTL配置"""
@@ -0,0 +1,74 @@
+"""
+主题限流定义测试
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from mx_rmq import MQConfig, RedisMessageQueue
+from mx_rmq.core.context import QueueContext
+from mx_rmq.core.dispatch import DispatchService
+from mx_rmq.ratelimit import RateLimit
+
+
+class TestRateLimit:
+    """速率表达式测试"""
+
+    @pytest.mark.parametrize(
+        "spec, rate, burst",
+        [
+            ("500/s", 500, 500),
+            ("30/m", 0.5, 30),
+            ("1000/h", 1000 / 3600, 1000),
+            ("10/5s", 2, 10),
+            (" 2 / SEC ", 2, 2),
+        ],
+    )
+    def test_parse(self, spec: str, rate: float, burst: int):
+        """测试解析速率表达式"""
+        limit = RateLimit.parse(spec)
+        assert limit.rate == pytest.approx(rate)
+        assert limit.burst == burst
+
+    @pytest.mark.parametrize("spec", ["500", "500/d", "0/s", "-1/s", "abc/s"])
+    def test_invalid(self, spec: str):
+        """测试非法速率表达式"""
+        with pytest.raises(ValueError):
+            RateLimit.parse(spec)
+
+    def test_register_handler_validates_early(self):
+        """测试注册处理器时即校验速率表达式并延迟保存"""
+        queue = RedisMessageQueue(MQConfig())
+
+        with pytest.raises(ValueError):
+            queue.register_handler("t", lambda p: p, rate_limit="fast")
+
+        queue.register_handler("t", lambda p: p, rate_limit="500/s")
+        assert queue._pending_rate_limits["t"] == "500/s"
+
+
+class TestDispatchRateLimit:
+    """分发限流测试"""
+
+    @pytest.mark.asyncio
+    async def test_throttled_topic_waits_without_blocking_on_signal(self):
+        """测试超出速率限制时等待令牌补充，消息留在通道中"""
+        context = QueueContext(MQConfig(queue_prefix="app"), MagicMock(), {})
+        context.register_handler("partner", AsyncMock(), rate_limit="10/s")
+        dispatch_script = AsyncMock(return_value=20)
+        context.lua_scripts = {"dispatch_message": dispatch_script}
+        context.redis.blpop = AsyncMock()
+
+        service = DispatchService(context, asyncio.Queue())
+        message_id = await service._fetch_message(
+            "partner", "app:partner:pending", "app:partner:processing"
+        )
+
+        assert message_id is None
+        context.redis.blpop.assert_not_called()
+        keys = dispatch_script.call_args[1]["keys"]
+        args = dispatch_script.call_args[1]["args"]
+        assert keys[2] == "app:partner:ratelimit"
+        assert args[2:4] == [10, 10]
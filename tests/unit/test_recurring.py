@@ -0,0 +1,124 @@
+"""
+周期任务定义测试
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from mx_rmq import MQConfig
+from mx_rmq.recurring import CronExpression, RecurringSchedule
+
+
+def _ms(*args: int) -> int:
+    """构造UTC时间戳（毫秒）"""
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+class TestCronExpression:
+    """cron表达式测试"""
+
+    def test_every_minute(self):
+        """测试每分钟触发"""
+        cron = CronExpression("* * * * *")
+        assert cron.next_after(_ms(2026, 1, 1, 10, 0, 30)) == _ms(2026, 1, 1, 10, 1)
+
+    def test_next_is_strictly_after(self):
+        """测试恰好命中时返回下一次触发"""
+        cron = CronExpression("*/15 * * * *")
+        assert cron.next_after(_ms(2026, 1, 1, 10, 15)) == _ms(2026, 1, 1, 10, 30)
+
+    def test_daily_with_rollover(self):
+        """测试跨天、跨月、跨年"""
+        cron = CronExpression("30 9 * * *")
+        assert cron.next_after(_ms(2026, 12, 31, 10, 0)) == _ms(2027, 1, 1, 9, 30)
+
+    def test_ranges_and_lists(self):
+        """测试范围与列表组合"""
+        cron = CronExpression("0 9-17/4,20 * * *")
+        assert cron.hours == {9, 13, 17, 20}
+
+    def test_weekday_sunday_aliases(self):
+        """测试周日的0和7写法等价"""
+        assert CronExpression("0 0 * * 7").weekdays == {0}
+        # 2026-01-04 是周日
+        assert CronExpression("0 0 * * 0").next_after(_ms(2026, 1, 1)) == _ms(
+            2026, 1, 4
+        )
+
+    def test_day_and_weekday_or_semantics(self):
+        """测试日与周同时受限时取“或”"""
+        cron = CronExpression("0 0 15 * 1")
+        # 2026-01-05 是周一，早于15日
+        assert cron.next_after(_ms(2026, 1, 1)) == _ms(2026, 1, 5)
+
+    def test_leap_day(self):
+        """测试稀疏表达式（2月29日）"""
+        cron = CronExpression("0 0 29 2 *")
+        assert cron.next_after(_ms(2026, 1, 1)) == _ms(2028, 2, 29)
+
+    @pytest.mark.parametrize(
+        "expression", ["* * * *", "60 * * * *", "* 24 * * *", "*/0 * * * *", "5-1 * * * *"]
+    )
+    def test_invalid_expressions(self, expression: str):
+        """测试非法表达式"""
+        with pytest.raises(ValueError):
+            CronExpression(expression)
+
+
+class TestRecurringSchedule:
+    """周期任务定义测试"""
+
+    def test_cron_or_every_required(self):
+        """测试cron和every必须且只能指定一个"""
+        with pytest.raises(ValueError, match="必须且只能指定一个"):
+            RecurringSchedule(topic="t", payload={})
+        with pytest.raises(ValueError, match="必须且只能指定一个"):
+            RecurringSchedule(topic="t", payload={}, cron="* * * * *", every=60)
+
+    def test_id_rejects_fanout_separator(self):
+        """测试周期任务ID不能包含广播分组投递分隔符"""
+        with pytest.raises(ValueError, match="周期任务ID"):
+            RecurringSchedule(id="a@b", topic="t", payload={}, every=60)
+
+    def test_invalid_cron_rejected_early(self):
+        """测试非法cron在定义时即被拒绝"""
+        with pytest.raises(ValueError):
+            RecurringSchedule(topic="t", payload={}, cron="bad")
+
+    def test_every_aligned_to_anchor(self):
+        """测试固定间隔按起算时间对齐"""
+        schedule = RecurringSchedule(topic="t", payload={}, every=60, anchor=1_000)
+        assert schedule.next_occurrence(1_000) == 61_000
+        assert schedule.next_occurrence(61_000) == 121_000
+        # 停机错过多个周期后直接跳到下一个周期
+        assert schedule.next_occurrence(600_500) == 601_000
+
+    def test_every_before_anchor(self):
+        """测试起算时间在未来"""
+        schedule = RecurringSchedule(topic="t", payload={}, every=60, anchor=10_000)
+        assert schedule.next_occurrence(0) == 10_000
+
+    def test_jitter_bounds(self):
+        """测试抖动范围"""
+        schedule = RecurringSchedule(topic="t", payload={}, every=60, jitter=2)
+        for _ in range(50):
+            assert 0 <= schedule.fire_time(1_000_000) - 1_000_000 <= 2_000
+
+    def test_occurrence_message_is_deterministic(self):
+        """测试每次触发的消息ID确定，保证重复物化幂等"""
+        schedule = RecurringSchedule(id="s1", topic="t", payload={"k": "v"}, every=60)
+        config = MQConfig(message_ttl=100)
+
+        message = schedule.build_message(60_000, 61_000, config)
+
+        assert message.id == "s1:60000"
+        assert message.payload == {"k": "v"}
+        assert message.meta.expire_at == 61_000 + 100_000
+        assert message.meta.max_retries == config.max_retries
+
+    def test_definition_round_trip(self):
+        """测试定义序列化往返"""
+        schedule = RecurringSchedule(topic="t", payload={"k": 1}, cron="0 * * * *")
+        restored = RecurringSchedule.model_validate_json(schedule.model_dump_json())
+        assert restored == schedule
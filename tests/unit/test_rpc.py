@@ -0,0 +1,103 @@
+"""
+请求/回复（RPC）测试
+"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from mx_rmq import MQConfig, RedisMessageQueue
+from mx_rmq.core.context import QueueContext
+from mx_rmq.core.rpc import ReplyListener, build_reply
+
+
+def _make_listener() -> ReplyListener:
+    context = QueueContext(MQConfig(queue_prefix="app"), MagicMock(), {})
+    return ReplyListener(context, "app:reply:test")
+
+
+class TestBuildReply:
+    """回复内容测试"""
+
+    def test_success_and_error(self):
+        """测试成功与失败回复格式"""
+        assert json.loads(build_reply("m1", {"sum": 3})) == {
+            "id": "m1",
+            "ok": True,
+            "result": {"sum": 3},
+        }
+        assert json.loads(build_reply("m1", error="boom")) == {
+            "id": "m1",
+            "ok": False,
+            "error": "boom",
+        }
+
+    def test_non_serializable_result(self):
+        """测试无法JSON序列化的返回值转为字符串"""
+        assert json.loads(build_reply("m1", {1, 2}))["result"] == "{1, 2}"
+
+
+class TestReplyListener:
+    """回复监听器测试"""
+
+    @pytest.mark.asyncio
+    async def test_one_listener_resolves_many_calls(self):
+        """测试一个监听协程唤醒多个等待中的调用"""
+        listener = _make_listener()
+        replies = [
+            ["app:reply:test", build_reply("m2", "two")],
+            ["app:reply:test", build_reply("m1", error="boom")],
+            None,
+        ]
+        listener.context.redis.blpop = AsyncMock(side_effect=replies)
+
+        first = listener.register("m1")
+        second = listener.register("m2")
+        await asyncio.wait_for(listener._task, 1)  # type: ignore
+
+        assert second.result() == "two"
+        with pytest.raises(RuntimeError, match="boom"):
+            first.result()
+        # 没有等待中的调用后监听协程退出
+        assert listener._task.done()  # type: ignore
+
+    def test_late_reply_is_dropped(self):
+        """测试超时后到达的回复被丢弃"""
+        listener = _make_listener()
+        listener._resolve(build_reply("gone", 1))
+        listener._resolve("not json")
+
+
+class TestQueueCall:
+    """队列call接口测试"""
+
+    @pytest.mark.asyncio
+    async def test_call_produces_message_with_reply_address(self):
+        """测试call生产带回复地址的消息并在超时后清理登记"""
+        queue = RedisMessageQueue(MQConfig(queue_prefix="app"))
+        queue.initialized = True
+        queue._context = QueueContext(queue.config, MagicMock(), {})
+        queue._reply_listener = ReplyListener(queue._context, "app:reply:test")
+        queue._reply_listener.register = MagicMock(  # type: ignore
+            return_value=asyncio.get_running_loop().create_future()
+        )
+
+        with patch.object(
+            queue, "_produce_immediate_message_with_logging", new_callable=AsyncMock
+        ) as mock_produce:
+            with pytest.raises(TimeoutError):
+                await queue.call("add", {"a": 1}, timeout=0.05)
+
+        message = mock_produce.call_args[0][0]
+        assert message.reply_to == "app:reply:test"
+        assert message.meta.max_retries == 0
+        assert queue._reply_listener._pending == {}
+
+    @pytest.mark.asyncio
+    async def test_invalid_timeout(self):
+        """测试超时时间必须为正数"""
+        queue = RedisMessageQueue()
+        with pytest.raises(ValueError):
+            await queue.call("add", {}, timeout=0)
@@ -0,0 +1,142 @@
+"""
+调度服务测试
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from mx_rmq.config import MQConfig
+from mx_rmq.core.context import QueueContext
+from mx_rmq.core.schedule import ScheduleService
+
+
+def _make_service(config: MQConfig, script: AsyncMock) -> ScheduleService:
+    """构造使用模拟脚本的调度服务"""
+    mock_context = MagicMock(spec=QueueContext)
+    mock_context.config = config
+    mock_context.lua_scripts = {"process_delay": script}
+    mock_context.get_global_key = MagicMock(return_value="test:global:key")
+    service = ScheduleService(mock_context)
+    service.is_running = True
+    return service
+
+
+class TestDelayPromotion:
+    """延时消息提升测试"""
+
+    @pytest.mark.asyncio
+    async def test_batch_grows_while_full_and_resets(self):
+        """测试批次满载时批量翻倍，处理完后回落"""
+        config = MQConfig(batch_size=10, delay_promote_max_batch=30, delay_bucket_horizon=0)
+        script = AsyncMock(side_effect=[[10, 0, 1], [20, 0, 1], [30, 0, 1], [5, 0, 0]])
+        service = _make_service(config, script)
+
+        await service.try_process_expired_tasks()
+
+        batch_sizes = [call[1]["args"][0] for call in script.call_args_list]
+        assert batch_sizes == [10, 20, 30, 30]
+        assert service.delay_batch_size == 10
+
+    @pytest.mark.asyncio
+    async def test_stops_when_scheduler_stopped(self):
+        """测试调度器停止后不再继续提升"""
+        config = MQConfig(batch_size=10, delay_bucket_horizon=0)
+        script = AsyncMock(return_value=[10, 0, 1])
+        service = _make_service(config, script)
+        service.is_running = False
+
+        await service.try_process_expired_tasks()
+
+        script.assert_called_once()
+
+
+    @pytest.mark.asyncio
+    async def test_records_delay_lateness(self):
+        """测试按脚本返回的各目标队列滞后汇总记录调度滞后"""
+        from mx_rmq.monitoring.metrics import MetricsCollector
+
+        config = MQConfig(queue_prefix="app", delay_bucket_horizon=0)
+        script = AsyncMock(
+            return_value=[
+                *[5, 0, 0],
+                *["app:orders", 4, 200, 10, 120],
+                *["app:emails", 1, 30, 30, 30],
+            ]
+        )
+        service = _make_service(config, script)
+        service.context.metrics = MetricsCollector()
+
+        await service.try_process_expired_tasks()
+
+        lateness = service.context.metrics.get_latency_metrics("orders")[
+            "delay_lateness"
+        ]
+        assert lateness.count == 4
+        assert lateness.max == 0.12
+        assert lateness.avg == pytest.approx(0.05)
+        emails = service.context.metrics.get_latency_metrics("emails")["delay_lateness"]
+        assert emails.count == 1
+        assert emails.max == 0.03
+
+
+class TestBlockingWakeup:
+    """阻塞唤醒模式测试"""
+
+    @pytest.mark.asyncio
+    async def test_returns_on_wakeup_token(self):
+        """测试收到唤醒令牌后立即返回"""
+        config = MQConfig(delay_wakeup_mode="blocking")
+        service = _make_service(config, AsyncMock())
+        service.context.get_delay_wakeup_key = MagicMock(return_value="delay:wake:list")
+        service.context.redis = MagicMock()
+        service.context.redis.blpop = AsyncMock(return_value=["delay:wake:list", "123"])
+
+        await service._wait_for_wakeup_token(30.0)
+
+        service.context.redis.blpop.assert_called_once_with(
+            ["delay:wake:list"], timeout=5
+        )
+
+    @pytest.mark.asyncio
+    async def test_times_out_at_deadline(self):
+        """测试到达任务到期时间时抛出超时"""
+        config = MQConfig(delay_wakeup_mode="blocking")
+        service = _make_service(config, AsyncMock())
+        service.context.get_delay_wakeup_key = MagicMock(return_value="delay:wake:list")
+        service.context.redis = MagicMock()
+
+        async def _blpop(keys, timeout):
+            await asyncio.sleep(timeout)
+            return None
+
+        service.context.redis.blpop = AsyncMock(side_effect=_blpop)
+
+        with pytest.raises(asyncio.TimeoutError):
+            await service._wait_for_wakeup_token(0.05)
+
+        timeout = service.context.redis.blpop.call_args_list[0][1]["timeout"]
+        assert timeout <= 0.05
+
+    @pytest.mark.asyncio
+    async def test_returns_at_fallback_interval(self):
+        """测试无任务无令牌时按兜底间隔返回，重新评估调度计划"""
+        # 绕过 ge=10 校验，缩短兜底间隔
+        config = MQConfig.model_construct(
+            delay_wakeup_mode="blocking", delay_fallback_interval=0.05
+        )
+        service = _make_service(config, AsyncMock())
+        service.context.get_delay_wakeup_key = MagicMock(return_value="delay:wake:list")
+        service.context.redis = MagicMock()
+
+        async def _blpop(keys, timeout):
+            await asyncio.sleep(timeout)
+            return None
+
+        service.context.redis.blpop = AsyncMock(side_effect=_blpop)
+
+        await asyncio.wait_for(service._wait_for_wakeup_token(None), timeout=1)
+
+        timeout = service.context.redis.blpop.call_args_list[0][1]["timeout"]
+        assert timeout <= 0.05
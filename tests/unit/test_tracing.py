@@ -0,0 +1,112 @@
+"""
+链路追踪测试
+"""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from mx_rmq import MQConfig, Message
+from mx_rmq import tracing
+from mx_rmq.core.consumer import ConsumerService
+from mx_rmq.core.context import QueueContext
+from mx_rmq.core.dispatch import TaskItem
+from mx_rmq.tracing import Tracer
+
+
+class TestDisabledTracer:
+    """未启用追踪时的空操作测试"""
+
+    @pytest.mark.asyncio
+    async def test_disabled_tracer_is_noop(self):
+        """测试未启用时不包装脚本、不注入上下文"""
+        script = AsyncMock()
+        tracer = Tracer()
+
+        with tracer.span("orders process") as span:
+            assert span is None
+        assert tracer.inject() is None
+        assert tracer.wrap_script("produce_normal", script) is script
+
+        context = QueueContext(MQConfig(), MagicMock(), {"produce_normal": script})
+        assert context.lua_scripts["produce_normal"] is script
+
+    def test_enabled_without_dependency(self, monkeypatch):
+        """测试未安装 OpenTelemetry 时启用追踪给出安装提示"""
+        monkeypatch.setattr(tracing, "OTEL_AVAILABLE", False)
+
+        with pytest.raises(ImportError, match="mx-rmq\\[otel\\]"):
+            Tracer(enabled=True)
+
+    def test_trace_context_omitted_from_payload(self):
+        """测试未注入追踪上下文时消息体不包含该字段"""
+        message = Message(topic="orders", payload={})
+
+        assert "traceContext" not in message.model_dump_json(
+            by_alias=True, exclude_none=True
+        )
+
+
+class TestTracePropagation:
+    """追踪上下文经由消息元数据传播测试"""
+
+    @pytest.fixture
+    def exporter(self, monkeypatch):
+        sdk_trace = pytest.importorskip("opentelemetry.sdk.trace")
+        export = pytest.importorskip("opentelemetry.sdk.trace.export")
+        in_memory = pytest.importorskip(
+            "opentelemetry.sdk.trace.export.in_memory_span_exporter"
+        )
+        from opentelemetry import trace
+
+        exporter = in_memory.InMemorySpanExporter()
+        provider = sdk_trace.TracerProvider()
+        provider.add_span_processor(export.SimpleSpanProcessor(exporter))
+        # 全局 TracerProvider 只能设置一次，测试中直接使用本地 provider 的 tracer
+        monkeypatch.setattr(trace, "get_tracer", provider.get_tracer)
+        return exporter
+
+    @pytest.mark.asyncio
+    async def test_consumer_span_continues_producer_trace(self, exporter):
+        """测试处理 span 以生产端注入的上下文为父上下文，脚本调用记录为子 span"""
+        complete = AsyncMock()
+        context = QueueContext(
+            MQConfig(tracing_enabled=True),
+            MagicMock(),
+            {"complete_message": complete},
+        )
+        context.register_handler("orders", AsyncMock(return_value=None))
+
+        message = Message(topic="orders", payload={})
+        with context.tracer.span("orders publish", kind="producer"):
+            message.meta.trace_context = context.tracer.inject()
+        assert "traceparent" in message.meta.trace_context
+
+        stored = Message.model_validate_json(
+            message.model_dump_json(by_alias=True, exclude_none=True)
+        )
+        await ConsumerService(context, MagicMock())._handle_task(
+            TaskItem("orders", stored)
+        )
+
+        spans = {span.name: span for span in exporter.get_finished_spans()}
+        producer = spans["orders publish"]
+        process = spans["orders process"]
+        script = spans["EVALSHA complete_message"]
+        assert process.context.trace_id == producer.context.trace_id
+        assert process.parent.span_id == producer.context.span_id
+        assert script.parent.span_id == process.context.span_id
+        complete.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_script_without_active_span_not_traced(self, exporter):
+        """测试没有活跃 span 时（如分发轮询）脚本调用不产生根 span"""
+        script = AsyncMock(return_value=None)
+        context = QueueContext(
+            MQConfig(tracing_enabled=True), MagicMock(), {"dispatch_message": script}
+        )
+
+        await context.lua_scripts["dispatch_message"](keys=[], args=[])
+
+        script.assert_awaited_once()
+        assert exporter.get_finished_spans() == ()
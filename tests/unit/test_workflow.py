@@ -0,0 +1,119 @@
+"""
+工作流链测试
+"""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from mx_rmq import MQConfig, Message, RedisMessageQueue
+from mx_rmq.core.consumer import ConsumerService
+from mx_rmq.core.context import QueueContext
+from mx_rmq.core.dispatch import TaskItem
+from mx_rmq.core.lifecycle import MessageLifecycleService
+from mx_rmq.workflow import FollowUp, is_follow_up_result, resolve_follow_ups
+
+
+class TestResolveFollowUps:
+    """后续消息解析测试"""
+
+    def test_returned_follow_ups_take_precedence(self):
+        """测试处理器返回的后续消息优先于声明的链"""
+        follow_up = FollowUp("next", {"a": 1})
+
+        assert resolve_follow_ups(follow_up, {}, ("chained",)) == [follow_up]
+        assert resolve_follow_ups([follow_up, follow_up], {}) == [follow_up, follow_up]
+        assert is_follow_up_result(follow_up)
+        assert not is_follow_up_result([])
+
+    def test_declared_chain(self):
+        """测试声明的链：字典返回值作为负载，其他返回值沿用当前负载"""
+        follow_ups = resolve_follow_ups({"b": 2}, {"a": 1}, ("x", "y"))
+        assert [(f.topic, f.payload) for f in follow_ups] == [
+            ("x", {"b": 2}),
+            ("y", {"b": 2}),
+        ]
+
+        assert resolve_follow_ups(None, {"a": 1}, ("x",))[0].payload == {"a": 1}
+        assert resolve_follow_ups({"b": 2}, {"a": 1}) == []
+
+    def test_build_message(self):
+        """测试后续消息使用配置的重试参数和生存时间"""
+        config = MQConfig(max_retries=5, message_ttl=60)
+        message = FollowUp("next", {"a": 1}, priority=9).build_message(config)
+
+        assert message.topic == "next"
+        assert message.priority == 9
+        assert message.meta.max_retries == 5
+        assert message.meta.expire_at > message.meta.created_at
+
+
+class TestWorkflowCompletion:
+    """后续消息与完成确认原子写入测试"""
+
+    @pytest.mark.asyncio
+    async def test_complete_message_with_follow_ups(self):
+        """测试后续消息参数追加在完成确认脚本中"""
+        script = AsyncMock()
+        context = QueueContext(
+            MQConfig(queue_prefix="app"), MagicMock(), {"complete_message": script}
+        )
+        service = MessageLifecycleService(context)
+
+        await service.complete_message(
+            "m1", "a", follow_ups=[FollowUp("b", {"x": 1}, priority=9)]
+        )
+
+        keys = script.call_args[1]["keys"]
+        args = script.call_args[1]["args"]
+        assert keys[3:] == ["", "app:metrics"]
+        assert args[:5] == ["m1", "", "", "a", 0]
+        assert len(args) == 11
+        assert args[7] == "app:b"
+        assert args[9] == "9"
+        assert args[10] == "b"
+        assert Message.model_validate_json(args[6]).payload == {"x": 1}
+
+    @pytest.mark.asyncio
+    async def test_late_ack_does_not_count_follow_ups(self):
+        """测试迟到确认时脚本未入队后续消息，本地不记录生产数"""
+        script = AsyncMock(return_value=0)
+        context = QueueContext(
+            MQConfig(queue_prefix="app"), MagicMock(), {"complete_message": script}
+        )
+        context.metrics.record_message_produced = MagicMock()  # type: ignore
+        service = MessageLifecycleService(context)
+
+        await service.complete_message("m1", "a", follow_ups=[FollowUp("b")])
+
+        context.metrics.record_message_produced.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_consumer_enqueues_declared_chain(self):
+        """测试消费者按声明的链生成后续消息"""
+        context = QueueContext(MQConfig(), MagicMock(), {})
+        context.register_handler("a", AsyncMock(return_value={"x": 2}), then=["b"])
+        service = ConsumerService(context, MagicMock())
+
+        with pytest.MonkeyPatch.context() as mp:
+            complete = AsyncMock()
+            mp.setattr(MessageLifecycleService, "complete_message", complete)
+            await service._handle_task(
+                TaskItem("a", Message(topic="a", payload={"x": 1}))
+            )
+
+        follow_ups = complete.call_args[1]["follow_ups"]
+        assert follow_ups == [FollowUp("b", {"x": 2})]
+
+    def test_register_handler_validates_chain(self):
+        """测试注册时校验后续主题"""
+        queue = RedisMessageQueue()
+
+        async def handler(payload):
+            pass
+
+        queue.register_handler("a", handler, then="b")
+        assert queue._pending_chains["a"] == "b"
+
+        with pytest.raises(ValueError, match="后续主题"):
+            queue.register_handler("a", handler, then=["b", ""])